@@ -0,0 +1,136 @@
+"""Сравнение `requests.request` без пула и общего `WBApi.SESSION_POOL` на локальном стенде.
+
+Локальный сервер работает по plain HTTP, поэтому каждое новое TCP-соединение
+считается за одно рукопожатие (в проде к нему добавляется ещё и TLS).
+Кэш ответов и лимитер для этого прогона выключены: иначе `WBApi` отдавал бы
+ответ из кэша или ждал квоту 1 запрос/с, и замер показывал бы их, а не пул.
+
+Запуск:
+    python -m benchmarks.session_pool --requests 500 --threads 8
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from wb.api import WBApi
+from wb.rate_limiter import RateLimiter, RateQuota
+
+
+class CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        *args,
+        **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self.connections = 0
+        self._connections_lock = threading.Lock()
+
+    def process_request(
+        self,
+        request,
+        client_address
+    ):
+        with self._connections_lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(
+        self
+    ):
+        body = json.dumps(
+            [
+                {
+                    'id': 1,
+                    'name': 'stand-in'
+                }
+            ]
+        ).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(
+        self,
+        *args
+    ):
+        pass
+
+
+def run_case(
+    server: CountingServer,
+    call,
+    total_requests: int,
+    threads: int
+) -> tuple[int, float]:
+    server.connections = 0
+    started_at = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda _: call(), range(total_requests)))
+
+    return server.connections, time.perf_counter() - started_at
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--requests', type=int, default=500)
+    arg_parser.add_argument('--threads', type=int, default=8)
+    args = arg_parser.parse_args()
+
+    server = CountingServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    wb = WBApi(token='benchmark')
+    wb.RATE_LIMITER = RateLimiter(
+        host_categories=WBApi.HOST_CATEGORIES,
+        quotas={},
+        default_quota=RateQuota(requests=1, period=1),
+        enabled=False,
+    )
+
+    cases = {
+        'requests.request (без пула)': lambda: requests.request(
+            method='GET',
+            url=f'{base_url}/api/v3/warehouses',
+            headers={'Authorization': 'benchmark'}
+        ).json(),
+        'WBApi.SESSION_POOL': lambda: wb.get_warehouses(
+            url=base_url,
+            use_cache=False
+        ),
+    }
+
+    for name, call in cases.items():
+        handshakes, wall_time = run_case(
+            server=server,
+            call=call,
+            total_requests=args.requests,
+            threads=args.threads
+        )
+        print(
+            f'{name}: {args.requests} requests, {handshakes} handshakes, '
+            f'{wall_time:.2f}s, {args.requests / wall_time:.0f} req/s'
+        )
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
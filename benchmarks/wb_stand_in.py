@@ -0,0 +1,1036 @@
+"""Локальный стенд WB API для офлайн-прогонов и бенчмарков.
+
+Обслуживает все эндпоинты, которые использует `WBApi`: статистику, продвижение,
+аналитику (включая асинхронные отчёты task/status/download и ZIP-выгрузку),
+контент, маркетплейс и общие справочники. Клиент направляется на стенд через
+`API_STAND_IN_URL`, исходный хост при этом становится первым сегментом пути.
+
+Режимы:
+    synthetic - детерминированные данные, размер задаётся `--scale`;
+    record    - проксирует запросы в настоящий WB (нужен TOKEN) и пишет фикстуры;
+    replay    - отдаёт записанные фикстуры, а чего нет - синтетикой.
+
+Запуск:
+    python -m benchmarks.wb_stand_in --port 8800 --latency 0.05 --throttle-every 20
+    python -m benchmarks.wb_stand_in --mode record --fixtures benchmarks/fixtures
+    python -m benchmarks.wb_stand_in --mode replay --fixtures benchmarks/fixtures --run-task-runner
+"""
+import argparse
+import base64
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+import zipfile
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+
+@dataclass(frozen=True)
+class StandInOptions:
+    mode: str = 'synthetic'
+    fixtures: Path | None = None
+    scale: int = 100
+    seed: int = 42
+    latency: float = 0.0
+    jitter: float = 0.0
+    throttle_every: int = 0
+    throttle_ratio: float = 0.0
+    retry_after: float = 1.0
+    report_ready_after: int = 1
+    compress: bool = True
+
+
+@dataclass
+class StandInResponse:
+    status: int
+    body: bytes = b''
+    headers: dict | None = None
+
+    @classmethod
+    def json(
+        cls,
+        data,
+        status: int = 200
+    ) -> 'StandInResponse':
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+        return cls(
+            status=status,
+            body=body,
+            headers={
+                'Content-Type': 'application/json; charset=utf-8',
+                'ETag': f'"{hashlib.sha1(body).hexdigest()}"',
+            }
+        )
+
+
+class SyntheticData:
+    """Детерминированный набор данных продавца: карточки, склады, РК и отчёты."""
+
+    def __init__(
+        self,
+        scale: int,
+        seed: int
+    ):
+        self._random = random.Random(seed)
+        self.now = datetime.now().replace(microsecond=0)
+
+        self.nm_ids = [100000 + index for index in range(scale)]
+        self.barcodes = {nm_id: f'20{nm_id:011d}' for nm_id in self.nm_ids}
+        self.chrt_ids = {nm_id: 500000 + index for index, nm_id in enumerate(self.nm_ids)}
+        self.warehouses = [
+            {
+                'id': 900 + index,
+                'officeId': 300 + index,
+                'name': f'Склад продавца {index + 1}',
+                'cargoType': 1,
+                'deliveryType': 1,
+            }
+            for index in range(max(1, scale // 50))
+        ]
+        self.adverts = [2000000 + index for index in range(max(1, scale // 5))]
+        self.orders = self._orders(count=scale * 10)
+
+    def _days(
+        self,
+        begin: str | None,
+        end: str | None,
+        default_days: int = 7
+    ) -> list[str]:
+        end_date = date.fromisoformat(end[:10]) if end else self.now.date()
+        begin_date = date.fromisoformat(begin[:10]) if begin else end_date - timedelta(days=default_days)
+
+        return [
+            (begin_date + timedelta(days=offset)).isoformat()
+            for offset in range((end_date - begin_date).days + 1)
+        ]
+
+    def _orders(
+        self,
+        count: int
+    ) -> list[dict]:
+        orders = []
+
+        for index in range(count):
+            nm_id = self._random.choice(self.nm_ids)
+            changed_at = self.now - timedelta(minutes=(count - index) * 5)
+
+            orders.append(
+                {
+                    'date': (changed_at - timedelta(hours=1)).isoformat(),
+                    'lastChangeDate': changed_at.isoformat(),
+                    'warehouseName': 'Коледино',
+                    'warehouseType': 'Склад WB',
+                    'countryName': 'Россия',
+                    'oblastOkrugName': 'Центральный федеральный округ',
+                    'regionName': 'Московская',
+                    'supplierArticle': f'ART-{nm_id}',
+                    'nmId': nm_id,
+                    'barcode': self.barcodes[nm_id],
+                    'category': 'Одежда',
+                    'subject': 'Футболки',
+                    'brand': 'Stand-In',
+                    'techSize': 'M',
+                    'incomeID': 1000 + index % 50,
+                    'isSupply': False,
+                    'isRealization': True,
+                    'totalPrice': 1500,
+                    'discountPercent': 30,
+                    'spp': 10,
+                    'paymentSaleAmount': 0,
+                    'forPay': 900.5,
+                    'finishedPrice': 945,
+                    'priceWithDisc': 1050,
+                    'saleID': f'S{index:09d}',
+                    'isCancel': index % 17 == 0,
+                    'cancelDate': '0001-01-01T00:00:00',
+                    'orderType': 'Клиентский',
+                    'sticker': str(index),
+                    'gNumber': f'G{index:012d}',
+                    'srid': f'srid-{index}',
+                }
+            )
+
+        return orders
+
+    def orders_since(
+        self,
+        date_from: str,
+        limit: int = 80000
+    ) -> list[dict]:
+        since = datetime.fromisoformat(date_from) if date_from else datetime.min
+
+        return [
+            order for order in self.orders
+            if datetime.fromisoformat(order['lastChangeDate']) > since
+        ][:limit]
+
+    def stocks(
+        self
+    ) -> list[dict]:
+        return [
+            {
+                'lastChangeDate': self.now.isoformat(),
+                'warehouseName': 'Коледино',
+                'supplierArticle': f'ART-{nm_id}',
+                'nmId': nm_id,
+                'barcode': self.barcodes[nm_id],
+                'quantity': nm_id % 40,
+                'inWayToClient': nm_id % 3,
+                'inWayFromClient': nm_id % 2,
+                'quantityFull': nm_id % 40 + 5,
+                'category': 'Одежда',
+                'subject': 'Футболки',
+                'brand': 'Stand-In',
+                'techSize': 'M',
+                'Price': 1500,
+                'Discount': 30,
+                'isSupply': True,
+                'isRealization': False,
+                'SCCode': 'Tech',
+            }
+            for nm_id in self.nm_ids
+        ]
+
+    def cards_page(
+        self,
+        cursor: dict
+    ) -> dict:
+        limit = cursor.get('limit', 100)
+        after = cursor.get('nmID') or 0
+
+        page_nm_ids = [nm_id for nm_id in self.nm_ids if nm_id > after][:limit]
+        updated_at = self.now.isoformat() + 'Z'
+
+        return {
+            'cards': [
+                {
+                    'nmID': nm_id,
+                    'imtID': nm_id * 10,
+                    'nmUUID': str(uuid.UUID(int=nm_id)),
+                    'subjectID': 192,
+                    'subjectName': 'Футболки',
+                    'vendorCode': f'ART-{nm_id}',
+                    'brand': 'Stand-In',
+                    'title': f'Футболка {nm_id}',
+                    'dimensions': {'length': 30, 'width': 20, 'height': 5},
+                    'sizes': [
+                        {
+                            'chrtID': self.chrt_ids[nm_id],
+                            'techSize': 'M',
+                            'wbSize': '48',
+                            'skus': [self.barcodes[nm_id]],
+                        }
+                    ],
+                    'createdAt': updated_at,
+                    'updatedAt': updated_at,
+                }
+                for nm_id in page_nm_ids
+            ],
+            'cursor': {
+                'updatedAt': updated_at,
+                'nmID': page_nm_ids[-1] if page_nm_ids else after,
+                'total': len(page_nm_ids),
+            },
+        }
+
+    def advert_list(
+        self
+    ) -> dict:
+        return {
+            'adverts': [
+                {
+                    'type': 9,
+                    'status': 9,
+                    'count': len(self.adverts),
+                    'advert_list': [
+                        {
+                            'advertId': advert_id,
+                            'changeTime': self.now.isoformat(),
+                        }
+                        for advert_id in self.adverts
+                    ],
+                }
+            ],
+            'all': len(self.adverts),
+        }
+
+    def advert_full_stats(
+        self,
+        advert_ids: list[int],
+        begin: str,
+        end: str
+    ) -> list[dict]:
+        days = self._days(begin=begin, end=end)
+        stats = {'views': 1000, 'clicks': 50, 'ctr': 5.0, 'cpc': 7.5, 'sum': 375.0,
+                 'atbs': 10, 'orders': 4, 'cr': 8.0, 'shks': 4, 'sum_price': 4200.0, 'canceled': 0}
+
+        return [
+            {
+                'advertId': advert_id,
+                **stats,
+                'days': [
+                    {
+                        'date': f'{day}T00:00:00Z',
+                        **stats,
+                        'apps': [
+                            {
+                                'appType': 1,
+                                **stats,
+                                'nms': [
+                                    {'nmId': nm_id, 'name': f'Футболка {nm_id}', **stats}
+                                    for nm_id in self.nm_ids[index % len(self.nm_ids):][:3]
+                                ],
+                            }
+                        ],
+                    }
+                    for day in days
+                ],
+                'boosterStats': [],
+            }
+            for index, advert_id in enumerate(advert_ids)
+        ]
+
+    def advert_costs(
+        self,
+        begin: str,
+        end: str
+    ) -> list[dict]:
+        return [
+            {
+                'updNum': index,
+                'updTime': f'{day}T12:00:00+03:00',
+                'updSum': 1000 + index,
+                'advertId': advert_id,
+                'campName': f'РК {advert_id}',
+                'advertType': 9,
+                'paymentType': 'Баланс',
+                'advertStatus': 9,
+            }
+            for day in self._days(begin=begin, end=end)
+            for index, advert_id in enumerate(self.adverts)
+        ]
+
+    def nm_history(
+        self,
+        nm_ids: list[int],
+        begin: str,
+        end: str
+    ) -> dict:
+        return {
+            'data': [
+                {
+                    'nmID': nm_id,
+                    'imtName': f'Футболка {nm_id}',
+                    'vendorCode': f'ART-{nm_id}',
+                    'history': [
+                        {
+                            'dt': day,
+                            'openCardCount': 120,
+                            'addToCartCount': 12,
+                            'addToCartConversion': 10,
+                            'ordersCount': 4,
+                            'ordersSumRub': 4200,
+                            'cartToOrderConversion': 33,
+                            'buyoutsCount': 3,
+                            'buyoutsSumRub': 3150,
+                            'buyoutPercent': 75,
+                        }
+                        for day in self._days(begin=begin, end=end)
+                    ],
+                }
+                for nm_id in nm_ids
+            ],
+            'error': False,
+        }
+
+    def nm_report_zip(
+        self
+    ) -> bytes:
+        fields = ['nmID', 'dt', 'openCardCount', 'addToCartCount', 'ordersCount', 'ordersSumRub',
+                  'buyoutsCount', 'buyoutsSumRub', 'cancelCount', 'cancelSumRub',
+                  'addToCartConversion', 'cartToOrderConversion', 'buyoutPercent']
+
+        text = io.StringIO()
+        writer = csv.writer(text)
+        writer.writerow(fields)
+
+        for nm_id in self.nm_ids:
+            for day in self._days(begin=None, end=None, default_days=30):
+                writer.writerow([nm_id, day, 120, 12, 4, 4200, 3, 3150, 0, 0, 10, 33, 75])
+
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, mode='w', compression=zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.writestr('report.csv', text.getvalue())
+
+        return archive.getvalue()
+
+    def paid_storage(
+        self
+    ) -> list[dict]:
+        return [
+            {
+                'date': day,
+                'logWarehouseCoef': 1,
+                'officeId': 507,
+                'warehouse': 'Коледино',
+                'warehouseCoef': 1.7,
+                'giId': 1000 + index,
+                'chrtId': self.chrt_ids[nm_id],
+                'size': 'M',
+                'barcode': self.barcodes[nm_id],
+                'subject': 'Футболки',
+                'brand': 'Stand-In',
+                'vendorCode': f'ART-{nm_id}',
+                'nmId': nm_id,
+                'volume': 3.0,
+                'calcType': 'короба: без габаритов',
+                'warehousePrice': 0.25,
+                'barcodesCount': 2,
+                'palletPlaceCode': 0,
+                'palletCount': 0,
+                'originalDate': day,
+            }
+            for day in self._days(begin=None, end=None)
+            for index, nm_id in enumerate(self.nm_ids)
+        ]
+
+    def acceptance_report(
+        self
+    ) -> dict:
+        return {
+            'report': [
+                {
+                    'count': 1,
+                    'giCreateDate': day,
+                    'incomeId': 1000 + index,
+                    'nmID': nm_id,
+                    'shkCreateDate': day,
+                    'subjectName': 'Футболки',
+                    'total': 1.5,
+                }
+                for day in self._days(begin=None, end=None)
+                for index, nm_id in enumerate(self.nm_ids)
+            ]
+        }
+
+    def fbs_stocks(
+        self,
+        skus: list[str]
+    ) -> dict:
+        return {
+            'stocks': [
+                {'sku': sku, 'amount': zlib.crc32(str(sku).encode('utf-8')) % 25}
+                for sku in skus
+            ]
+        }
+
+    def tariffs_box(
+        self
+    ) -> dict:
+        return {
+            'response': {
+                'data': {
+                    'dtNextBox': '',
+                    'dtTillMax': self.now.date().isoformat(),
+                    'warehouseList': [
+                        {
+                            'warehouseName': name,
+                            'boxDeliveryAndStorageExpr': '160',
+                            'boxDeliveryBase': '46',
+                            'boxDeliveryLiter': '14',
+                            'boxStorageBase': '0,07',
+                            'boxStorageLiter': '0,07',
+                        }
+                        for name in ['Коледино', 'Электросталь', 'Казань', 'Краснодар']
+                    ],
+                }
+            }
+        }
+
+    def tariffs_commission(
+        self
+    ) -> dict:
+        return {
+            'report': [
+                {
+                    'kgvpMarketplace': 25,
+                    'kgvpSupplier': 22,
+                    'kgvpSupplierExpress': 3,
+                    'paidStorageKgvp': 24.5,
+                    'parentID': 1,
+                    'parentName': 'Одежда',
+                    'subjectID': subject_id,
+                    'subjectName': f'Предмет {subject_id}',
+                }
+                for subject_id in range(1, 201)
+            ]
+        }
+
+
+class FixtureStore:
+    """Фикстуры ответов WB: точный ключ запроса и запасной - первый ответ эндпоинта.
+
+    Запасной ключ нужен потому, что даты в запросах считаются от текущего дня и при
+    воспроизведении почти никогда не совпадают с записанными. Берётся именно первый
+    ответ: курсоры из него ведут дальше по точным ключам записанной цепочки страниц.
+    """
+
+    def __init__(
+        self,
+        directory: Path
+    ):
+        self._directory = Path(directory)
+
+    def _paths(
+        self,
+        method: str,
+        host: str,
+        path: str,
+        query: str,
+        body: bytes
+    ) -> tuple[Path, Path]:
+        endpoint = re.sub(r'[^\w.-]+', '_', path.strip('/')) or 'root'
+        digest = hashlib.sha256(
+            f'{method} {host} {path} {sorted(parse_qs(query).items())}'.encode('utf-8') + body
+        ).hexdigest()[:16]
+
+        directory = self._directory / host / method.lower()
+        return directory / f'{endpoint}__{digest}.json', directory / f'{endpoint}__first.json'
+
+    def load(
+        self,
+        method: str,
+        host: str,
+        path: str,
+        query: str,
+        body: bytes
+    ) -> StandInResponse | None:
+        for fixture_path in self._paths(method=method, host=host, path=path, query=query, body=body):
+            if fixture_path.exists():
+                fixture = json.loads(fixture_path.read_text(encoding='utf-8'))
+
+                return StandInResponse(
+                    status=fixture['status'],
+                    body=base64.b64decode(fixture['body']),
+                    headers=fixture['headers'],
+                )
+
+        return None
+
+    def save(
+        self,
+        method: str,
+        host: str,
+        path: str,
+        query: str,
+        body: bytes,
+        response: StandInResponse
+    ) -> None:
+        fixture = json.dumps(
+            {
+                'status': response.status,
+                'headers': response.headers,
+                'body': base64.b64encode(response.body).decode('ascii'),
+            },
+            ensure_ascii=False
+        )
+
+        exact_path, first_path = self._paths(method=method, host=host, path=path, query=query, body=body)
+        exact_path.parent.mkdir(parents=True, exist_ok=True)
+
+        exact_path.write_text(fixture, encoding='utf-8')
+        if not first_path.exists():
+            first_path.write_text(fixture, encoding='utf-8')
+
+
+_RECORDED_HEADERS = (
+    'Content-Type',
+    'ETag',
+    'Last-Modified',
+    'X-Ratelimit-Remaining',
+    'X-Ratelimit-Retry',
+    'X-Ratelimit-Reset',
+    'Retry-After',
+)
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        options: StandInOptions
+    ):
+        super().__init__(address, StandInHandler)
+
+        self.options = options
+        self.data = SyntheticData(
+            scale=options.scale,
+            seed=options.seed
+        )
+        self.fixtures = FixtureStore(directory=options.fixtures) if options.fixtures else None
+
+        self.requests = Counter()
+        self.throttled = Counter()
+        self._task_polls = Counter()
+        self._random = random.Random(options.seed)
+        self._lock = threading.Lock()
+
+        self._routes = [
+            ('GET', r'.*/ping', self._ping),
+            ('GET', r'/api/v1/supplier/stocks', lambda request: StandInResponse.json(self.data.stocks())),
+            ('GET', r'/api/v1/supplier/orders', self._orders),
+            ('GET', r'/api/v1/supplier/sales', self._sales),
+            ('GET', r'/adv/v1/promotion/count', lambda request: StandInResponse.json(self.data.advert_list())),
+            ('GET', r'/adv/v3/fullstats', self._advert_full_stats),
+            ('GET', r'/adv/v1/upd', self._advert_costs),
+            ('POST', r'/api/v2/nm-report/detail/history', self._nm_history),
+            ('POST', r'/api/v2/nm-report/downloads', self._create_nm_report),
+            ('GET', r'/api/v2/nm-report/downloads', self._nm_report_status),
+            ('GET', r'/api/v2/nm-report/downloads/file/(?P<task_id>[^/]+)', self._download_nm_report),
+            ('GET', r'/api/v1/paid_storage', self._create_task),
+            ('GET', r'/api/v1/paid_storage/tasks/(?P<task_id>[^/]+)/status', self._task_status),
+            ('GET', r'/api/v1/paid_storage/tasks/(?P<task_id>[^/]+)/download',
+             lambda request: StandInResponse.json(self.data.paid_storage())),
+            ('GET', r'/api/v1/acceptance_report', self._create_task),
+            ('GET', r'/api/v1/acceptance_report/tasks/(?P<task_id>[^/]+)/status', self._task_status),
+            ('GET', r'/api/v1/acceptance_report/tasks/(?P<task_id>[^/]+)/download',
+             lambda request: StandInResponse.json(self.data.acceptance_report())),
+            ('POST', r'/content/v2/get/cards/list', self._cards),
+            ('GET', r'/api/v3/warehouses', lambda request: StandInResponse.json(self.data.warehouses)),
+            ('POST', r'/api/v3/stocks/(?P<warehouse_id>\d+)', self._fbs_stocks),
+            ('GET', r'/api/v1/tariffs/(box|pallet)', lambda request: StandInResponse.json(self.data.tariffs_box())),
+            ('GET', r'/api/v1/tariffs/commission',
+             lambda request: StandInResponse.json(self.data.tariffs_commission())),
+            ('GET', r'/api/v1/seller-info',
+             lambda request: StandInResponse.json({'name': 'ИП Стенд', 'sid': str(uuid.UUID(int=1)), 'tradeMark': 'Stand-In'})),
+        ]
+
+    def respond(
+        self,
+        request: 'StandInRequest'
+    ) -> StandInResponse:
+        with self._lock:
+            self.requests[request.endpoint] += 1
+            count = self.requests[request.endpoint]
+            throttled = (
+                self.options.throttle_every and count % self.options.throttle_every == 0
+            ) or self._random.random() < self.options.throttle_ratio
+
+        delay = self.options.latency + self._random.uniform(0, self.options.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if throttled:
+            with self._lock:
+                self.throttled[request.endpoint] += 1
+
+            return StandInResponse(
+                status=429,
+                body=b'{"title":"too many requests"}',
+                headers={
+                    'Content-Type': 'application/json',
+                    'X-Ratelimit-Retry': str(self.options.retry_after),
+                    'X-Ratelimit-Remaining': '0',
+                },
+            )
+
+        if self.options.mode == 'record':
+            return self._record(request=request)
+
+        if self.options.mode == 'replay' and self.fixtures is not None:
+            response = self.fixtures.load(
+                method=request.method,
+                host=request.host,
+                path=request.path,
+                query=request.query,
+                body=request.body
+            )
+            if response is not None:
+                return response
+
+        return self._synthetic(request=request)
+
+    def _synthetic(
+        self,
+        request: 'StandInRequest'
+    ) -> StandInResponse:
+        for method, pattern, handler in self._routes:
+            match = re.fullmatch(pattern, request.path)
+            if method == request.method and match:
+                request.match = match
+                return handler(request)
+
+        return StandInResponse.json({'title': f'no stand-in route for {request.method} {request.path}'}, status=404)
+
+    def _record(
+        self,
+        request: 'StandInRequest'
+    ) -> StandInResponse:
+        upstream = requests.request(
+            method=request.method,
+            url=f'https://{request.host}{request.path}',
+            params=parse_qs(request.query),
+            data=request.body or None,
+            headers={
+                key: value for key, value in request.headers.items()
+                if key in ('Authorization', 'Content-Type')
+            },
+            timeout=300,
+        )
+
+        response = StandInResponse(
+            status=upstream.status_code,
+            body=upstream.content,
+            headers={
+                key: upstream.headers[key] for key in _RECORDED_HEADERS if key in upstream.headers
+            },
+        )
+
+        if self.fixtures is not None and upstream.status_code < 400:
+            self.fixtures.save(
+                method=request.method,
+                host=request.host,
+                path=request.path,
+                query=request.query,
+                body=request.body,
+                response=response
+            )
+
+        return response
+
+    def _ping(
+        self,
+        request: 'StandInRequest'
+    ) -> StandInResponse:
+        return StandInResponse.json({'TS': datetime.now().isoformat(), 'Status': 'OK'})
+
+    def _orders(
+        self,
+        request: 'StandInRequest'
+    ) -> StandInResponse:
+        return StandInResponse.json(self.data.orders_since(date_from=request.param('dateFrom')))
+
+    def _sales(
+        self,
+        request: 'StandInRequest'
+    ) -> StandInResponse:
+        return StandInResponse.json(
+            [order for order in self.data.orders_since(date_from=request.param('dateFrom')) if not order['isCancel']]
+        )
+
+    def _advert_full_stats(
+        self,
+        request: 'StandInRequest'
+    ) -> StandInResponse:
+        advert_ids = [int(advert_id) for advert_id in request.param('ids', '').split(',') if advert_id]
+
+        return StandInResponse.json(
+            self.data.advert_full_stats(
+                advert_ids=advert_ids,
+                begin=request.param('beginDate'),
+                end=request.param('endDate')
+            )
+        )
+
+    def _advert_costs(
+        self,
+        request: 'StandInRequest'
+    ) -> StandInResponse:
+        return StandInResponse.json(
+            self.data.advert_costs(
+                begin=request.param('from'),
+                end=request.param('to')
+            )
+        )
+
+    def _nm_history(
+        self,
+        request: 'StandInRequest'
+    ) -> StandInResponse:
+        payload = request.json()
+
+        return StandInResponse.json(
+            self.data.nm_history(
+                nm_ids=payload.get('nmIDs', []),
+                begin=payload.get('period', {}).get('begin'),
+                end=payload.get('period', {}).get('end')
+            )
+        )
+
+    def _cards(
+        self,
+        request: 'StandInRequest'
+    ) -> StandInResponse:
+        cursor = request.json().get('settings', {}).get('cursor', {})
+
+        return StandInResponse.json(self.data.cards_page(cursor=cursor))
+
+    def _fbs_stocks(
+        self,
+        request: 'StandInRequest'
+    ) -> StandInResponse:
+        return StandInResponse.json(self.data.fbs_stocks(skus=request.json().get('skus', [])))
+
+    def _create_task(
+        self,
+        request: 'StandInRequest'
+    ) -> StandInResponse:
+        return StandInResponse.json({'data': {'taskId': str(uuid.uuid4())}})
+
+    def _poll(
+        self,
+        task_id: str
+    ) -> bool:
+        with self._lock:
+            self._task_polls[task_id] += 1
+            return self._task_polls[task_id] > self.options.report_ready_after
+
+    def _task_status(
+        self,
+        request: 'StandInRequest'
+    ) -> StandInResponse:
+        task_id = request.match['task_id']
+        status = 'done' if self._poll(task_id=task_id) else 'processing'
+
+        return StandInResponse.json({'data': {'id': task_id, 'status': status}})
+
+    def _create_nm_report(
+        self,
+        request: 'StandInRequest'
+    ) -> StandInResponse:
+        return StandInResponse.json({'data': 'Начато формирование файла/отчета'})
+
+    def _nm_report_status(
+        self,
+        request: 'StandInRequest'
+    ) -> StandInResponse:
+        task_id = request.param('filter[downloadIds]')
+        status = 'SUCCESS' if self._poll(task_id=task_id) else 'PROCESSING'
+
+        return StandInResponse.json({'data': [{'id': task_id, 'status': status}]})
+
+    def _download_nm_report(
+        self,
+        request: 'StandInRequest'
+    ) -> StandInResponse:
+        with self._lock:
+            if self._task_polls[request.match['task_id']] <= self.options.report_ready_after:
+                return StandInResponse.json({'title': 'report is not ready'}, status=404)
+
+        return StandInResponse(
+            status=200,
+            body=self.data.nm_report_zip(),
+            headers={'Content-Type': 'application/zip'},
+        )
+
+
+class StandInRequest:
+    def __init__(
+        self,
+        method: str,
+        target: str,
+        headers,
+        body: bytes
+    ):
+        parts = urlsplit(target)
+        host, _, path = parts.path.lstrip('/').partition('/')
+
+        self.method = method
+        self.host = host
+        self.path = f'/{path}'
+        self.query = parts.query
+        self.headers = headers
+        self.body = body
+        self.match = None
+
+        self._params = parse_qs(parts.query)
+
+    @property
+    def endpoint(
+        self
+    ) -> str:
+        path = re.sub(r'/[0-9a-f-]{8,}|/\d+', '/{id}', self.path)
+        return f'{self.method} {self.host}{path}'
+
+    def param(
+        self,
+        name: str,
+        default: str | None = None
+    ) -> str | None:
+        values = self._params.get(name)
+        return values[0] if values else default
+
+    def json(
+        self
+    ) -> dict:
+        return json.loads(self.body or b'{}')
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _dispatch(
+        self
+    ):
+        length = int(self.headers.get('Content-Length') or 0)
+
+        request = StandInRequest(
+            method=self.command,
+            target=self.path,
+            headers=self.headers,
+            body=self.rfile.read(length) if length else b'',
+        )
+
+        response = self.server.respond(request=request)
+        headers = dict(response.headers or {})
+
+        etag = headers.get('ETag')
+        if response.status == 200 and etag and self.headers.get('If-None-Match') == etag:
+            response = StandInResponse(status=304)
+
+        body = response.body
+        if (
+            self.server.options.compress
+            and len(body) >= 1024
+            and 'gzip' in (self.headers.get('Accept-Encoding') or '')
+            and headers.get('Content-Type', '').startswith('application/json')
+        ):
+            body = gzip.compress(body, compresslevel=6)
+            headers['Content-Encoding'] = 'gzip'
+
+        self.send_response(response.status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _dispatch
+    do_POST = _dispatch
+
+    def log_message(
+        self,
+        *args
+    ):
+        pass
+
+
+def serve(
+    options: StandInOptions,
+    host: str = '127.0.0.1',
+    port: int = 0
+) -> StandInServer:
+    server = StandInServer(
+        address=(host, port),
+        options=options
+    )
+
+    threading.Thread(
+        target=server.serve_forever,
+        daemon=True
+    ).start()
+
+    return server
+
+
+def report(
+    server: StandInServer
+) -> None:
+    print(f'{"endpoint":<75} {"requests":>9} {"429":>6}')
+    for endpoint, count in sorted(server.requests.items()):
+        print(f'{endpoint:<75} {count:>9} {server.throttled[endpoint]:>6}')
+    print(f'{"total":<75} {sum(server.requests.values()):>9} {sum(server.throttled.values()):>6}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--mode', choices=['synthetic', 'record', 'replay'], default='synthetic')
+    parser.add_argument('--fixtures', type=Path, default=None)
+    parser.add_argument('--scale', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--throttle-every', type=int, default=0)
+    parser.add_argument('--throttle-ratio', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    parser.add_argument('--report-ready-after', type=int, default=1)
+    parser.add_argument('--no-compress', action='store_true')
+    parser.add_argument('--run-task-runner', action='store_true')
+    args = parser.parse_args()
+
+    if args.mode != 'synthetic' and args.fixtures is None:
+        parser.error('--fixtures is required for record and replay modes')
+
+    options = StandInOptions(
+        mode=args.mode,
+        fixtures=args.fixtures,
+        scale=args.scale,
+        seed=args.seed,
+        latency=args.latency,
+        jitter=args.jitter,
+        throttle_every=args.throttle_every,
+        throttle_ratio=args.throttle_ratio,
+        retry_after=args.retry_after,
+        report_ready_after=args.report_ready_after,
+        compress=not args.no_compress,
+    )
+
+    server = serve(
+        options=options,
+        host=args.host,
+        port=args.port
+    )
+    stand_in_url = f'http://{args.host}:{server.server_port}'
+    print(f'WB stand-in ({args.mode}) listening on {stand_in_url}')
+
+    if not args.run_task_runner:
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            report(server=server)
+        return
+
+    # настройки читаются при импорте config, поэтому адрес стенда выставляется до импорта wb
+    os.environ['API_STAND_IN_URL'] = stand_in_url
+    if args.mode != 'record':
+        os.environ['TOKEN'] = os.environ.get('TOKEN') or 'stand-in-token'
+
+    from wb.task_runner import run_all_methods
+
+    started_at = time.perf_counter()
+    run_all_methods()
+    elapsed = time.perf_counter() - started_at
+
+    report(server=server)
+    print(f'run_all_methods: {elapsed:.1f}s, {sum(server.requests.values()) / elapsed:.1f} req/s')
+
+    from wb.api import WBApi
+
+    print(f'{"payload":<75} {"wire":>11} {"decoded":>11} {"decode s":>9}')
+    for endpoint, counter in sorted(WBApi.PAYLOAD_STATS.snapshot().items()):
+        print(f'{endpoint:<75} {counter.wire_bytes:>11} {counter.decoded_bytes:>11} {counter.decode_seconds:>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -26,6 +26,8 @@ class DatabaseSettings(BaseAppSettings):
     DB_SCHEMA_NAME: str = Field(default='public')
 
     DB_USE_NATIVE_UPSERT: bool = Field(default=False)
+    DB_WRITE_BATCH_SIZE: int = Field(default=5000)
+    DB_DEDUPLICATE_ON_MIGRATION: bool = Field(default=False)
     DB_USE_UNIQUE_COLUMNS_IN_IDENTIFIER_KEYS: bool = Field(default=False)
 
     DB_INCLUDE_BASE_ID: bool = Field(default=True)
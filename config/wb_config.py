@@ -1,3 +1,5 @@
+from pathlib import Path
+
 from pydantic import Field, SecretStr
 
 from config.base_config import BaseAppSettings
@@ -6,3 +8,30 @@ from config.base_config import BaseAppSettings
 class WbSettings(BaseAppSettings):
     BASE_URL: str = Field(...)
     TOKEN: SecretStr = Field(...)
+
+    ACCOUNTS: dict[str, SecretStr] = Field(default_factory=dict)
+    ACCOUNTS_CONCURRENCY: int = Field(default=4)
+    MODULES_CONCURRENCY: int = Field(default=8)
+
+    HTTP_POOL_CONNECTIONS: int = Field(default=10)
+    HTTP_POOL_MAXSIZE: int = Field(default=20)
+    HTTP_POOL_BLOCK: bool = Field(default=False)
+    HTTP_SESSION_MAX_AGE: int = Field(default=1800)
+    HTTP_TIMEOUT: float = Field(default=300)
+
+    RATE_LIMIT_ENABLED: bool = Field(default=True)
+    FAN_OUT_CONCURRENCY: int = Field(default=8)
+    REPORT_JOB_DEADLINE: float = Field(default=1800)
+
+    CIRCUIT_BREAKER_ENABLED: bool = Field(default=True)
+    CIRCUIT_BREAKER_FAILURES: int = Field(default=5)
+    CIRCUIT_BREAKER_COOLDOWN: float = Field(default=60)
+
+    CACHE_DIR: Path = Field(default=Path('cache/'))
+    TOKEN_CHECK_CACHE_TTL: int = Field(default=600)
+    RESPONSE_CACHE_ENABLED: bool = Field(default=True)
+
+    API_STAND_IN_URL: str | None = Field(default=None)
+
+    METRICS_PORT: int = Field(default=0)
+    METRICS_SAVE_ENABLED: bool = Field(default=True)
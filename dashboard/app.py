@@ -3,6 +3,7 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from sqlalchemy import text
+from wb.accounts import get_account, get_accounts
 from wb.api import WBApi, WBCategory
 from wb.db.connector import get_session
 from datetime import datetime, timedelta, date
@@ -61,9 +62,9 @@ TABLES_TO_MONITOR = {
 
 # Токены
 @st.cache_data(ttl=6000)
-def validate_wb_token():
+def validate_wb_token(account_id):
     try:
-        wb = WBApi()
+        wb = WBApi(token=get_account(account_id).token)
         check_result = wb.validate_token(
             required_categories=[
                 WBCategory.MARKETPLACE,
@@ -84,10 +85,17 @@ def validate_wb_token():
         }
 
 
+accounts = [account.id for account in get_accounts()]
+account_id = st.sidebar.selectbox(
+    '🏬 Кабинет',
+    options=accounts,
+    disabled=len(accounts) == 1
+)
+
 st.sidebar.markdown('---')
 st.sidebar.markdown('### 🔑 Статус токена WB API')
 
-token_info = validate_wb_token()
+token_info = validate_wb_token(account_id)
 
 if token_info['valid'] is False:
     st.sidebar.error('❌ Проблемы с доступом к API')
@@ -182,7 +190,7 @@ if not token_info['valid']:
 
 # Таблицы
 @st.cache_data(ttl=10)
-def check_table_status():
+def check_table_status(account_id):
     session = get_session()
     try:
         status = {}
@@ -199,7 +207,8 @@ def check_table_status():
 
             try:
                 count = session.execute(
-                    text(f"SELECT COUNT(*) FROM {table_name}")
+                    text(f"SELECT COUNT(*) FROM {table_name} WHERE account_id = :account_id"),
+                    {'account_id': account_id}
                 ).fetchone()[0]
                 info['count'] = count
                 info['loaded'] = count > 0
@@ -209,7 +218,8 @@ def check_table_status():
                     continue
 
                 result = session.execute(
-                    text(f"SELECT MAX({date_column}) FROM {table_name}")
+                    text(f"SELECT MAX({date_column}) FROM {table_name} WHERE account_id = :account_id"),
+                    {'account_id': account_id}
                 ).fetchone()
 
                 max_date = result[0] if (result and result[0]) else None
@@ -236,7 +246,7 @@ st.sidebar.markdown('### 📋 Статус таблиц данных')
 
 table_monitor_block = st.sidebar.container()
 with table_monitor_block:
-    table_status = check_table_status()
+    table_status = check_table_status(account_id)
 
     all_ok = True
     for t, info in table_status.items():
@@ -286,16 +296,16 @@ st.title('📊 Wildberries Дашборд')
 
 # Получение инфо о продавце
 @st.cache_data(ttl=3600)
-def get_seller_info():
+def get_seller_info(account_id):
     try:
-        wb = WBApi()
+        wb = WBApi(token=get_account(account_id).token)
         info = wb.seller_info()
         return info
     except:
         return None
 
 
-seller_info = get_seller_info()
+seller_info = get_seller_info(account_id)
 if seller_info:
     st.markdown('---')
     with st.expander('ℹ️ Информация о продавце'):
@@ -311,7 +321,7 @@ if seller_info:
             st.metric('Торговое наименование продавца', seller_info.get('tradeMark'))
 
 
-def get_dashboard_data():
+def get_dashboard_data(account_id):
     session = get_session()
     try:
         try:
@@ -383,10 +393,14 @@ def get_dashboard_data():
                 "stkf.quantity_at_end_week",
                 "stkf.quantity_at_end_month"
             FROM mv_wb_pivot_by_day_dl
+            WHERE account_id = :account_id
             ORDER BY "nm_rep.date_on" DESC
         """)
 
-        result = session.execute(query)
+        result = session.execute(
+            query,
+            {'account_id': account_id}
+        )
         rows = result.fetchall()
 
         if rows:
@@ -460,7 +474,7 @@ def format_number(value, decimals=0):
         return str(value)
 
 
-df = get_dashboard_data()
+df = get_dashboard_data(account_id)
 
 if df.empty:
     st.stop()
@@ -0,0 +1,193 @@
+import io
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+import requests
+
+
+# настройки обязательны уже при импорте пакета: в тестах - заглушки,
+# а логи и файловый кэш уходят во временный каталог
+TEST_DIR = Path(tempfile.mkdtemp(prefix='rnp_wb_tests_'))
+
+for name, value in {
+    'APP_NAME': 'RNPWildberries',
+    'APP_VERSION': 'test',
+    'DB_USER': 'test',
+    'DB_PASSWORD': 'test',
+    'DB_NAME': 'test',
+    'LOGGER_NAME': 'APP_LOGGER',
+    'LOGGER_PATH': str(TEST_DIR / 'app_logger.log'),
+    'LOGGER_DIR_PATH': str(TEST_DIR),
+    'BASE_URL': 'https://common-api.wildberries.ru',
+    'TOKEN': 'test',
+    'CACHE_DIR': str(TEST_DIR / 'cache'),
+}.items():
+    os.environ.setdefault(name, value)
+
+from sqlalchemy import BigInteger, create_engine, event  # noqa: E402
+from sqlalchemy.ext.compiler import compiles  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from wb.db.connector import Base  # noqa: E402
+import wb.db.models  # noqa: E402,F401
+from wb import api  # noqa: E402
+from wb.cache import FileTTLStore  # noqa: E402
+from wb.circuit_breaker import CircuitBreaker  # noqa: E402
+from wb.rate_limiter import RateLimiter, RateQuota  # noqa: E402
+from wb.response_cache import ResponseCache  # noqa: E402
+
+
+@compiles(BigInteger, 'sqlite')
+def _sqlite_big_integer(
+    type_,
+    compiler,
+    **kwargs
+):
+    # SQLite автоинкрементит только INTEGER PRIMARY KEY
+    return 'INTEGER'
+
+
+@pytest.fixture
+def sqlite_engine(
+    tmp_path
+):
+    engine = create_engine(f'sqlite:///{tmp_path / "wb.db"}')
+
+    # pysqlite сам открывает транзакции и ломает SAVEPOINT - отдаём BEGIN SQLAlchemy
+    @event.listens_for(engine, 'connect')
+    def _connect(
+        dbapi_connection,
+        connection_record
+    ):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def _begin(
+        connection
+    ):
+        connection.exec_driver_sql('BEGIN')
+
+    Base.metadata.create_all(bind=engine)
+
+    yield engine
+
+    engine.dispose()
+
+
+@pytest.fixture
+def session(
+    sqlite_engine
+):
+    session = sessionmaker(bind=sqlite_engine)()
+
+    yield session
+
+    session.close()
+
+
+class FakeClock:
+    """Подмена модуля `time`: время идёт только через `sleep` и `advance`."""
+
+    def __init__(
+        self,
+        now: float = 1000.0
+    ):
+        self.now = now
+        self.sleeps = []
+
+    def monotonic(
+        self
+    ) -> float:
+        return self.now
+
+    def time(
+        self
+    ) -> float:
+        return self.now
+
+    def sleep(
+        self,
+        seconds: float
+    ) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def advance(
+        self,
+        seconds: float
+    ) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_response(
+    status_code: int = 200,
+    body: bytes = b'',
+    headers: dict | None = None
+) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = body
+    response.headers.update(headers or {})
+    response.raw = io.BytesIO(body)
+
+    return response
+
+
+class FakeSession:
+    """Вместо `SessionPool`: отдаёт заготовленные ответы или бросает заготовленные ошибки."""
+
+    def __init__(
+        self
+    ):
+        self.responses = []
+        self.requests = []
+
+    def request(
+        self,
+        **kwargs
+    ) -> requests.Response:
+        self.requests.append(kwargs)
+
+        outcome = self.responses.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+
+        return outcome
+
+
+@pytest.fixture
+def wb_api(
+    monkeypatch,
+    clock,
+    tmp_path
+):
+    """`WBApi` без сети: свой кэш во временном каталоге, выключенный лимитер и мгновенный sleep."""
+    monkeypatch.setattr(api, 'sleep', clock.sleep)
+
+    wb = api.WBApi(token='test')
+    wb.SESSION_POOL = FakeSession()
+    wb.RATE_LIMITER = RateLimiter(
+        host_categories=api.WBApi.HOST_CATEGORIES,
+        quotas={},
+        default_quota=RateQuota(requests=1, period=1),
+        enabled=False
+    )
+    wb.CIRCUIT_BREAKER = CircuitBreaker(
+        host_categories=api.WBApi.HOST_CATEGORIES
+    )
+    wb.RESPONSE_CACHE = ResponseCache(
+        store=FileTTLStore(
+            directory=tmp_path,
+            namespace='responses'
+        ),
+        ttls=api.WBApi.RESPONSE_CACHE_TTLS
+    )
+
+    return wb
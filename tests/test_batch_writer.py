@@ -0,0 +1,167 @@
+import datetime
+
+import pytest
+import sqlalchemy.exc
+from sqlalchemy import func, select
+
+from wb.db import bulk_upsert, get_checkpoint, save_checkpoint, write_rows
+from wb.db.models import AdvertCost
+from wb.methods.advert_costs import KEY_COLUMNS
+
+
+ENDPOINT = 'test/checkpoint'
+
+
+def make_rows(
+    count: int
+) -> list[dict]:
+    return [
+        {
+            'account_id': 'default',
+            'advert_id': 10,
+            'upd_num': index,
+            'upd_time_at': datetime.datetime(2025, 3, 1),
+            'upd_sum': index,
+            'camp_name': f'camp-{index}',
+        }
+        for index in range(count)
+    ]
+
+
+def count_rows(
+    session
+) -> int:
+    return session.scalar(select(func.count()).select_from(AdvertCost))
+
+
+def test_on_flush_commits_with_last_batch(
+    session
+):
+    result = write_rows(
+        session=session,
+        model=AdvertCost,
+        rows=make_rows(count=25),
+        key_columns=KEY_COLUMNS,
+        batch_size=10,
+        on_flush=lambda: save_checkpoint(
+            session=session,
+            endpoint=ENDPOINT,
+            account='default',
+            cursor='page-2'
+        )
+    )
+
+    session.close()
+
+    assert result.inserted == 25
+    assert get_checkpoint(session=session, endpoint=ENDPOINT, account='default') == 'page-2'
+
+
+def test_on_flush_failure_rolls_back_last_batch(
+    session
+):
+    def fail():
+        raise RuntimeError('checkpoint failed')
+
+    with pytest.raises(RuntimeError):
+        write_rows(
+            session=session,
+            model=AdvertCost,
+            rows=make_rows(count=25),
+            key_columns=KEY_COLUMNS,
+            batch_size=10,
+            on_flush=fail
+        )
+
+    session.rollback()
+
+    # две полные пачки уже зафиксированы, последняя откатилась вместе с курсором
+    assert count_rows(session=session) == 20
+
+
+def test_on_flush_skipped_when_row_rejected(
+    session
+):
+    rows = make_rows(count=5)
+    rows[2]['camp_name'] = ['not', 'a', 'string']
+
+    calls = []
+
+    result = write_rows(
+        session=session,
+        model=AdvertCost,
+        rows=rows,
+        key_columns=KEY_COLUMNS,
+        on_flush=lambda: calls.append(True)
+    )
+
+    assert (result.inserted, result.rejected) == (4, 1)
+    assert calls == []
+    assert count_rows(session=session) == 4
+
+
+def test_bad_row_is_rejected_alone(
+    session
+):
+    rows = make_rows(count=25)
+    rows[13]['camp_name'] = ['not', 'a', 'string']
+
+    result = write_rows(
+        session=session,
+        model=AdvertCost,
+        rows=rows,
+        key_columns=KEY_COLUMNS,
+        batch_size=10
+    )
+
+    assert (result.inserted, result.rejected, result.committed) == (24, 1, 24)
+
+    stored = set(session.scalars(select(AdvertCost.upd_num)))
+    assert stored == {row['upd_num'] for row in rows} - {13}
+
+
+def test_failed_batch_is_rolled_back_to_savepoint(
+    session
+):
+    def half_write(
+        **kwargs
+    ):
+        # пачка успела записать строки и упала - до построчного повтора они должны откатиться
+        bulk_upsert(**kwargs)
+        raise RuntimeError('loader failed')
+
+    result = write_rows(
+        session=session,
+        model=AdvertCost,
+        rows=make_rows(count=5),
+        key_columns=KEY_COLUMNS,
+        loader=half_write
+    )
+
+    assert (result.inserted, result.rejected) == (5, 0)
+    assert count_rows(session=session) == 5
+
+
+def test_connection_error_is_not_retried_row_by_row(
+    session
+):
+    def lost_connection(
+        **kwargs
+    ):
+        if kwargs['rows'][0]['upd_num'] >= 10:
+            raise sqlalchemy.exc.OperationalError('INSERT', {}, Exception('server closed the connection'))
+
+        return bulk_upsert(**kwargs)
+
+    with pytest.raises(sqlalchemy.exc.OperationalError):
+        write_rows(
+            session=session,
+            model=AdvertCost,
+            rows=make_rows(count=25),
+            key_columns=KEY_COLUMNS,
+            batch_size=10,
+            loader=lost_connection
+        )
+
+    # первая пачка уже зафиксирована
+    assert count_rows(session=session) == 10
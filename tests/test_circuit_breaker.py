@@ -0,0 +1,114 @@
+from enum import Enum
+
+import pytest
+
+from wb import circuit_breaker
+from wb.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+URL = 'https://advert-api.wildberries.ru/adv/v1/promotion/count'
+
+
+class Category(Enum):
+    PROMOTION = 'Продвижение'
+
+
+@pytest.fixture
+def breaker(
+    monkeypatch,
+    clock
+) -> CircuitBreaker:
+    monkeypatch.setattr(circuit_breaker, 'time', clock)
+
+    return CircuitBreaker(
+        host_categories={'advert-api.wildberries.ru': Category.PROMOTION},
+        failure_threshold=3,
+        cooldown=60
+    )
+
+
+def fail(
+    breaker: CircuitBreaker,
+    times: int
+) -> None:
+    for _ in range(times):
+        breaker.record(url=URL, status_code=503)
+
+
+def test_opens_after_failures_in_a_row(
+    breaker
+):
+    fail(breaker=breaker, times=2)
+    breaker.record(url=URL, status_code=200)
+    fail(breaker=breaker, times=2)
+
+    # успех обнулил счётчик, порог ещё не достигнут
+    assert breaker.state(category=Category.PROMOTION) == 'closed'
+    assert breaker.before_request(url=URL) is None
+
+    fail(breaker=breaker, times=1)
+
+    assert breaker.state(category=Category.PROMOTION) == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(url=URL)
+
+
+def test_half_open_lets_single_probe_through(
+    breaker,
+    clock
+):
+    fail(breaker=breaker, times=3)
+    clock.advance(60)
+
+    assert breaker.state(category=Category.PROMOTION) == 'half-open'
+    assert breaker.before_request(url=URL) is Category.PROMOTION
+
+    # пока идёт проба, остальные запросы категории отклоняются
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(url=URL)
+
+
+def test_successful_probe_closes_circuit(
+    breaker,
+    clock
+):
+    fail(breaker=breaker, times=3)
+    clock.advance(60)
+
+    category = breaker.before_request(url=URL)
+    breaker.probe_finished(category=category, error=None)
+
+    assert breaker.state(category=Category.PROMOTION) == 'closed'
+    assert breaker.before_request(url=URL) is None
+
+
+def test_failed_probe_reopens_for_cooldown(
+    breaker,
+    clock
+):
+    fail(breaker=breaker, times=3)
+    clock.advance(60)
+
+    category = breaker.before_request(url=URL)
+    with pytest.raises(CircuitOpenError):
+        breaker.probe_finished(category=category, error='timeout')
+
+    assert breaker.state(category=Category.PROMOTION) == 'open'
+
+    clock.advance(59)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(url=URL)
+
+    clock.advance(1)
+    assert breaker.before_request(url=URL) is Category.PROMOTION
+
+
+def test_client_errors_and_unknown_hosts_are_ignored(
+    breaker
+):
+    for _ in range(10):
+        breaker.record(url=URL, status_code=429)
+        breaker.record(url='https://example.com/api', status_code=None)
+
+    assert breaker.state(category=Category.PROMOTION) == 'closed'
+    assert breaker.before_request(url='https://example.com/api') is None
@@ -0,0 +1,343 @@
+import csv
+import datetime
+import io
+import os
+
+import pytest
+from sqlalchemy import JSON, BigInteger, Boolean, Column, Date, DateTime, String, UniqueConstraint, create_engine, func, select, text
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from config import settings
+from wb.db import copy_loader, copy_upsert, write_rows
+from wb.db.copy_loader import COPY_MIN_ROWS, CsvRowStream, NULL_MARKER
+from wb.db.models.account import AccountMixin
+from wb.db.models.row_hash import RowHashMixin
+from wb.db.upsert import bulk_upsert, null_safe_key, use_native_upsert
+
+
+# интеграционные тесты идут только на отдельной БД PostgreSQL, рабочую указывать нельзя
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+ProbeBase = declarative_base()
+
+
+class CopyProbe(AccountMixin, RowHashMixin, ProbeBase):
+    __tablename__ = 'copy_upsert_probe'
+    __table_args__ = (
+        UniqueConstraint('account_id', 'key', name='uq_copy_upsert_probe_natural_key'),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+
+    key = Column(BigInteger)
+    day_on = Column(Date)
+    changed_at = Column(DateTime)
+    flag = Column(Boolean)
+    note = Column(String)
+    payload = Column(JSON)
+
+
+class NullsNotDistinctProbe(AccountMixin, RowHashMixin, ProbeBase):
+    __tablename__ = 'nulls_not_distinct_probe'
+    __table_args__ = (
+        UniqueConstraint(
+            'account_id', 'key',
+            name='uq_nulls_not_distinct_probe_natural_key',
+            postgresql_nulls_not_distinct=True
+        ),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+
+    key = Column(BigInteger)
+    note = Column(String)
+
+
+KEY_COLUMNS = ['account_id', 'key']
+ROWS_COUNT = COPY_MIN_ROWS + 200
+
+
+def make_rows(
+    count: int = ROWS_COUNT,
+    note: str = 'первая, "загрузка"\nвторая строка'
+) -> list[dict]:
+    return [
+        {
+            'account_id': 'default',
+            'key': index,
+            'day_on': datetime.datetime(2025, 1, 1) + datetime.timedelta(days=index % 30),
+            'changed_at': datetime.datetime(2025, 1, 1, 12, 30, 15),
+            'flag': index % 2 == 0,
+            'note': None if index % 3 == 0 else note,
+            'payload': None if index % 5 == 0 else {'index': index, 'tags': ['a', 'б']},
+        }
+        for index in range(count)
+    ]
+
+
+def read_csv(
+    rows: list[dict],
+    columns: list[str]
+) -> list[list[str]]:
+    stream = CsvRowStream(
+        rows=rows,
+        columns=columns
+    )
+
+    return list(csv.reader(io.StringIO(stream.read().decode('utf-8'))))
+
+
+def test_csv_encodes_values_for_copy():
+    columns = ['day_on', 'changed_at', 'flag', 'note', 'payload']
+
+    encoded = read_csv(
+        rows=[
+            {
+                'day_on': datetime.date(2025, 1, 2),
+                'changed_at': datetime.datetime(2025, 1, 2, 3, 4, 5),
+                'flag': False,
+                'note': 'a, "b"\nc',
+                'payload': {'tags': ['б']},
+            },
+            {},
+        ],
+        columns=columns
+    )
+
+    assert encoded[0] == [
+        '2025-01-02', '2025-01-02T03:04:05', 'False', 'a, "b"\nc', '{"tags": ["б"]}', '0'
+    ]
+    # отсутствующая колонка и None - одинаковый NULL, последний столбец - номер строки
+    assert encoded[1] == [NULL_MARKER] * len(columns) + ['1']
+
+
+def test_csv_stream_reads_in_small_pieces():
+    rows = make_rows(count=50)
+    columns = ['key', 'note']
+
+    stream = CsvRowStream(
+        rows=rows,
+        columns=columns
+    )
+
+    pieces = []
+    while piece := stream.read(7):
+        pieces.append(piece)
+
+    assert b''.join(pieces) == CsvRowStream(rows=rows, columns=columns).read()
+
+
+def test_copy_upsert_merges_each_column_set_separately(
+    monkeypatch
+):
+    merged = []
+    monkeypatch.setattr(copy_loader, 'use_native_upsert', lambda **kwargs: True)
+    monkeypatch.setattr(copy_loader, 'null_safe_key', lambda **kwargs: True)
+    monkeypatch.setattr(
+        copy_loader,
+        '_copy_merge',
+        lambda session, table, rows, key_columns: merged.append(rows) or copy_loader.UpsertResult(inserted=len(rows))
+    )
+
+    rows = make_rows(count=COPY_MIN_ROWS * 2)
+    for row in rows[COPY_MIN_ROWS:]:
+        del row['note']
+
+    result = copy_upsert(
+        session=None,
+        model=CopyProbe,
+        rows=rows,
+        key_columns=KEY_COLUMNS
+    )
+
+    assert result.inserted == len(rows)
+    assert [len(group) for group in merged] == [COPY_MIN_ROWS, COPY_MIN_ROWS]
+    for group in merged:
+        assert len({frozenset(row) for row in group}) == 1
+
+
+@pytest.fixture
+def pg_session(
+    monkeypatch
+):
+    if not TEST_DATABASE_URL:
+        pytest.skip('TEST_DATABASE_URL is not set')
+
+    monkeypatch.setattr(settings.db, 'DB_USE_NATIVE_UPSERT', True)
+
+    engine = create_engine(TEST_DATABASE_URL)
+    ProbeBase.metadata.drop_all(bind=engine)
+    ProbeBase.metadata.create_all(bind=engine)
+
+    session = sessionmaker(bind=engine)()
+
+    yield session
+
+    session.close()
+    ProbeBase.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+def load(
+    session,
+    rows: list[dict]
+):
+    result = copy_upsert(
+        session=session,
+        model=CopyProbe,
+        rows=rows,
+        key_columns=KEY_COLUMNS
+    )
+    session.commit()
+
+    return result
+
+
+def test_copy_upsert_takes_copy_path(
+    pg_session
+):
+    assert use_native_upsert(session=pg_session, table=CopyProbe.__table__, key_columns=KEY_COLUMNS)
+
+
+def test_copy_upsert_inserts_updates_and_skips_unchanged(
+    pg_session
+):
+    rows = make_rows()
+
+    result = load(session=pg_session, rows=rows)
+    assert (result.inserted, result.updated, result.unchanged) == (ROWS_COUNT, 0, 0)
+
+    result = load(session=pg_session, rows=rows)
+    assert (result.inserted, result.updated, result.unchanged) == (0, 0, ROWS_COUNT)
+
+    changed = make_rows(note='другая')
+    result = load(session=pg_session, rows=changed)
+    # у каждой третьей строки note пустой, они не изменились
+    changed_count = sum(1 for row in changed if row['note'] is not None)
+    assert (result.inserted, result.updated, result.unchanged) == (
+        0, changed_count, ROWS_COUNT - changed_count
+    )
+
+
+def test_copy_upsert_round_trips_values(
+    pg_session
+):
+    rows = make_rows()
+    load(session=pg_session, rows=rows)
+
+    stored = {
+        probe.key: probe for probe in pg_session.scalars(select(CopyProbe))
+    }
+
+    assert len(stored) == ROWS_COUNT
+    for row in rows:
+        probe = stored[row['key']]
+
+        assert probe.day_on == row['day_on'].date()
+        assert probe.changed_at == row['changed_at']
+        assert probe.flag is row['flag']
+        # NULL остаётся NULL, а не пустой строкой
+        assert probe.note == row['note']
+        assert probe.payload == row['payload']
+        assert probe.row_hash is not None
+
+
+def test_copy_upsert_keeps_last_duplicate(
+    pg_session
+):
+    rows = make_rows()
+    rows.append({**rows[0], 'note': 'последняя'})
+
+    result = load(session=pg_session, rows=rows)
+
+    assert result.inserted == ROWS_COUNT
+    assert pg_session.scalar(select(CopyProbe.note).where(CopyProbe.key == 0)) == 'последняя'
+
+
+def test_copy_upsert_does_not_rewrite_unchanged_rows(
+    pg_session
+):
+    rows = make_rows()
+    load(session=pg_session, rows=rows)
+
+    # xmin меняется при каждой новой версии строки
+    versions_query = select(CopyProbe.key, text('xmin::text')).order_by(CopyProbe.key)
+    versions = pg_session.execute(versions_query).all()
+
+    load(session=pg_session, rows=rows)
+
+    assert pg_session.execute(versions_query).all() == versions
+
+
+def test_copy_upsert_staging_table_survives_batch_commits(
+    pg_session
+):
+    rows = make_rows(count=COPY_MIN_ROWS * 3)
+
+    result = write_rows(
+        session=pg_session,
+        model=CopyProbe,
+        rows=rows,
+        key_columns=KEY_COLUMNS,
+        batch_size=COPY_MIN_ROWS,
+        loader=copy_upsert
+    )
+
+    assert (result.inserted, result.rejected) == (len(rows), 0)
+    assert pg_session.scalar(select(func.count()).select_from(CopyProbe)) == len(rows)
+    # staging-таблица временная и после COMMIT не остаётся
+    assert pg_session.scalar(text("SELECT to_regclass('_staging_copy_upsert_probe')")) is None
+
+
+def test_copy_upsert_matches_null_key_on_rerun(
+    pg_session
+):
+    rows = make_rows()
+    rows[0]['key'] = None
+
+    load(session=pg_session, rows=rows)
+    result = load(session=pg_session, rows=rows)
+
+    assert (result.inserted, result.updated, result.unchanged) == (0, 0, ROWS_COUNT)
+    assert pg_session.scalar(select(func.count()).select_from(CopyProbe)) == ROWS_COUNT
+
+
+def test_nulls_not_distinct_key_takes_native_path(
+    pg_session
+):
+    assert not null_safe_key(session=pg_session, table=CopyProbe.__table__, key_columns=KEY_COLUMNS)
+    assert null_safe_key(session=pg_session, table=NullsNotDistinctProbe.__table__, key_columns=KEY_COLUMNS)
+
+    rows = [
+        {'account_id': 'default', 'key': None, 'note': 'без ключа'},
+        {'account_id': 'default', 'key': 1, 'note': 'с ключом'},
+    ]
+
+    for expected in [(2, 0, 0), (0, 0, 2)]:
+        result = bulk_upsert(
+            session=pg_session,
+            model=NullsNotDistinctProbe,
+            rows=rows,
+            key_columns=KEY_COLUMNS
+        )
+        pg_session.commit()
+
+        assert (result.inserted, result.updated, result.unchanged) == expected
+
+    assert pg_session.scalar(select(func.count()).select_from(NullsNotDistinctProbe)) == 2
+
+
+def test_copy_upsert_keeps_columns_missing_in_rows(
+    pg_session
+):
+    rows = make_rows(note='сохранённая')
+    load(session=pg_session, rows=rows)
+
+    changed = make_rows(note='новая')
+    for row in changed[::2]:
+        del row['note']
+    load(session=pg_session, rows=changed)
+
+    stored = dict(pg_session.execute(select(CopyProbe.key, CopyProbe.note)).all())
+    for row in changed:
+        assert stored[row['key']] == row.get('note', rows[row['key']]['note'])
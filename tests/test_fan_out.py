@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import time
+
+from wb.async_api import iter_fan_out, iter_fan_out_retrying
+
+
+CONCURRENCY = 4
+
+
+def test_fan_out_returns_every_job_once():
+    async def call(
+        wb,
+        job
+    ):
+        await asyncio.sleep(0)
+        if job % 2:
+            raise ValueError(job)
+        return job * 10
+
+    items = list(iter_fan_out(jobs=range(20), call=call, concurrency=CONCURRENCY))
+
+    assert sorted(job for job, _, _ in items) == list(range(20))
+    for job, result, error in items:
+        if job % 2:
+            assert result is None and isinstance(error, ValueError)
+        else:
+            assert (result, error) == (job * 10, None)
+
+
+def test_fan_out_stops_requests_after_early_exit():
+    started = []
+
+    async def call(
+        wb,
+        job
+    ):
+        started.append(job)
+        await asyncio.sleep(0.001)
+        return job
+
+    threads_before = threading.active_count()
+
+    fan_out = iter_fan_out(jobs=range(1000), call=call, concurrency=CONCURRENCY)
+    for _ in range(3):
+        next(fan_out)
+    time.sleep(0.05)
+
+    # пока результаты не разобраны, новые запросы не начинаются: разобранные,
+    # ждущие разбора и выполняющиеся
+    assert len(started) <= 3 + CONCURRENCY * 2
+
+    fan_out.close()
+    started_count = len(started)
+    time.sleep(0.05)
+
+    assert len(started) == started_count
+    assert threading.active_count() == threads_before
+
+
+def test_fan_out_retrying_cancels_on_early_exit():
+    started = []
+
+    async def call(
+        wb,
+        job
+    ):
+        started.append(job)
+        await asyncio.sleep(0.001)
+        return job
+
+    threads_before = threading.active_count()
+
+    for _ in iter_fan_out_retrying(jobs=range(1000), call=call, concurrency=CONCURRENCY):
+        break
+
+    assert len(started) < 1000
+    assert threading.active_count() == threads_before
@@ -0,0 +1,104 @@
+import datetime
+
+from sqlalchemy import select, update
+
+from wb.db import bulk_upsert
+from wb.db.hashing import row_hash, with_row_hashes
+from wb.db.models import AdvertCost, PaidStorage, PaginationCheckpoint
+from wb.methods.advert_costs import KEY_COLUMNS
+
+
+KEY = {
+    'account_id': 'default',
+    'advert_id': 10,
+    'upd_num': 1,
+    'upd_time_at': datetime.datetime(2025, 3, 1),
+}
+
+
+def write(
+    session,
+    row: dict
+):
+    result = bulk_upsert(
+        session=session,
+        model=AdvertCost,
+        rows=[row],
+        key_columns=KEY_COLUMNS
+    )
+    session.commit()
+
+    return result
+
+
+def test_hash_ignores_order_id_and_own_column():
+    table = AdvertCost.__table__
+    row = {**KEY, 'upd_sum': 100, 'camp_name': 'camp'}
+
+    assert row_hash(table=table, row=row) == row_hash(table=table, row=dict(reversed(row.items())))
+    assert row_hash(table=table, row=row) == row_hash(table=table, row={**row, 'id': 5, 'row_hash': 'x'})
+    assert row_hash(table=table, row=row) != row_hash(table=table, row={**row, 'upd_sum': 101})
+
+
+def test_hash_normalizes_dates_for_date_columns():
+    table = PaidStorage.__table__
+
+    assert row_hash(table=table, row={'date_on': datetime.datetime(2025, 3, 1)}) == row_hash(
+        table=table, row={'date_on': datetime.date(2025, 3, 1)}
+    )
+
+
+def test_hash_tells_null_from_missing_column():
+    table = AdvertCost.__table__
+
+    # отсутствующая колонка не пишется, а None пишет NULL - это разные записи
+    assert row_hash(table=table, row={**KEY, 'camp_name': None}) != row_hash(table=table, row=KEY)
+
+
+def test_with_row_hashes_keeps_tables_without_hash():
+    rows = [{'endpoint': 'cards', 'account': 'default'}]
+
+    assert with_row_hashes(table=PaginationCheckpoint.__table__, rows=rows) == rows
+
+
+def test_unchanged_rows_are_skipped(
+    session
+):
+    row = {**KEY, 'upd_sum': 100, 'camp_name': 'camp'}
+
+    assert write(session=session, row=row).inserted == 1
+
+    result = write(session=session, row=row)
+    assert (result.inserted, result.updated, result.unchanged) == (0, 0, 1)
+
+    result = write(session=session, row={**row, 'upd_sum': 200})
+    assert result.updated == 1
+
+
+def test_null_after_missing_column_is_written(
+    session
+):
+    write(session=session, row={**KEY, 'camp_name': 'camp'})
+    # строка без camp_name не трогает колонку в БД
+    write(session=session, row=KEY)
+    assert session.scalar(select(AdvertCost.camp_name)) == 'camp'
+
+    # а явный None обязан дойти до БД, хотя остальные значения те же
+    result = write(session=session, row={**KEY, 'camp_name': None})
+
+    assert result.updated == 1
+    assert session.scalar(select(AdvertCost.camp_name)) is None
+
+
+def test_rows_without_stored_hash_are_rewritten_once(
+    session
+):
+    row = {**KEY, 'upd_sum': 100}
+    write(session=session, row=row)
+
+    # строки, загруженные до появления row_hash
+    session.execute(update(AdvertCost).values(row_hash=None))
+    session.commit()
+
+    assert write(session=session, row=row).updated == 1
+    assert write(session=session, row=row).unchanged == 1
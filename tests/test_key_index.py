@@ -0,0 +1,153 @@
+import datetime
+
+from sqlalchemy import func, select
+
+from wb.db import KeyIndex, bulk_upsert
+from wb.db.models import AdvertNMReport, PaginationCheckpoint
+
+
+KEY_COLUMNS = ['account_id', 'nm_id', 'dt_on']
+
+
+def make_row(
+    nm_id: int,
+    day: int,
+    orders_count: int = 1
+) -> dict:
+    # модули кладут в Date-колонку разобранный datetime, из БД возвращается date
+    return {
+        'account_id': 'default',
+        'nm_id': nm_id,
+        'dt_on': datetime.datetime(2025, 3, day),
+        'orders_count': orders_count,
+    }
+
+
+def load_index(
+    session,
+    since: datetime.date = datetime.date(2025, 3, 1)
+) -> KeyIndex:
+    return KeyIndex.load(
+        session=session,
+        model=AdvertNMReport,
+        key_columns=KEY_COLUMNS,
+        where=[AdvertNMReport.dt_on >= since]
+    )
+
+
+def test_split_separates_new_changed_and_unchanged(
+    session
+):
+    bulk_upsert(
+        session=session,
+        model=AdvertNMReport,
+        rows=[make_row(nm_id=1, day=1), make_row(nm_id=2, day=1)],
+        key_columns=KEY_COLUMNS
+    )
+    session.commit()
+
+    key_index = load_index(session=session)
+
+    split = key_index.split(rows=[
+        make_row(nm_id=1, day=1),
+        make_row(nm_id=2, day=1, orders_count=5),
+        make_row(nm_id=3, day=1),
+    ])
+
+    assert [row['nm_id'] for row in split.unchanged] == [1]
+    assert [row['nm_id'] for row in split.updates] == [2]
+    assert [row['nm_id'] for row in split.inserts] == [3]
+    assert split.changed == split.inserts + split.updates
+
+
+def test_load_respects_window(
+    session
+):
+    bulk_upsert(
+        session=session,
+        model=AdvertNMReport,
+        rows=[make_row(nm_id=1, day=1), make_row(nm_id=1, day=10)],
+        key_columns=KEY_COLUMNS
+    )
+    session.commit()
+
+    key_index = load_index(session=session, since=datetime.date(2025, 3, 5))
+
+    assert len(key_index) == 1
+    assert key_index.key(row=make_row(nm_id=1, day=10)) in key_index
+    assert key_index.key(row=make_row(nm_id=1, day=1)) not in key_index
+
+
+def test_remember_marks_written_rows_unchanged(
+    session
+):
+    key_index = load_index(session=session)
+    rows = [make_row(nm_id=1, day=1), make_row(nm_id=1, day=2)]
+
+    first = bulk_upsert(
+        session=session,
+        model=AdvertNMReport,
+        rows=rows,
+        key_columns=KEY_COLUMNS,
+        key_index=key_index
+    )
+    # повтор ключа на следующей странице того же прогона
+    second = bulk_upsert(
+        session=session,
+        model=AdvertNMReport,
+        rows=rows,
+        key_columns=KEY_COLUMNS,
+        key_index=key_index
+    )
+
+    assert (first.inserted, first.unchanged) == (2, 0)
+    assert (second.inserted, second.updated, second.unchanged) == (0, 0, 2)
+    assert session.scalar(select(func.count()).select_from(AdvertNMReport)) == 2
+
+
+def test_updates_go_by_indexed_id(
+    session
+):
+    bulk_upsert(
+        session=session,
+        model=AdvertNMReport,
+        rows=[make_row(nm_id=1, day=1)],
+        key_columns=KEY_COLUMNS
+    )
+    session.commit()
+
+    key_index = load_index(session=session)
+    result = bulk_upsert(
+        session=session,
+        model=AdvertNMReport,
+        rows=[make_row(nm_id=1, day=1, orders_count=7)],
+        key_columns=KEY_COLUMNS,
+        key_index=key_index
+    )
+
+    assert (result.inserted, result.updated) == (0, 1)
+    assert session.scalar(select(AdvertNMReport.orders_count)) == 7
+
+
+def test_versions_without_row_hash_use_payload_columns(
+    session
+):
+    session.add(PaginationCheckpoint(endpoint='cards', account='default', cursor={'nmID': 1}))
+    session.commit()
+
+    key_index = KeyIndex.load(
+        session=session,
+        model=PaginationCheckpoint,
+        key_columns=['endpoint', 'account']
+    )
+
+    assert key_index.version_columns == ['cursor', 'updated_at']
+
+    # колонки, которых нет во входной строке, в сравнении не участвуют
+    split = key_index.split(rows=[
+        {'endpoint': 'cards', 'account': 'default', 'cursor': {'nmID': 1}},
+        {'endpoint': 'cards', 'account': 'default', 'cursor': {'nmID': 2}},
+    ])
+
+    assert len(split.unchanged) == 1
+    assert len(split.updates) == 1
@@ -0,0 +1,182 @@
+import datetime
+
+from sqlalchemy import UniqueConstraint, func, select
+
+from wb.db import KeyIndex, copy_upsert, write_rows
+from wb.db.connector import Base
+from wb.db.models import AdvertCost, AdvertFullStat, PaidStorage
+from wb.methods import advert_costs, advert_fullstats, paid_storage
+
+
+DAYS = [datetime.datetime(2025, 3, day) for day in (1, 2, 3)]
+
+
+def count_rows(
+    session,
+    model
+) -> int:
+    return session.scalar(select(func.count()).select_from(model))
+
+
+def test_advert_fullstats_keeps_every_day(
+    session
+):
+    rows = [
+        {
+            'account_id': 'default',
+            'date_at': day,
+            'app_type': 1,
+            'advert_id': 10,
+            'nm_id': 100,
+            'views': index,
+        }
+        for index, day in enumerate(DAYS)
+    ]
+
+    result = write_rows(
+        session=session,
+        model=AdvertFullStat,
+        rows=rows,
+        key_columns=advert_fullstats.KEY_COLUMNS
+    )
+
+    assert result.inserted == len(DAYS)
+    assert count_rows(session=session, model=AdvertFullStat) == len(DAYS)
+
+
+def test_paid_storage_keeps_every_day(
+    session
+):
+    rows = [
+        {
+            'account_id': 'default',
+            'date_on': day,
+            'office_id': 1,
+            'gi_id': 2,
+            'chrt_id': 3,
+            'calc_type': 'short',
+            'nm_id': 100,
+            'warehouse_price': 1.5 + index,
+        }
+        for index, day in enumerate(DAYS)
+    ]
+
+    result = write_rows(
+        session=session,
+        model=PaidStorage,
+        rows=rows,
+        key_columns=paid_storage.KEY_COLUMNS
+    )
+
+    assert result.inserted == len(DAYS)
+    assert count_rows(session=session, model=PaidStorage) == len(DAYS)
+
+
+def test_advert_costs_keeps_every_document(
+    session
+):
+    rows = [
+        {
+            'account_id': 'default',
+            'advert_id': 10,
+            'upd_num': 500 + index,
+            'upd_time_at': day,
+            'upd_sum': 100,
+        }
+        for index, day in enumerate(DAYS)
+    ]
+
+    write_rows(
+        session=session,
+        model=AdvertCost,
+        rows=rows,
+        key_columns=advert_costs.KEY_COLUMNS
+    )
+
+    # повторная выгрузка тех же документов ничего не добавляет и не меняет
+    result = write_rows(
+        session=session,
+        model=AdvertCost,
+        rows=rows,
+        key_columns=advert_costs.KEY_COLUMNS
+    )
+
+    assert result.unchanged == len(DAYS)
+    assert count_rows(session=session, model=AdvertCost) == len(DAYS)
+
+
+def test_null_key_column_matches_on_rerun(
+    session
+):
+    row = {
+        'account_id': 'default',
+        'date_on': DAYS[0],
+        'office_id': 1,
+        'gi_id': None,
+        'chrt_id': 3,
+        'calc_type': 'short',
+        'nm_id': 100,
+        'warehouse_price': 1.5,
+    }
+
+    results = [
+        write_rows(
+            session=session,
+            model=PaidStorage,
+            rows=[{**row, 'warehouse_price': price}],
+            key_columns=paid_storage.KEY_COLUMNS,
+            loader=copy_upsert
+        )
+        for price in (1.5, 1.5, 2.5)
+    ]
+
+    assert [(result.inserted, result.updated, result.unchanged) for result in results] == [
+        (1, 0, 0), (0, 0, 1), (0, 1, 0)
+    ]
+    assert count_rows(session=session, model=PaidStorage) == 1
+    assert session.scalar(select(PaidStorage.warehouse_price)) == 2.5
+
+
+def test_null_key_column_matches_through_key_index(
+    session
+):
+    rows = [
+        {
+            'account_id': 'default',
+            'date_at': DAYS[0],
+            'app_type': None,
+            'advert_id': 10,
+            'nm_id': 100,
+            'views': 1,
+        }
+    ]
+
+    for _ in range(2):
+        key_index = KeyIndex.load(
+            session=session,
+            model=AdvertFullStat,
+            key_columns=advert_fullstats.KEY_COLUMNS
+        )
+        write_rows(
+            session=session,
+            model=AdvertFullStat,
+            rows=rows,
+            key_columns=advert_fullstats.KEY_COLUMNS,
+            key_index=key_index
+        )
+
+    assert count_rows(session=session, model=AdvertFullStat) == 1
+
+
+def test_natural_keys_match_null_as_value():
+    natural_keys = [
+        constraint
+        for table in Base.metadata.sorted_tables
+        for constraint in table.constraints
+        if isinstance(constraint, UniqueConstraint) and constraint.name.endswith('_natural_key')
+    ]
+
+    assert natural_keys
+    # иначе ON CONFLICT не считает NULL в ключе совпадением и повторный запуск вставит дубликат
+    for constraint in natural_keys:
+        assert constraint.dialect_options['postgresql']['nulls_not_distinct'], constraint.name
@@ -0,0 +1,107 @@
+import pytest
+
+from wb import rate_limiter
+from wb.rate_limiter import RateLimiter, RateQuota, TokenBucket
+
+
+URL = 'https://statistics-api.wildberries.ru/api/v1/supplier/orders'
+
+
+@pytest.fixture(autouse=True)
+def fake_time(
+    monkeypatch,
+    clock
+):
+    monkeypatch.setattr(rate_limiter, 'time', clock)
+
+
+def make_limiter(
+    quota: RateQuota,
+    enabled: bool = True
+) -> RateLimiter:
+    return RateLimiter(
+        host_categories={'statistics-api.wildberries.ru': 'statistics'},
+        quotas={'statistics': {'*': quota}},
+        default_quota=RateQuota(requests=1, period=1),
+        enabled=enabled
+    )
+
+
+def test_bucket_queues_requests_over_burst():
+    bucket = TokenBucket(quota=RateQuota(requests=2, period=1))
+
+    # первый запрос - из запаса, следующие встают в очередь с шагом 1 / rate
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_bucket_refills_with_time(
+    clock
+):
+    bucket = TokenBucket(quota=RateQuota(requests=2, period=1))
+
+    bucket.reserve()
+    clock.advance(0.5)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.5)
+
+
+def test_bucket_refill_is_capped_by_burst(
+    clock
+):
+    bucket = TokenBucket(quota=RateQuota(requests=1, period=1, burst=3))
+
+    clock.advance(3600)
+
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_acquire_sleeps_for_reserved_wait(
+    clock
+):
+    limiter = make_limiter(quota=RateQuota(requests=1, period=60))
+
+    limiter.acquire(url=URL)
+    waited = limiter.acquire(url=URL)
+
+    assert waited == pytest.approx(60)
+    assert clock.sleeps == [pytest.approx(60)]
+
+
+def test_buckets_are_per_account():
+    limiter = make_limiter(quota=RateQuota(requests=1, period=60))
+
+    assert limiter.acquire(url=URL, account='first') == 0
+    assert limiter.acquire(url=URL, account='second') == 0
+
+
+def test_retry_after_blocks_bucket():
+    limiter = make_limiter(quota=RateQuota(requests=100, period=1, burst=10))
+
+    limiter.update(url=URL, status_code=429, headers={'Retry-After': '5'})
+
+    assert limiter.bucket_for(url=URL).reserve() == pytest.approx(5)
+
+
+def test_exhausted_remaining_waits_for_reset():
+    limiter = make_limiter(quota=RateQuota(requests=100, period=1, burst=10))
+
+    limiter.update(
+        url=URL,
+        status_code=200,
+        headers={'X-Ratelimit-Remaining': '0', 'X-Ratelimit-Reset': '7'}
+    )
+
+    assert limiter.bucket_for(url=URL).reserve() == pytest.approx(7)
+
+
+def test_disabled_limiter_never_waits(
+    clock
+):
+    limiter = make_limiter(quota=RateQuota(requests=1, period=60), enabled=False)
+
+    assert [limiter.acquire(url=URL) for _ in range(5)] == [0.0] * 5
+    assert clock.sleeps == []
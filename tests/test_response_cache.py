@@ -0,0 +1,119 @@
+import pytest
+
+from tests.conftest import make_response
+from wb import cache, response_cache
+from wb.cache import FileTTLStore
+from wb.response_cache import ResponseCache
+
+
+WAREHOUSES_URL = 'https://marketplace-api.wildberries.ru'
+
+
+@pytest.fixture
+def fake_time(
+    monkeypatch,
+    clock
+):
+    monkeypatch.setattr(cache, 'time', clock)
+    monkeypatch.setattr(response_cache, 'time', clock)
+
+    return clock
+
+
+@pytest.fixture
+def store(
+    tmp_path
+) -> FileTTLStore:
+    return FileTTLStore(
+        directory=tmp_path,
+        namespace='test'
+    )
+
+
+def test_file_store_expires_entries(
+    fake_time,
+    store
+):
+    store.set(key='token', value={'valid': True}, ttl=10)
+
+    assert store.get(key='token') == {'valid': True}
+
+    fake_time.advance(10)
+
+    assert store.get(key='token', default='missing') == 'missing'
+
+
+def test_file_store_survives_broken_file(
+    store
+):
+    store.set(key='token', value=1, ttl=10)
+    store._path(key='token').write_text('{not json', encoding='utf-8')
+
+    assert store.get(key='token') is None
+
+
+def test_file_store_is_shared_between_instances(
+    store,
+    tmp_path
+):
+    store.set(key='token', value='ok', ttl=10)
+    store.delete(key='token')
+    store.delete(key='token')
+
+    other = FileTTLStore(directory=tmp_path, namespace='test')
+    other.set(key='shared', value='ok', ttl=10)
+
+    assert store.get(key='token') is None
+    assert store.get(key='shared') == 'ok'
+    # запись атомарная: временных файлов не остаётся
+    assert not list((tmp_path / 'test').glob('*.tmp'))
+
+
+def test_entry_without_validators_lives_only_ttl(
+    fake_time,
+    store
+):
+    responses = ResponseCache(store=store, ttls={'api/v3/warehouses': 60})
+    url = f'{WAREHOUSES_URL}/api/v3/warehouses'
+
+    responses.set(key='plain', url=url, body=[1], headers={})
+    responses.set(key='tagged', url=url, body=[2], headers={'ETag': '"v1"'})
+
+    fake_time.advance(61)
+
+    # протухшая запись с ETag остаётся для условного запроса, без него - удаляется
+    assert responses.get(key='plain') is None
+    tagged = responses.get(key='tagged')
+    assert not tagged.is_fresh
+    assert tagged.conditional_headers() == {'If-None-Match': '"v1"'}
+
+
+def test_not_modified_returns_cached_body(
+    wb_api,
+    fake_time
+):
+    ttl = wb_api.RESPONSE_CACHE.ttl_for(url=f'{WAREHOUSES_URL}/api/v3/warehouses')
+    wb_api.SESSION_POOL.responses.extend([
+        make_response(body=b'[{"id": 1}]', headers={'ETag': '"v1"'}),
+        make_response(status_code=304, headers={'ETag': '"v2"'}),
+    ])
+
+    assert wb_api.get_warehouses(url=WAREHOUSES_URL) == [{'id': 1}]
+
+    # свежая запись отдаётся без запроса
+    assert wb_api.get_warehouses(url=WAREHOUSES_URL) == [{'id': 1}]
+    assert len(wb_api.SESSION_POOL.requests) == 1
+
+    fake_time.advance(ttl + 1)
+
+    assert wb_api.get_warehouses(url=WAREHOUSES_URL) == [{'id': 1}]
+    assert wb_api.SESSION_POOL.requests[1]['headers']['If-None-Match'] == '"v1"'
+
+    # 304 продлевает запись и обновляет валидатор
+    cache_key = wb_api.RESPONSE_CACHE.key_for(
+        account=wb_api.account,
+        request_kwargs=wb_api.SESSION_POOL.requests[0]
+    )
+    revalidated = wb_api.RESPONSE_CACHE.get(key=cache_key)
+    assert revalidated.is_fresh
+    assert revalidated.etag == '"v2"'
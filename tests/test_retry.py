@@ -0,0 +1,110 @@
+import random
+
+import pytest
+import requests
+
+from tests.conftest import make_response
+from wb import retry
+from wb.api import WBApi
+from wb.circuit_breaker import CircuitBreaker
+from wb.retry import RetryPolicy
+
+
+WAREHOUSES_URL = 'https://marketplace-api.wildberries.ru'
+
+
+def test_backoff_is_full_jitter_under_cap():
+    policy = RetryPolicy(base_delay=1.0, max_delay=10.0)
+    random.seed(1)
+
+    for attempt in range(8):
+        cap = min(policy.max_delay, policy.base_delay * 2 ** attempt)
+        delays = [policy.backoff(attempt=attempt) for _ in range(200)]
+
+        assert all(0 <= delay <= cap for delay in delays)
+        # full jitter: задержки разбросаны по всему интервалу, а не равны потолку
+        assert min(delays) < cap / 4 and max(delays) > cap * 3 / 4
+
+
+def test_deadline_stops_retries(
+    monkeypatch
+):
+    policy = RetryPolicy(deadline=30.0, max_delay=60.0)
+    monkeypatch.setattr(retry.random, 'uniform', lambda low, high: high)
+
+    # попытка 3: задержка 8 с укладывается в дедлайн только при elapsed < 22
+    assert policy.next_delay(attempt=3, elapsed=21.0, idempotent=True, status_code=503) == 8.0
+    assert policy.next_delay(attempt=3, elapsed=22.0, idempotent=True, status_code=503) is None
+
+
+def test_max_attempts_stops_retries():
+    policy = RetryPolicy(max_attempts=3)
+
+    assert policy.next_delay(attempt=1, elapsed=0, idempotent=True, status_code=503) is not None
+    assert policy.next_delay(attempt=2, elapsed=0, idempotent=True, status_code=503) is None
+
+
+@pytest.mark.parametrize(
+    'status_code, transport_error, idempotent, retried',
+    [
+        (503, False, True, True),
+        (503, False, False, False),
+        (None, True, True, True),
+        (None, True, False, False),
+        (429, False, False, True),
+        (400, False, True, False),
+    ]
+)
+def test_retry_depends_on_idempotency(
+    status_code,
+    transport_error,
+    idempotent,
+    retried
+):
+    delay = RetryPolicy().next_delay(
+        attempt=0,
+        elapsed=0,
+        idempotent=idempotent,
+        status_code=status_code,
+        transport_error=transport_error
+    )
+
+    assert (delay is not None) is retried
+
+
+def test_paced_429_is_retried_without_backoff():
+    delay = RetryPolicy().next_delay(attempt=0, elapsed=0, idempotent=True, status_code=429, paced=True)
+
+    assert delay == 0.0
+
+
+def test_request_retries_server_error_and_connection_error(
+    wb_api,
+    clock
+):
+    wb_api.SESSION_POOL.responses.extend([
+        make_response(status_code=503),
+        requests.ConnectionError('reset by peer'),
+        make_response(body=b'[{"id": 1}]'),
+    ])
+
+    data = wb_api.get_warehouses(url=WAREHOUSES_URL, use_cache=False)
+
+    assert data == [{'id': 1}]
+    assert len(wb_api.SESSION_POOL.requests) == 3
+    assert len(clock.sleeps) == 2
+
+
+def test_request_gives_up_after_max_attempts(
+    wb_api
+):
+    # автомат открылся бы раньше, чем кончатся попытки
+    wb_api.CIRCUIT_BREAKER = CircuitBreaker(host_categories=WBApi.HOST_CATEGORIES, enabled=False)
+    wb_api.SESSION_POOL.responses.extend(
+        make_response(status_code=503) for _ in range(retry.DEFAULT_RETRY_POLICY.max_attempts)
+    )
+
+    with pytest.raises(requests.RequestException):
+        wb_api.get_warehouses(url=WAREHOUSES_URL, use_cache=False)
+
+    assert len(wb_api.SESSION_POOL.requests) == retry.DEFAULT_RETRY_POLICY.max_attempts
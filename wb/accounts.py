@@ -0,0 +1,50 @@
+from dataclasses import dataclass, field
+
+from config import settings
+
+
+DEFAULT_ACCOUNT_ID = 'default'
+
+
+@dataclass(frozen=True)
+class Account:
+    """Кабинет продавца WB: идентификатор для БД и токен API."""
+
+    id: str
+    token: str = field(repr=False)
+
+
+def get_accounts() -> list[Account]:
+    """Реестр кабинетов из `ACCOUNTS`; если он пуст - один кабинет `default` с `TOKEN`."""
+    if settings.wb.ACCOUNTS:
+        return [
+            Account(
+                id=account_id,
+                token=token.get_secret_value()
+            )
+            for account_id, token in settings.wb.ACCOUNTS.items()
+        ]
+
+    return [
+        Account(
+            id=DEFAULT_ACCOUNT_ID,
+            token=settings.wb.TOKEN.get_secret_value()
+        )
+    ]
+
+
+def get_account(
+    account_id: str | None = None
+) -> Account:
+    accounts = get_accounts()
+
+    if account_id is None:
+        return accounts[0]
+
+    for account in accounts:
+        if account.id == account_id:
+            return account
+
+    raise KeyError(
+        f'Unknown account: {account_id}'
+    )
@@ -1,12 +1,28 @@
+import hashlib
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from time import sleep
-from typing import Literal
+from time import monotonic, sleep
+from typing import Any, BinaryIO, Callable, Generator, Iterator, Literal
+from urllib.parse import urlsplit, urlunsplit
 
 from requests import RequestException
 
 from config import settings
 import requests
 
+from logs import app_logger
+from wb.cache import FileTTLStore
+from wb.circuit_breaker import CircuitBreaker
+from wb.json_stream import JsonArrayDecoder
+from wb.metrics import ApiMetrics
+from wb.pagination import Page
+from wb.payload import ACCEPT_ENCODING, DecodeTimer, PayloadStats, loads
+from wb.rate_limiter import RateLimiter, RateQuota
+from wb.response_cache import CachedResponse, ResponseCache
+from wb.retry import DEFAULT_RETRY_POLICY, IDEMPOTENT_METHODS, RetryPolicy
+from wb.session_pool import SessionPool
+
 
 class WBCategory(str, Enum):
     CONTENT = 'Контент'
@@ -28,7 +44,149 @@ class TokenValidationError(Exception):
     pass
 
 
-class WBApi:
+class RequestStep(Enum):
+    """Шаги `BaseWBApi._request_policy`, которые исполняет транспорт."""
+
+    CHECK_CIRCUIT = 'check_circuit'
+    ACQUIRE = 'acquire'
+    SEND = 'send'
+    RETRY = 'retry'
+    CLOSE = 'close'
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def stand_in_url(
+    url: str
+) -> str:
+    """Перенаправляет запрос на локальный стенд WB API (`API_STAND_IN_URL`).
+
+    Исходный хост становится первым сегментом пути, чтобы стенд знал категорию API:
+    https://common-api.wildberries.ru/ping -> http://127.0.0.1:8800/common-api.wildberries.ru/ping
+    """
+    stand_in = urlsplit(settings.wb.API_STAND_IN_URL)
+    parts = urlsplit(url)
+
+    return urlunsplit(
+        (
+            stand_in.scheme,
+            stand_in.netloc,
+            f'{stand_in.path.rstrip("/")}/{parts.netloc}{parts.path}',
+            parts.query,
+            parts.fragment,
+        )
+    )
+
+
+def open_destination(
+    destination: str | BinaryIO
+):
+    """Путь открывается на запись, уже открытый файл отдаётся как есть и не закрывается."""
+    if isinstance(destination, str):
+        return open(destination, 'wb')
+
+    return nullcontext(destination)
+
+
+def _not_empty(
+    data
+):
+    if data:
+        return data
+
+    raise RequestException(
+        f'Data is none'
+    )
+
+
+def _not_empty_key(
+    key: str
+) -> Callable:
+    def extract(
+        data
+    ):
+        if data:
+            value = data.get(key)
+            if value:
+                return value
+
+        raise RequestException(
+            f'Data is none'
+        )
+
+    return extract
+
+
+def _key_of_not_empty(
+    key: str
+) -> Callable:
+    def extract(
+        data
+    ):
+        if data:
+            return data.get(key)
+
+        raise RequestException(
+            f'Data is none'
+        )
+
+    return extract
+
+
+def _tariffs_warehouse_list(
+    data
+):
+    if data:
+        response_data = data.get('response')
+        if response_data:
+            unpacked_data = response_data.get('data')
+            if unpacked_data:
+                return unpacked_data.get('warehouseList')
+
+    raise RequestException(
+        f'Data is none'
+    )
+
+
+def _extended_report_status(
+    report_uuid: str
+):
+    def extract(
+        data
+    ):
+        for report in data.get('data') or []:
+            if report.get('id') == report_uuid:
+                return report
+
+        raise RequestException(
+            f'Report {report_uuid} not found'
+        )
+
+    return extract
+
+
+def _paid_storage_task_id(
+    data
+):
+    data = data.get('data')
+
+    if data:
+        return data.get('taskId')
+
+    raise RequestException(
+        f'Data is none'
+    )
+
+
+class BaseWBApi:
+    """Общая поверхность эндпоинтов WB API.
+
+    Эндпоинты описывают запрос и способ распаковки ответа через `_call`, а транспорт
+    (синхронный `WBApi` или асинхронный `AsyncWBApi`) решает, как его отправить.
+    Для `AsyncWBApi` каждый такой метод возвращает корутину.
+    """
+
     BASE_URL: str = settings.wb.BASE_URL
 
     CATEGORY_PING_URLS = {
@@ -47,6 +205,87 @@ class WBApi:
         WBCategory.COMMON: 'https://common-api.wildberries.ru/ping',
     }
 
+    HOST_CATEGORIES = {
+        urlsplit(ping_url).netloc: category for category, ping_url in CATEGORY_PING_URLS.items()
+    }
+
+    RATE_QUOTAS = {
+        WBCategory.STATISTICS: {
+            '*': RateQuota(requests=1, period=60),
+        },
+        WBCategory.PROMOTION: {
+            'adv/v3/fullstats': RateQuota(requests=3, period=60),
+            'adv/v1/promotion/count': RateQuota(requests=5, period=1, burst=5),
+            'adv/v1/upd': RateQuota(requests=1, period=1),
+            '*': RateQuota(requests=5, period=1, burst=5),
+        },
+        WBCategory.ANALYTICS: {
+            'api/v2/nm-report/detail/history': RateQuota(requests=3, period=60, burst=3),
+            'api/v2/nm-report/downloads*': RateQuota(requests=3, period=60, burst=3),
+            'api/v1/paid_storage/tasks/*/status': RateQuota(requests=1, period=5),
+            'api/v1/acceptance_report/tasks/*/status': RateQuota(requests=1, period=5),
+            '*': RateQuota(requests=1, period=60),
+        },
+        WBCategory.CONTENT: {
+            '*': RateQuota(requests=100, period=60, burst=5),
+        },
+        WBCategory.MARKETPLACE: {
+            '*': RateQuota(requests=300, period=60, burst=20),
+        },
+        WBCategory.COMMON: {
+            'api/v1/tariffs/commission': RateQuota(requests=1, period=60),
+            'api/v1/seller-info': RateQuota(requests=1, period=60),
+            '*': RateQuota(requests=60, period=60, burst=5),
+        },
+    }
+
+    RETRY_POLICY: RetryPolicy = DEFAULT_RETRY_POLICY
+
+    PAYLOAD_STATS = PayloadStats()
+
+    TOKEN_CHECK_STORE = FileTTLStore(
+        directory=settings.wb.CACHE_DIR,
+        namespace='token_check'
+    )
+
+    # справочные данные меняются редко: тарифы и склады - раз в сутки, карточки - чаще
+    RESPONSE_CACHE_TTLS = {
+        'api/v1/tariffs/commission': 24 * 60 * 60,
+        'api/v1/tariffs/box': 6 * 60 * 60,
+        'api/v1/tariffs/pallet': 6 * 60 * 60,
+        'api/v3/warehouses': 6 * 60 * 60,
+        'api/v1/seller-info': 24 * 60 * 60,
+        'content/v2/get/cards/list': 60 * 60,
+    }
+
+    RESPONSE_CACHE = ResponseCache(
+        store=FileTTLStore(
+            directory=settings.wb.CACHE_DIR,
+            namespace='responses'
+        ),
+        ttls=RESPONSE_CACHE_TTLS,
+        enabled=settings.wb.RESPONSE_CACHE_ENABLED,
+    )
+
+    RATE_LIMITER = RateLimiter(
+        host_categories=HOST_CATEGORIES,
+        quotas=RATE_QUOTAS,
+        default_quota=RateQuota(requests=1, period=1),
+        enabled=settings.wb.RATE_LIMIT_ENABLED,
+    )
+
+    METRICS = ApiMetrics(
+        host_categories=HOST_CATEGORIES,
+        payload_stats=PAYLOAD_STATS,
+    )
+
+    CIRCUIT_BREAKER = CircuitBreaker(
+        host_categories=HOST_CATEGORIES,
+        failure_threshold=settings.wb.CIRCUIT_BREAKER_FAILURES,
+        cooldown=settings.wb.CIRCUIT_BREAKER_COOLDOWN,
+        enabled=settings.wb.CIRCUIT_BREAKER_ENABLED,
+    )
+
     def __init__(
         self,
         token: str | None = None
@@ -56,49 +295,370 @@ class WBApi:
         else:
             self._token = token
 
-    def validate_token(
+    @classmethod
+    def fan_out_concurrency(
+        cls,
+        url: str,
+        cap: int | None = None
+    ) -> int:
+        """Сколько запросов к эндпоинту держать в полёте одновременно.
+
+        Больше, чем квота пропускает за период, смысла нет: лишние запросы всё равно
+        встанут в очередь лимитера и только займут соединения.
+        """
+        quota = cls.RATE_LIMITER.quota_for(
+            url=url
+        )
+
+        return max(1, min(cap or settings.wb.FAN_OUT_CONCURRENCY, quota.requests))
+
+    def _call(
+        self,
+        method: str,
+        endpoint: str,
+        base_url: str | None = None,
+        extract: Callable | None = None,
+        **kwargs
+    ):
+        raise NotImplementedError
+
+    def _prepare_request(
+        self,
+        method: str,
+        endpoint: str,
+        base_url: str | None = None,
+
+        data: dict = None,
+        json_data: dict | list = None,
+        params: dict = None,
+        headers: dict = None,
+    ) -> dict:
+        if headers is None:
+            headers = {
+                'Authorization': self._token
+            }
+
+        headers = {
+            'Accept-Encoding': ACCEPT_ENCODING,
+            **headers,
+        }
+
+        url = f'{self.BASE_URL}/{endpoint}' if base_url is None else f'{base_url}/{endpoint}'
+
+        return {
+            'method': method,
+            'url': url,
+            'headers': headers if headers else None,
+            'json': json_data if json_data else None,
+            'data': data if data else None,
+            'params': params if params else None,
+        }
+
+    def _cached_response(
+        self,
+        request_kwargs: dict,
+        use_cache: bool = True
+    ) -> tuple[str | None, CachedResponse | None]:
+        """Ищет ответ в кэше справочных эндпоинтов.
+
+        Протухшая запись с ETag/Last-Modified превращает запрос в условный. При
+        `use_cache=False` кэш не читается, но свежий ответ всё равно в него запишется.
+        """
+        cache_key = self.RESPONSE_CACHE.key_for(
+            account=self.account,
+            request_kwargs=request_kwargs
+        )
+
+        if cache_key is None or not use_cache:
+            return cache_key, None
+
+        cached = self.RESPONSE_CACHE.get(
+            key=cache_key
+        )
+
+        if cached is not None and not cached.is_fresh:
+            request_kwargs['headers'] = {
+                **(request_kwargs['headers'] or {}),
+                **cached.conditional_headers(),
+            }
+
+        return cache_key, cached
+
+    @staticmethod
+    def _unpack_response(
+        response
+    ):
+        match response.status_code:
+            case 200:
+                return loads(response.content)
+            case 204:
+                raise RequestException('No content')
+            case 401:
+                raise RequestException(f'{response.text}')
+            case _:
+                raise RequestException(f'Unexpected status code - {response.status_code}, error: {response.text}')
+
+    def _next_retry_delay(
+        self,
+        retry_policy: RetryPolicy,
+        attempt: int,
+        started_at: float,
+        idempotent: bool,
+        url: str,
+        reason: str,
+        status_code: int | None = None,
+        transport_error: bool = False,
+    ) -> float | None:
+        if status_code is not None and not retry_policy.is_retryable_status(status_code=status_code):
+            return None
+
+        delay = retry_policy.next_delay(
+            attempt=attempt,
+            elapsed=monotonic() - started_at,
+            idempotent=idempotent,
+            status_code=status_code,
+            transport_error=transport_error,
+            paced=self.RATE_LIMITER.enabled,
+        )
+
+        if delay is not None:
+            self.METRICS.observe_retry(
+                url=url,
+                delay=delay
+            )
+
+            app_logger.warning(
+                msg=f'Retry {attempt + 1} for {url} in {delay:.1f}s, reason: {reason}'
+            )
+
+        return delay
+
+    def _request_policy(
+        self,
+        url: str,
+        method: str,
+        retry_policy: RetryPolicy | None = None,
+        idempotent: bool | None = None,
+    ) -> Generator[tuple[RequestStep, Any], Any, Any]:
+        """Политика запроса без ввода-вывода, общая для `WBApi` и `AsyncWBApi`.
+
+        Генератор решает, что делать дальше, а транспорт исполняет его шаги и отдаёт
+        обратно результат: `CHECK_CIRCUIT` - проверить брейкер категории, `ACQUIRE` -
+        дождаться лимитера (результат - секунды ожидания), `SEND` - отправить запрос
+        (результат - ответ или исключение транспорта), `RETRY` - закрыть ответ, если он
+        есть, и подождать, `CLOSE` - закрыть ответ. Возвращает ответ, который больше
+        не нужно повторять.
+        """
+        retry_policy = retry_policy or self.RETRY_POLICY
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        started_at = monotonic()
+        attempt = 0
+
+        while True:
+            yield RequestStep.CHECK_CIRCUIT, None
+
+            self.METRICS.observe_rate_limit_wait(
+                url=url,
+                seconds=(yield RequestStep.ACQUIRE, None)
+            )
+
+            attempt_started_at = monotonic()
+            outcome = yield RequestStep.SEND, None
+
+            if isinstance(outcome, Exception):
+                self.METRICS.observe_request(
+                    url=url,
+                    seconds=monotonic() - attempt_started_at
+                )
+                self.CIRCUIT_BREAKER.record(
+                    url=url
+                )
+
+                delay = self._next_retry_delay(
+                    retry_policy=retry_policy,
+                    attempt=attempt,
+                    started_at=started_at,
+                    idempotent=idempotent,
+                    url=url,
+                    reason=str(outcome),
+                    transport_error=True,
+                )
+                if delay is None:
+                    raise outcome
+
+                yield RequestStep.RETRY, (delay, None)
+                attempt += 1
+                continue
+
+            response = outcome
+
+            self.METRICS.observe_request(
+                url=url,
+                seconds=monotonic() - attempt_started_at,
+                status_code=response.status_code
+            )
+            self.CIRCUIT_BREAKER.record(
+                url=url,
+                status_code=response.status_code
+            )
+
+            self.RATE_LIMITER.update(
+                url=url,
+                status_code=response.status_code,
+                headers=response.headers,
+                account=self.account
+            )
+
+            delay = self._next_retry_delay(
+                retry_policy=retry_policy,
+                attempt=attempt,
+                started_at=started_at,
+                idempotent=idempotent,
+                url=url,
+                reason=f'status {response.status_code}',
+                status_code=response.status_code,
+            )
+            if delay is None:
+                break
+
+            yield RequestStep.RETRY, (delay, response)
+            attempt += 1
+
+        if response.status_code == 429:
+            yield RequestStep.CLOSE, response
+            raise RequestException('Maximum retries exceeded.')
+
+        return response
+
+    def _revalidated_body(
+        self,
+        url: str,
+        cache_key: str,
+        cached: CachedResponse,
+        response
+    ):
+        self.RESPONSE_CACHE.revalidated(
+            key=cache_key,
+            url=url,
+            cached=cached,
+            headers=response.headers
+        )
+
+        return cached.body
+
+    def _decode_response(
+        self,
+        url: str,
+        cache_key: str | None,
+        response,
+        wire_bytes: Callable[[], int]
+    ):
+        with DecodeTimer() as decode_timer:
+            data = self._unpack_response(
+                response=response
+            )
+
+        self.PAYLOAD_STATS.record(
+            url=url,
+            wire_bytes=wire_bytes(),
+            decoded_bytes=len(response.content),
+            decode_seconds=decode_timer.seconds
+        )
+
+        if cache_key is not None:
+            self.RESPONSE_CACHE.set(
+                key=cache_key,
+                url=url,
+                body=data,
+                headers=response.headers
+            )
+
+        return data
+
+    @property
+    def account(
+        self
+    ) -> str:
+        """Стабильный идентификатор аккаунта продавца без раскрытия токена."""
+        return hashlib.sha256(self._token.encode('utf-8')).hexdigest()[:16]
+
+    def _token_check_key(
+        self,
+        category: WBCategory
+    ) -> str:
+        return f'{self.account}:{category.name}'
+
+    def _cached_ping_errors(
         self,
         required_categories: list[WBCategory],
-        return_inaccessible_categories_str: bool = False,
-    ) -> dict[str, any]:
-        inaccessible_categories = []
-        accessible_categories = []
+        use_cache: bool = True
+    ) -> tuple[dict, list[WBCategory]]:
         errors = {}
+        categories_to_ping = []
 
         for category in required_categories:
             if category not in self.CATEGORY_PING_URLS:
                 errors[category] = f'Неизвестная категория: {category.value}'
-                inaccessible_categories.append(category)
                 continue
 
-            ping_url = self.CATEGORY_PING_URLS[category]
+            cached = self.TOKEN_CHECK_STORE.get(
+                key=self._token_check_key(category=category)
+            ) if use_cache else None
 
-            try:
-                response = requests.get(
-                    url=ping_url,
-                    headers={'Authorization': self._token},
-                    timeout=10
-                )
+            if cached is None:
+                categories_to_ping.append(category)
+            elif cached.get('error'):
+                errors[category] = cached.get('error')
 
-                match response.status_code:
-                    case 200:
-                        accessible_categories.append(category)
-                    case 401:
-                        error_msg = f'Токен не авторизован для категории "{category.value}"'
-                        errors[category] = error_msg
-                        inaccessible_categories.append(category)
-                    case 403:
-                        error_msg = f'Доступ к категории "{category.value}" запрещён'
-                        errors[category] = error_msg
-                        inaccessible_categories.append(category)
-                    case _:
-                        error_msg = f'Ошибка проверки категории "{category.value}": статус {response.status_code}'
-                        errors[category] = error_msg
-                        inaccessible_categories.append(category)
-            except requests.exceptions.RequestException as e:
-                error_msg = f'Ошибка соединения с API для категории "{category.value}": {str(e)}'
-                errors[category] = error_msg
-                inaccessible_categories.append(category)
+        return errors, categories_to_ping
+
+    def _ping_verdict(
+        self,
+        category: WBCategory,
+        status_code: int
+    ) -> str | None:
+        error = self._ping_error(
+            category=category,
+            status_code=status_code
+        )
+
+        # Кэшируем только однозначный ответ API, сбои соединения и 5xx перепроверяем
+        if status_code in (200, 401, 403):
+            self.TOKEN_CHECK_STORE.set(
+                key=self._token_check_key(category=category),
+                value={
+                    'error': error
+                },
+                ttl=settings.wb.TOKEN_CHECK_CACHE_TTL
+            )
+
+        return error
+
+    @staticmethod
+    def _ping_error(
+        category: WBCategory,
+        status_code: int
+    ) -> str | None:
+        match status_code:
+            case 200:
+                return None
+            case 401:
+                return f'Токен не авторизован для категории "{category.value}"'
+            case 403:
+                return f'Доступ к категории "{category.value}" запрещён'
+            case _:
+                return f'Ошибка проверки категории "{category.value}": статус {status_code}'
+
+    @staticmethod
+    def _validation_result(
+        required_categories: list[WBCategory],
+        errors: dict,
+        return_inaccessible_categories_str: bool = False,
+    ) -> dict[str, any]:
+        inaccessible_categories = [category for category in required_categories if category in errors]
+        accessible_categories = [category for category in required_categories if category not in errors]
 
         result = {
             'valid': len(inaccessible_categories) == 0,
@@ -117,90 +677,52 @@ class WBApi:
 
         return result
 
-    def __request(
-        self,
-        method: str,
-        endpoint: str,
-        base_url: str | None = None,
-
-        data: dict = None,
-        json_data: dict | list = None,
-        params: dict = None,
-        headers: dict = None,
-        retries: int = 30,
-        backoff_time: int = 60,
-    ):
-        if data is None:
-            data = {}
-
-        if json_data is None:
-            json_data = {}
-
-        if params is None:
-            params = {}
-
-        if headers is None:
-            headers = {
-                'Authorization': self._token
+    @staticmethod
+    def _cards_list_body() -> dict:
+        return {
+            'settings': {
+                'cursor': {
+                    'limit': 100
+                },
+                'filter': {
+                    'withPhoto': 1
+                }
             }
+        }
 
-        url = f'{self.BASE_URL}/{endpoint}' if base_url is None else f'{base_url}/{endpoint}'
+    @staticmethod
+    def _cards_page(
+        response: dict,
+        limit: int
+    ) -> tuple[Page, bool]:
+        cursor = response.get('cursor', {})
 
-        response = requests.request(
-            method=method,
-            url=url,
-            headers=headers if headers else None,
-            json=json_data if json_data else None,
-            data=data if data else None,
-            params=params if params else None
+        page = Page(
+            items=response.get('cards', []),
+            cursor={
+                'updatedAt': cursor.get('updatedAt'),
+                'nmID': cursor.get('nmID'),
+            }
         )
 
-        match response.status_code:
-            case 200:
-                return response.json()
-            case 204:
-                raise RequestException('No content')
-            case 401:
-                raise RequestException(f'{response.text}')
-            case 429:
-                sleep(backoff_time)
-                if retries > 0:
-                    return self.__request(
-                        method=method,
-                        base_url=base_url,
-                        endpoint=endpoint,
-                        headers=headers,
-                        json_data=json_data,
-                        data=data,
-                        params=params,
-                        retries=retries - 1,
-                        backoff_time=backoff_time
-                    )
-                else:
-                    raise RequestException('Maximum retries exceeded.')
-            case _:
-                raise RequestException(f'Unexpected status code - {response.status_code}, error: {response.text}')
+        return page, (cursor.get('total') or 0) >= limit
 
     def supplier_stocks(
         self,
         date_from: str = '2018-01-01',
         endpoint: str = 'api/v1/supplier/stocks',
+        stream: bool = False,
     ):
         params = {
             'dateFrom': date_from,
         }
 
-        data = self.__request(
+        return self._call(
             method='GET',
             endpoint=endpoint,
             params=params,
-        )
-
-        if data:
-            return data
-
-        raise RequestException(
-            f'Data is none'
+            extract=None if stream else _not_empty,
+            stream=stream,
         )
 
     def advert_list(
@@ -208,19 +730,11 @@ class WBApi:
         endpoint: str = 'adv/v1/promotion/count',
         url: str = 'https://advert-api.wildberries.ru'
     ):
-        data = self.__request(
+        return self._call(
             method='GET',
             base_url=url,
             endpoint=endpoint,
-        )
-
-        if data:
-            adverts = data.get('adverts')
-            if adverts:
-                return adverts
-
-        raise RequestException(
-            f'Data is none'
+            extract=_not_empty_key('adverts'),
         )
 
     def advert_full_stats(
@@ -231,6 +745,7 @@ class WBApi:
 
         endpoint: str = 'adv/v3/fullstats',
         url: str = 'https://advert-api.wildberries.ru',
+        retry_policy: RetryPolicy | None = None,
     ):
         params = {
             'ids': ','.join(str(ad_id) for ad_id in advert_ids),
@@ -238,81 +753,14 @@ class WBApi:
             'endDate': interval_end
         }
 
-        data = self.__request(
+        return self._call(
             method='GET',
             base_url=url,
             params=params,
-            endpoint=endpoint
-        )
-
-        if data:
-            return data
-
-        raise RequestException(
-            f'Data is none'
-        )
-
-    def cards_list(
-        self,
-        endpoint: str = 'content/v2/get/cards/list',
-        base_url: str = 'https://content-api.wildberries.ru',
-    ):
-        body = {
-            'settings': {
-                'cursor': {
-                    'limit': 100
-                },
-                'filter': {
-                    'withPhoto': 1
-                }
-            }
-        }
-
-        result = []
-
-        response = self.__request(
-            method='POST',
-            base_url=base_url,
             endpoint=endpoint,
-            json_data=body
+            extract=_not_empty,
+            retry_policy=retry_policy,
         )
-        result.extend(response.get('cards', []))
-
-        cursor = response.get('cursor', {})
-        while cursor.get('total') == 100:
-            body['settings']['cursor'].update(
-                {
-                    'updatedAt': cursor.get('updatedAt'),
-                    'nmID': cursor.get('nmID')
-                }
-            )
-
-            response = self.__request(
-                method='POST',
-                base_url=base_url,
-                endpoint=endpoint,
-                json_data=body
-            )
-            result.extend(response.get('cards', []))
-            cursor = response.get('cursor', {})
-
-        if cursor.get('total') and cursor.get('total') != 0:
-            body['settings']['cursor'].update(
-                {
-                    'limit': cursor.get('total'),
-                    'updatedAt': cursor.get('updatedAt'),
-                    'nmID': cursor.get('nmID')
-                }
-            )
-            response = self.__request(
-                method='POST',
-                base_url=base_url,
-                endpoint=endpoint,
-                json_data=body
-            )
-            result.extend(response.get('cards', []))
-
-        return result
 
     def advert_nm_report(
         self,
@@ -322,6 +770,7 @@ class WBApi:
 
         url: str = 'https://seller-analytics-api.wildberries.ru',
         endpoint: str = 'api/v2/nm-report/detail/history',
+        retry_policy: RetryPolicy | None = None,
     ):
         json_data = {
             'nmIDs': nmids,
@@ -331,18 +780,14 @@ class WBApi:
             }
         }
 
-        data = self.__request(
+        return self._call(
             method='POST',
             base_url=url,
             endpoint=endpoint,
             json_data=json_data,
-        )
-
-        if data:
-            return data.get('data')
-
-        raise RequestException(
-            f'Data is none'
+            extract=_key_of_not_empty('data'),
+            retry_policy=retry_policy,
+            idempotent=True,
         )
 
     def tariffs_box_and_pallet(
@@ -354,27 +799,19 @@ class WBApi:
             'pallet',
         ] = 'box',
         url: str = 'https://common-api.wildberries.ru/api/v1/tariffs',
+        use_cache: bool = True,
     ):
         params = {
             'date': date,
         }
 
-        data = self.__request(
+        return self._call(
             method='GET',
             base_url=url,
             endpoint=endpoint,
             params=params,
-        )
-
-        if data:
-            response_data = data.get('response')
-            if response_data:
-                unpacked_data = response_data.get('data')
-                if unpacked_data:
-                    return unpacked_data.get('warehouseList')
-
-        raise RequestException(
-            f'Data is none'
+            extract=_tariffs_warehouse_list,
+            use_cache=use_cache,
         )
 
     def tariffs_commission(
@@ -386,23 +823,19 @@ class WBApi:
         ] = 'ru',
         url: str = 'https://common-api.wildberries.ru',
         endpoint: str = 'api/v1/tariffs/commission',
+        use_cache: bool = True,
     ):
         params = {
             'locale': locale,
         }
 
-        data = self.__request(
+        return self._call(
             method='GET',
             base_url=url,
             endpoint=endpoint,
             params=params,
-        )
-
-        if data:
-            return data.get('report')
-
-        raise RequestException(
-            f'Data is none'
+            extract=_key_of_not_empty('report'),
+            use_cache=use_cache,
         )
 
     def uuid_for_paid_storage(
@@ -418,68 +851,42 @@ class WBApi:
             'dateTo': date_to
         }
 
-        data = self.__request(
+        return self._call(
             method='GET',
             base_url=url,
             endpoint=endpoint,
             params=params,
-        ).get('data')
-
-        if data:
-            return data.get('taskId')
-
-        raise RequestException(
-            f'Data is none'
-        )
-
-    def check_status_paid_storage(
-        self,
-        task_id: str,
-
-        url: str = 'https://seller-analytics-api.wildberries.ru',
-        endpoint: str = 'api/v1/paid_storage/tasks/{task_id}/status'
-    ):
-        while True:
-            data = self.__request(
-                method='GET',
-                base_url=url,
-                endpoint=endpoint.format(task_id=task_id)
-            ).get('data')
-
-            if data:
-                status = data.get('status')
-
-                if status.lower() == 'done':
-                    return 'ok'
-                elif status is None:
-                    raise RequestException(
-                        'Status is not available'
-                    )
-            else:
-                raise RequestException(
-                    'Data is None'
-                )
-
-            sleep(5)
+            extract=_paid_storage_task_id,
+        )
 
-    def paid_storage(
+    def paid_storage_status(
         self,
         task_id: str,
 
         url: str = 'https://seller-analytics-api.wildberries.ru',
-        endpoint: str = 'api/v1/paid_storage/tasks/{task_id}/download'
+        endpoint: str = 'api/v1/paid_storage/tasks/{task_id}/status'
     ):
-        data = self.__request(
+        return self._call(
             method='GET',
             base_url=url,
-            endpoint=endpoint.format(task_id=task_id)
+            endpoint=endpoint.format(task_id=task_id),
+            extract=_key_of_not_empty('data'),
         )
 
-        if data:
-            return data
+    def paid_storage(
+        self,
+        task_id: str,
 
-        raise RequestException(
-            'Data is None'
+        url: str = 'https://seller-analytics-api.wildberries.ru',
+        endpoint: str = 'api/v1/paid_storage/tasks/{task_id}/download',
+        stream: bool = False,
+    ):
+        return self._call(
+            method='GET',
+            base_url=url,
+            endpoint=endpoint.format(task_id=task_id),
+            extract=None if stream else _not_empty,
+            stream=stream,
         )
 
     def supplier_sales(
@@ -487,60 +894,22 @@ class WBApi:
         date_from: str,
 
         url: str = 'https://statistics-api.wildberries.ru',
-        endpoint: str = 'api/v1/supplier/sales'
+        endpoint: str = 'api/v1/supplier/sales',
+        stream: bool = False,
     ):
         params = {
             'dateFrom': date_from,
         }
 
-        data = self.__request(
+        return self._call(
             method='GET',
             base_url=url,
             endpoint=endpoint,
             params=params,
+            extract=None if stream else _not_empty,
+            stream=stream,
         )
 
-        if data:
-            return data
-
-        raise RequestException(
-            f'Data is none'
-        )
-
-    def supplier_orders(
-        self,
-        date_from: str,
-        url: str = 'https://statistics-api.wildberries.ru',
-        endpoint: str = 'api/v1/supplier/orders',
-    ):
-        all_orders = []
-        current_date_from = date_from
-
-        while True:
-            params = {
-                'dateFrom': current_date_from,
-            }
-
-            data = self.__request(
-                method='GET',
-                base_url=url,
-                endpoint=endpoint,
-                params=params,
-            )
-
-            if not data:
-                break
-
-            all_orders.extend(data)
-
-            last_change_date = data[-1].get('lastChangeDate')
-            if not last_change_date:
-                break
-
-            current_date_from = last_change_date
-
-        return all_orders
-
     def create_extended_advert_nm_report(
         self,
         report_uuid: str,
@@ -568,67 +937,54 @@ class WBApi:
             }
         }
 
-        data = self.__request(
+        return self._call(
             method='POST',
             base_url=url,
             endpoint=endpoint,
             json_data=json_data,
+            extract=bool,
         )
 
-        if data:
-            return True
-
-        return False
-
-    def download_extended_advert_nm_report(
+    def extended_advert_nm_report_status(
         self,
         report_uuid: str,
-        save_path: str = 'report.zip'
+
+        url: str = 'https://seller-analytics-api.wildberries.ru',
+        endpoint: str = 'api/v2/nm-report/downloads'
     ):
-        headers = {
-            'Authorization': self._token
+        params = {
+            'filter[downloadIds]': report_uuid
         }
 
-        response = requests.get(
-            url=f'https://seller-analytics-api.wildberries.ru/api/v2/nm-report/downloads/file/{report_uuid}',
-            headers=headers,
-            stream=True
+        return self._call(
+            method='GET',
+            base_url=url,
+            endpoint=endpoint,
+            params=params,
+            extract=_extended_report_status(report_uuid),
         )
 
-        if response.status_code == 200:
-            with open(save_path, 'wb') as file:
-                for chunk in response.iter_content(chunk_size=8192):
-                    file.write(chunk)
-            return save_path
-
-        return None
-
     def get_stocks_fbs(
         self,
         warehouse_id: int,
         barcodes: list[int],
 
         url: str = 'https://marketplace-api.wildberries.ru',
-        endpoint: str = 'api/v3/stocks/{warehouse_id}'
+        endpoint: str = 'api/v3/stocks/{warehouse_id}',
+        retry_policy: RetryPolicy | None = None,
     ):
         json_data = {
             'skus': barcodes
         }
 
-        data = self.__request(
+        return self._call(
             method='POST',
             base_url=url,
             endpoint=endpoint.format(warehouse_id=warehouse_id),
-            json_data=json_data
-        )
-
-        if data:
-            stocks = data.get('stocks')
-            if stocks:
-                return stocks
-
-        raise RequestException(
-            f'Data is none'
+            json_data=json_data,
+            extract=_not_empty_key('stocks'),
+            retry_policy=retry_policy,
+            idempotent=True,
         )
 
     def get_id_acceptance_reports(
@@ -644,18 +1000,12 @@ class WBApi:
             'dateTo': date_to
         }
 
-        data = self.__request(
+        return self._call(
             method='GET',
             base_url=url,
             endpoint=endpoint,
             params=params,
-        )
-
-        if data:
-            return data.get('data')
-
-        raise RequestException(
-            f'Data is none'
+            extract=_key_of_not_empty('data'),
         )
 
     def get_status_acceptance_reports(
@@ -665,17 +1015,11 @@ class WBApi:
         url: str = 'https://seller-analytics-api.wildberries.ru',
         endpoint: str = 'api/v1/acceptance_report/tasks/{task_id}/status'
     ):
-        data = self.__request(
+        return self._call(
             method='GET',
             base_url=url,
-            endpoint=endpoint.format(task_id=task_id)
-        )
-
-        if data:
-            return data.get('data')
-
-        raise RequestException(
-            f'Data is none'
+            endpoint=endpoint.format(task_id=task_id),
+            extract=_key_of_not_empty('data'),
         )
 
     def get_acceptance_reports(
@@ -685,17 +1029,13 @@ class WBApi:
         url: str = 'https://seller-analytics-api.wildberries.ru',
         endpoint: str = 'api/v1/acceptance_report/tasks/{task_id}/download'
     ):
-        data = self.__request(
+        return self._call(
             method='GET',
             base_url=url,
-            endpoint=endpoint.format(task_id=task_id)
+            endpoint=endpoint.format(task_id=task_id),
+            extract=lambda data: data.get('report') if data else None,
         )
 
-        if data:
-            return data
-
-        return None
-
     def get_advert_cost(
         self,
         date_from: str,
@@ -709,48 +1049,407 @@ class WBApi:
             'to': date_to,
         }
 
-        data = self.__request(
+        return self._call(
             method='GET',
             base_url=url,
             endpoint=endpoint,
             params=params,
+            extract=_not_empty,
         )
 
-        if data:
-            return data
-
-        raise RequestException(f'Data is none')
-
     def get_warehouses(
         self,
         url: str = 'https://marketplace-api.wildberries.ru',
         endpoint: str = 'api/v3/warehouses',
+        use_cache: bool = True,
     ):
-        data = self.__request(
+        return self._call(
             method='GET',
             base_url=url,
             endpoint=endpoint,
-        )
-
-        if data:
-            return data
-
-        raise RequestException(
-            f'Data is none'
+            extract=_not_empty,
+            use_cache=use_cache,
         )
 
     def seller_info(
         self,
         url: str = 'https://common-api.wildberries.ru',
         endpoint: str = 'api/v1/seller-info',
+        use_cache: bool = True,
     ):
-        data = self.__request(
+        return self._call(
             method='GET',
             base_url=url,
             endpoint=endpoint,
+            extract=_not_empty,
+            use_cache=use_cache,
         )
 
-        if data:
-            return data
 
-        raise RequestException('Data is none')
+class WBApi(BaseWBApi):
+    SESSION_POOL = SessionPool(
+        hosts=[*BaseWBApi.CATEGORY_PING_URLS.values(), BaseWBApi.BASE_URL],
+        pool_connections=settings.wb.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=settings.wb.HTTP_POOL_MAXSIZE,
+        pool_block=settings.wb.HTTP_POOL_BLOCK,
+        max_age=settings.wb.HTTP_SESSION_MAX_AGE,
+        url_rewrite=stand_in_url if settings.wb.API_STAND_IN_URL else None,
+    )
+
+    def _ping(
+        self,
+        category: WBCategory
+    ) -> str | None:
+        try:
+            response = self.SESSION_POOL.request(
+                method='GET',
+                url=self.CATEGORY_PING_URLS[category],
+                headers={'Authorization': self._token},
+                timeout=10
+            )
+        except requests.exceptions.RequestException as e:
+            return f'Ошибка соединения с API для категории "{category.value}": {str(e)}'
+
+        return self._ping_verdict(
+            category=category,
+            status_code=response.status_code
+        )
+
+    def _check_circuit(
+        self,
+        url: str
+    ) -> None:
+        category = self.CIRCUIT_BREAKER.before_request(
+            url=url
+        )
+
+        if category is not None:
+            self.CIRCUIT_BREAKER.probe_finished(
+                category=category,
+                error=self._ping(category=category)
+            )
+
+    def validate_token(
+        self,
+        required_categories: list[WBCategory],
+        return_inaccessible_categories_str: bool = False,
+        use_cache: bool = True,
+    ) -> dict[str, any]:
+        errors, categories_to_ping = self._cached_ping_errors(
+            required_categories=required_categories,
+            use_cache=use_cache
+        )
+
+        if categories_to_ping:
+            with ThreadPoolExecutor(max_workers=len(categories_to_ping)) as executor:
+                verdicts = executor.map(self._ping, categories_to_ping)
+
+                for category, error in zip(categories_to_ping, verdicts):
+                    if error:
+                        errors[category] = error
+
+        return self._validation_result(
+            required_categories=required_categories,
+            errors=errors,
+            return_inaccessible_categories_str=return_inaccessible_categories_str
+        )
+
+    def __request(
+        self,
+        method: str,
+        endpoint: str,
+        base_url: str | None = None,
+
+        data: dict = None,
+        json_data: dict | list = None,
+        params: dict = None,
+        headers: dict = None,
+        retry_policy: RetryPolicy | None = None,
+        idempotent: bool | None = None,
+        stream: bool = False,
+        use_cache: bool = True,
+    ):
+        request_kwargs = self._prepare_request(
+            method=method,
+            endpoint=endpoint,
+            base_url=base_url,
+            data=data,
+            json_data=json_data,
+            params=params,
+            headers=headers,
+        )
+
+        cache_key, cached = (None, None) if stream else self._cached_response(
+            request_kwargs=request_kwargs,
+            use_cache=use_cache
+        )
+
+        if cached is not None and cached.is_fresh:
+            return cached.body
+
+        url = request_kwargs['url']
+
+        response = self._run_policy(
+            url=url,
+            method=method,
+            retry_policy=retry_policy,
+            idempotent=idempotent,
+            send=lambda: self.SESSION_POOL.request(
+                **request_kwargs,
+                timeout=settings.wb.HTTP_TIMEOUT,
+                stream=stream
+            )
+        )
+
+        if cached is not None and response.status_code == 304:
+            response.close()
+            return self._revalidated_body(
+                url=url,
+                cache_key=cache_key,
+                cached=cached,
+                response=response
+            )
+
+        if stream and response.status_code == 200:
+            return self._iter_response_items(
+                url=url,
+                response=response
+            )
+
+        return self._decode_response(
+            url=url,
+            cache_key=cache_key,
+            response=response,
+            wire_bytes=response.raw.tell
+        )
+
+    def _run_policy(
+        self,
+        url: str,
+        send: Callable[[], requests.Response],
+        **policy_kwargs
+    ) -> requests.Response:
+        """Синхронный транспорт для `_request_policy`."""
+        policy = self._request_policy(
+            url=url,
+            **policy_kwargs
+        )
+
+        outcome = None
+        while True:
+            try:
+                step, payload = policy.send(outcome)
+            except StopIteration as stop:
+                return stop.value
+
+            outcome = None
+
+            match step:
+                case RequestStep.CHECK_CIRCUIT:
+                    self._check_circuit(
+                        url=url
+                    )
+                case RequestStep.ACQUIRE:
+                    outcome = self.RATE_LIMITER.acquire(
+                        url=url,
+                        account=self.account
+                    )
+                case RequestStep.SEND:
+                    try:
+                        outcome = send()
+                    except (requests.ConnectionError, requests.Timeout) as e:
+                        outcome = e
+                case RequestStep.RETRY:
+                    delay, response = payload
+                    if response is not None:
+                        response.close()
+                    sleep(delay)
+                case RequestStep.CLOSE:
+                    payload.close()
+
+    def _iter_response_items(
+        self,
+        url: str,
+        response: requests.Response
+    ) -> Iterator:
+        decoder = JsonArrayDecoder()
+        decode_timer = DecodeTimer()
+        decoded_bytes = 0
+
+        try:
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                decoded_bytes += len(chunk)
+
+                with decode_timer:
+                    items = decoder.feed(chunk=chunk)
+                yield from items
+
+            with decode_timer:
+                items = decoder.close()
+            yield from items
+        finally:
+            response.close()
+
+            self.PAYLOAD_STATS.record(
+                url=url,
+                wire_bytes=response.raw.tell(),
+                decoded_bytes=decoded_bytes,
+                decode_seconds=decode_timer.seconds
+            )
+
+    def _call(
+        self,
+        method: str,
+        endpoint: str,
+        base_url: str | None = None,
+        extract: Callable | None = None,
+        **kwargs
+    ):
+        data = self.__request(
+            method=method,
+            endpoint=endpoint,
+            base_url=base_url,
+            **kwargs
+        )
+
+        return extract(data) if extract else data
+
+    def iter_cards(
+        self,
+        cursor: dict | None = None,
+        endpoint: str = 'content/v2/get/cards/list',
+        base_url: str = 'https://content-api.wildberries.ru',
+        use_cache: bool = True,
+    ) -> Iterator[Page]:
+        """Отдаёт карточки постранично.
+
+        Args:
+            cursor (dict | None): Курсор `updatedAt`/`nmID`, после которого продолжать.
+            endpoint (str): Эндпоинт списка карточек.
+            base_url (str): Хост Content API.
+
+        Returns:
+            Iterator[Page]: Страницы карточек с курсором для продолжения.
+        """
+        body = self._cards_list_body()
+        if cursor:
+            body['settings']['cursor'].update(cursor)
+
+        has_more = True
+        while has_more:
+            response = self.__request(
+                method='POST',
+                base_url=base_url,
+                endpoint=endpoint,
+                json_data=body,
+                idempotent=True,
+                use_cache=use_cache
+            )
+
+            page, has_more = self._cards_page(
+                response=response,
+                limit=body['settings']['cursor']['limit']
+            )
+            yield page
+
+            body['settings']['cursor'].update(page.cursor)
+
+    def cards_list(
+        self,
+        endpoint: str = 'content/v2/get/cards/list',
+        base_url: str = 'https://content-api.wildberries.ru',
+        use_cache: bool = True,
+    ):
+        return [
+            card
+            for page in self.iter_cards(endpoint=endpoint, base_url=base_url, use_cache=use_cache)
+            for card in page.items
+        ]
+
+    def iter_supplier_orders(
+        self,
+        date_from: str,
+        url: str = 'https://statistics-api.wildberries.ru',
+        endpoint: str = 'api/v1/supplier/orders',
+    ) -> Iterator[Page]:
+        """Отдаёт заказы постранично по `lastChangeDate`.
+
+        Курсор страницы - `lastChangeDate` её последнего заказа, он же `dateFrom` следующей.
+        """
+        current_date_from = date_from
+
+        while True:
+            params = {
+                'dateFrom': current_date_from,
+            }
+
+            orders = list(
+                self.__request(
+                    method='GET',
+                    base_url=url,
+                    endpoint=endpoint,
+                    params=params,
+                    stream=True,
+                )
+            )
+
+            if not orders:
+                break
+
+            last_change_date = orders[-1].get('lastChangeDate')
+            yield Page(
+                items=orders,
+                cursor=last_change_date
+            )
+
+            if not last_change_date:
+                break
+
+            current_date_from = last_change_date
+
+    def supplier_orders(
+        self,
+        date_from: str,
+        url: str = 'https://statistics-api.wildberries.ru',
+        endpoint: str = 'api/v1/supplier/orders',
+        stream: bool = False,
+    ):
+        orders = (
+            order
+            for page in self.iter_supplier_orders(date_from=date_from, url=url, endpoint=endpoint)
+            for order in page.items
+        )
+
+        return orders if stream else list(orders)
+
+    def download_extended_advert_nm_report(
+        self,
+        report_uuid: str,
+        save_path: str | BinaryIO = 'report.zip'
+    ):
+        headers = {
+            'Authorization': self._token
+        }
+
+        url = f'https://seller-analytics-api.wildberries.ru/api/v2/nm-report/downloads/file/{report_uuid}'
+
+        response = self._run_policy(
+            url=url,
+            method='GET',
+            send=lambda: self.SESSION_POOL.request(
+                method='GET',
+                url=url,
+                headers=headers,
+                timeout=settings.wb.HTTP_TIMEOUT,
+                stream=True
+            )
+        )
+
+        with response:
+            if response.status_code == 200:
+                with open_destination(destination=save_path) as file:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        file.write(chunk)
+                return save_path
+
+        return None
@@ -0,0 +1,569 @@
+import asyncio
+import queue
+import threading
+from contextlib import closing
+from typing import Any, AsyncIterator, Awaitable, BinaryIO, Callable, Iterable, Iterator
+
+import httpx
+
+from config import settings
+from logs import app_logger
+from wb.api import STREAM_CHUNK_SIZE, BaseWBApi, RequestStep, WBCategory, open_destination, stand_in_url
+from wb.json_stream import JsonArrayDecoder
+from wb.pagination import Page
+from wb.payload import DecodeTimer
+from wb.retry import RetryPolicy
+
+
+class AsyncWBApi(BaseWBApi):
+    """Асинхронный клиент WB API на пуле соединений `httpx.AsyncClient`.
+
+    Поверхность эндпоинтов общая с `WBApi`, но каждый метод возвращает корутину.
+    Клиент привязан к циклу событий, поэтому используется как контекстный менеджер:
+
+        async with AsyncWBApi() as wb:
+            stocks = await wb.get_stocks_fbs(warehouse_id=..., barcodes=...)
+    """
+
+    def __init__(
+        self,
+        token: str | None = None,
+        max_connections: int | None = None,
+    ):
+        super().__init__(
+            token=token
+        )
+
+        pool_maxsize = max_connections or settings.wb.HTTP_POOL_MAXSIZE
+
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=pool_maxsize,
+                max_keepalive_connections=pool_maxsize,
+                keepalive_expiry=settings.wb.HTTP_SESSION_MAX_AGE,
+            ),
+            timeout=settings.wb.HTTP_TIMEOUT,
+            event_hooks={
+                'request': [_route_to_stand_in] if settings.wb.API_STAND_IN_URL else [],
+            },
+        )
+
+    async def __aenter__(
+        self
+    ):
+        return self
+
+    async def __aexit__(
+        self,
+        *exc_info
+    ):
+        await self.aclose()
+
+    async def aclose(
+        self
+    ) -> None:
+        await self._client.aclose()
+
+    async def _ping(
+        self,
+        category: WBCategory
+    ) -> str | None:
+        try:
+            response = await self._client.get(
+                url=self.CATEGORY_PING_URLS[category],
+                headers={'Authorization': self._token},
+                timeout=10
+            )
+        except httpx.HTTPError as e:
+            return f'Ошибка соединения с API для категории "{category.value}": {str(e)}'
+
+        return self._ping_verdict(
+            category=category,
+            status_code=response.status_code
+        )
+
+    async def _check_circuit(
+        self,
+        url: str
+    ) -> None:
+        category = self.CIRCUIT_BREAKER.before_request(
+            url=url
+        )
+
+        if category is not None:
+            self.CIRCUIT_BREAKER.probe_finished(
+                category=category,
+                error=await self._ping(category=category)
+            )
+
+    async def validate_token(
+        self,
+        required_categories: list[WBCategory],
+        return_inaccessible_categories_str: bool = False,
+        use_cache: bool = True,
+    ) -> dict[str, any]:
+        errors, categories_to_ping = self._cached_ping_errors(
+            required_categories=required_categories,
+            use_cache=use_cache
+        )
+
+        verdicts = await asyncio.gather(
+            *(self._ping(category) for category in categories_to_ping)
+        )
+
+        for category, error in zip(categories_to_ping, verdicts):
+            if error:
+                errors[category] = error
+
+        return self._validation_result(
+            required_categories=required_categories,
+            errors=errors,
+            return_inaccessible_categories_str=return_inaccessible_categories_str
+        )
+
+    async def __request(
+        self,
+        method: str,
+        endpoint: str,
+        base_url: str | None = None,
+
+        data: dict = None,
+        json_data: dict | list = None,
+        params: dict = None,
+        headers: dict = None,
+        retry_policy: RetryPolicy | None = None,
+        idempotent: bool | None = None,
+        stream: bool = False,
+        use_cache: bool = True,
+    ):
+        request_kwargs = self._prepare_request(
+            method=method,
+            endpoint=endpoint,
+            base_url=base_url,
+            data=data,
+            json_data=json_data,
+            params=params,
+            headers=headers,
+        )
+
+        cache_key, cached = (None, None) if stream else self._cached_response(
+            request_kwargs=request_kwargs,
+            use_cache=use_cache
+        )
+
+        if cached is not None and cached.is_fresh:
+            return cached.body
+
+        url = request_kwargs['url']
+
+        response = await self._run_policy(
+            url=url,
+            method=method,
+            retry_policy=retry_policy,
+            idempotent=idempotent,
+            send=lambda: self._client.send(
+                self._client.build_request(**request_kwargs),
+                stream=stream
+            )
+        )
+
+        if cached is not None and response.status_code == 304:
+            await response.aclose()
+            return self._revalidated_body(
+                url=url,
+                cache_key=cache_key,
+                cached=cached,
+                response=response
+            )
+
+        if stream:
+            if response.status_code == 200:
+                return self._aiter_response_items(
+                    url=url,
+                    response=response
+                )
+
+            await response.aread()
+
+        return self._decode_response(
+            url=url,
+            cache_key=cache_key,
+            response=response,
+            wire_bytes=lambda: response.num_bytes_downloaded
+        )
+
+    async def _run_policy(
+        self,
+        url: str,
+        send: Callable[[], Awaitable[httpx.Response]],
+        **policy_kwargs
+    ) -> httpx.Response:
+        """Асинхронный транспорт для `_request_policy`."""
+        policy = self._request_policy(
+            url=url,
+            **policy_kwargs
+        )
+
+        outcome = None
+        while True:
+            try:
+                step, payload = policy.send(outcome)
+            except StopIteration as stop:
+                return stop.value
+
+            outcome = None
+
+            match step:
+                case RequestStep.CHECK_CIRCUIT:
+                    await self._check_circuit(
+                        url=url
+                    )
+                case RequestStep.ACQUIRE:
+                    outcome = await self.RATE_LIMITER.acquire_async(
+                        url=url,
+                        account=self.account
+                    )
+                case RequestStep.SEND:
+                    try:
+                        outcome = await send()
+                    except httpx.TransportError as e:
+                        outcome = e
+                case RequestStep.RETRY:
+                    delay, response = payload
+                    if response is not None:
+                        await response.aclose()
+                    await asyncio.sleep(delay)
+                case RequestStep.CLOSE:
+                    await payload.aclose()
+
+    async def _aiter_response_items(
+        self,
+        url: str,
+        response: httpx.Response
+    ) -> AsyncIterator:
+        decoder = JsonArrayDecoder()
+        decode_timer = DecodeTimer()
+        decoded_bytes = 0
+
+        try:
+            async for chunk in response.aiter_bytes(chunk_size=STREAM_CHUNK_SIZE):
+                decoded_bytes += len(chunk)
+
+                with decode_timer:
+                    items = decoder.feed(chunk=chunk)
+                for item in items:
+                    yield item
+
+            with decode_timer:
+                items = decoder.close()
+            for item in items:
+                yield item
+        finally:
+            await response.aclose()
+
+            self.PAYLOAD_STATS.record(
+                url=url,
+                wire_bytes=response.num_bytes_downloaded,
+                decoded_bytes=decoded_bytes,
+                decode_seconds=decode_timer.seconds
+            )
+
+    async def _call(
+        self,
+        method: str,
+        endpoint: str,
+        base_url: str | None = None,
+        extract: Callable | None = None,
+        **kwargs
+    ):
+        data = await self.__request(
+            method=method,
+            endpoint=endpoint,
+            base_url=base_url,
+            **kwargs
+        )
+
+        return extract(data) if extract else data
+
+    async def iter_cards(
+        self,
+        cursor: dict | None = None,
+        endpoint: str = 'content/v2/get/cards/list',
+        base_url: str = 'https://content-api.wildberries.ru',
+        use_cache: bool = True,
+    ) -> AsyncIterator[Page]:
+        body = self._cards_list_body()
+        if cursor:
+            body['settings']['cursor'].update(cursor)
+
+        has_more = True
+        while has_more:
+            response = await self.__request(
+                method='POST',
+                base_url=base_url,
+                endpoint=endpoint,
+                json_data=body,
+                idempotent=True,
+                use_cache=use_cache
+            )
+
+            page, has_more = self._cards_page(
+                response=response,
+                limit=body['settings']['cursor']['limit']
+            )
+            yield page
+
+            body['settings']['cursor'].update(page.cursor)
+
+    async def cards_list(
+        self,
+        endpoint: str = 'content/v2/get/cards/list',
+        base_url: str = 'https://content-api.wildberries.ru',
+        use_cache: bool = True,
+    ):
+        return [
+            card
+            async for page in self.iter_cards(endpoint=endpoint, base_url=base_url, use_cache=use_cache)
+            for card in page.items
+        ]
+
+    async def iter_supplier_orders(
+        self,
+        date_from: str,
+        url: str = 'https://statistics-api.wildberries.ru',
+        endpoint: str = 'api/v1/supplier/orders',
+    ) -> AsyncIterator[Page]:
+        current_date_from = date_from
+
+        while True:
+            params = {
+                'dateFrom': current_date_from,
+            }
+
+            orders = [
+                order
+                async for order in await self.__request(
+                    method='GET',
+                    base_url=url,
+                    endpoint=endpoint,
+                    params=params,
+                    stream=True,
+                )
+            ]
+
+            if not orders:
+                break
+
+            last_change_date = orders[-1].get('lastChangeDate')
+            yield Page(
+                items=orders,
+                cursor=last_change_date
+            )
+
+            if not last_change_date:
+                break
+
+            current_date_from = last_change_date
+
+    async def _stream_supplier_orders(
+        self,
+        date_from: str,
+        url: str,
+        endpoint: str,
+    ) -> AsyncIterator[dict]:
+        async for page in self.iter_supplier_orders(date_from=date_from, url=url, endpoint=endpoint):
+            for order in page.items:
+                yield order
+
+    async def supplier_orders(
+        self,
+        date_from: str,
+        url: str = 'https://statistics-api.wildberries.ru',
+        endpoint: str = 'api/v1/supplier/orders',
+        stream: bool = False,
+    ):
+        orders = self._stream_supplier_orders(
+            date_from=date_from,
+            url=url,
+            endpoint=endpoint
+        )
+
+        return orders if stream else [order async for order in orders]
+
+    async def download_extended_advert_nm_report(
+        self,
+        report_uuid: str,
+        save_path: str | BinaryIO = 'report.zip'
+    ):
+        headers = {
+            'Authorization': self._token
+        }
+
+        url = f'https://seller-analytics-api.wildberries.ru/api/v2/nm-report/downloads/file/{report_uuid}'
+
+        response = await self._run_policy(
+            url=url,
+            method='GET',
+            send=lambda: self._client.send(
+                self._client.build_request(
+                    method='GET',
+                    url=url,
+                    headers=headers
+                ),
+                stream=True
+            )
+        )
+
+        try:
+            if response.status_code == 200:
+                with open_destination(destination=save_path) as file:
+                    async for chunk in response.aiter_bytes(chunk_size=8192):
+                        file.write(chunk)
+                return save_path
+        finally:
+            await response.aclose()
+
+        return None
+
+
+async def _route_to_stand_in(
+    request: httpx.Request
+) -> None:
+    request.url = httpx.URL(stand_in_url(url=str(request.url)))
+    request.headers['Host'] = request.url.netloc.decode('ascii')
+
+
+async def gather_bounded(
+    jobs: Iterable,
+    call: Callable[[Any], Awaitable],
+    concurrency: int,
+    return_exceptions: bool = True,
+) -> list:
+    """Запускает `call(job)` для всех заданий, не больше `concurrency` одновременно."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(
+        job
+    ):
+        async with semaphore:
+            return await call(job)
+
+    return await asyncio.gather(
+        *(run(job) for job in jobs),
+        return_exceptions=return_exceptions
+    )
+
+
+_FAN_OUT_DONE = object()
+
+
+def iter_fan_out(
+    jobs: Iterable,
+    call: Callable[[AsyncWBApi, Any], Awaitable],
+    concurrency: int,
+    token: str | None = None,
+) -> Iterator[tuple[Any, Any, Exception | None]]:
+    """Выполняет `call(wb, job)` конкурентно в фоновом цикле событий и отдаёт
+    `(job, result, error)` в вызывающий поток по мере готовности.
+
+    Так синхронные модули `wb/methods` с общей `session` могут разбирать и сохранять
+    уже полученные чанки, пока остальные ещё в полёте. Неразобранных результатов не больше
+    `concurrency`: пока вызывающий их не заберёт, новые запросы не начинаются. Если генератор
+    закрыт раньше времени (`break` в модуле), фоновые запросы отменяются.
+    """
+    results = queue.Queue()
+    # места под неразобранные результаты; освобождает вызывающий поток, забрав результат
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run_all():
+        try:
+            async with AsyncWBApi(token=token, max_connections=concurrency) as wb:
+                async def run_one(
+                    job
+                ):
+                    try:
+                        item = (job, await call(wb, job), None)
+                    except Exception as e:
+                        item = (job, None, e)
+
+                    await slots.acquire()
+                    results.put(item)
+
+                await gather_bounded(
+                    jobs=jobs,
+                    call=run_one,
+                    concurrency=concurrency
+                )
+        finally:
+            results.put(_FAN_OUT_DONE)
+
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(run_all())
+
+    def run_loop():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+    worker = threading.Thread(
+        target=run_loop,
+        daemon=True
+    )
+    worker.start()
+
+    try:
+        while (item := results.get()) is not _FAN_OUT_DONE:
+            loop.call_soon_threadsafe(slots.release)
+            yield item
+    finally:
+        try:
+            loop.call_soon_threadsafe(task.cancel)
+        except RuntimeError:
+            # цикл уже закрылся сам: все задания выполнены
+            pass
+
+        worker.join()
+
+
+def iter_fan_out_retrying(
+    jobs: Iterable,
+    call: Callable[[AsyncWBApi, Any], Awaitable],
+    concurrency: int,
+    rounds: int = 2,
+    token: str | None = None,
+) -> Iterator[tuple[Any, Any, Exception | None]]:
+    """Как `iter_fan_out`, но упавшие задания перезапускаются ещё `rounds - 1` раз.
+
+    Ошибка отдаётся вызывающему только после последнего раунда, поэтому каждое задание
+    появляется в выдаче ровно один раз.
+    """
+    pending = list(jobs)
+
+    for round_number in range(1, rounds + 1):
+        failed = []
+
+        # closing - чтобы ранний выход вызывающего сразу отменил запросы текущего раунда
+        with closing(iter_fan_out(
+            jobs=pending,
+            call=call,
+            concurrency=concurrency,
+            token=token
+        )) as fan_out:
+            for job, result, error in fan_out:
+                if error is not None and round_number < rounds:
+                    failed.append(job)
+                    continue
+
+                yield job, result, error
+
+        if not failed:
+            return
+
+        app_logger.warning(
+            msg=f'Retry {len(failed)} failed jobs, round {round_number + 1} of {rounds}'
+        )
+        pending = failed
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+
+class FileTTLStore:
+    """Небольшое key-value хранилище с TTL в JSON-файлах.
+
+    Хранилище общее для процессов (task_runner и Streamlit), поэтому запись атомарная:
+    значение пишется во временный файл и подменяется через `os.replace`.
+    """
+
+    def __init__(
+        self,
+        directory: Path | str,
+        namespace: str
+    ):
+        self._directory = Path(directory) / namespace
+
+    def _path(
+        self,
+        key: str
+    ) -> Path:
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return self._directory / f'{digest}.json'
+
+    def get(
+        self,
+        key: str,
+        default: Any = None
+    ) -> Any:
+        try:
+            with open(self._path(key=key), mode='r', encoding='utf-8') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return default
+
+        if entry.get('expires_at', 0) <= time.time():
+            return default
+
+        return entry.get('value', default)
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: float
+    ) -> None:
+        entry = {
+            'expires_at': time.time() + ttl,
+            'value': value,
+        }
+
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+        file_descriptor, temp_path = tempfile.mkstemp(
+            dir=self._directory,
+            suffix='.tmp'
+        )
+
+        try:
+            with os.fdopen(file_descriptor, mode='w', encoding='utf-8') as file:
+                json.dump(entry, file, ensure_ascii=False, default=str)
+
+            os.replace(temp_path, self._path(key=key))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def delete(
+        self,
+        key: str
+    ) -> None:
+        try:
+            os.remove(self._path(key=key))
+        except FileNotFoundError:
+            pass
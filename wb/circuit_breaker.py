@@ -0,0 +1,163 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Mapping
+from urllib.parse import urlsplit
+
+from requests import RequestException
+
+from logs import app_logger
+
+
+class CircuitOpenError(RequestException):
+    """Категория WB API признана недоступной, запрос не отправлялся."""
+
+
+@dataclass
+class _Circuit:
+    failures: int = 0
+    opened_until: float = 0.0
+    probing: bool = False
+
+    @property
+    def is_open(
+        self
+    ) -> bool:
+        return self.opened_until > 0
+
+
+class CircuitBreaker:
+    """Автомат по категории WB API: closed -> open -> half-open -> closed.
+
+    После `failure_threshold` подряд неудачных попыток (сетевой сбой или 5xx) категория
+    на `cooldown` секунд отклоняет запросы сразу. Затем первый вызывающий делает пробный
+    ping категории: при успехе автомат закрывается, иначе снова открывается на `cooldown`.
+    Пока идёт проба, остальные запросы категории тоже отклоняются.
+    """
+
+    def __init__(
+        self,
+        host_categories: Mapping[str, object],
+        failure_threshold: int = 5,
+        cooldown: float = 60.0,
+        enabled: bool = True,
+    ):
+        self._host_categories = dict(host_categories)
+        self._failure_threshold = failure_threshold
+        self._cooldown = cooldown
+        self._enabled = enabled
+
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def _circuit(
+        self,
+        url: str
+    ) -> tuple[object | None, _Circuit | None]:
+        category = self._host_categories.get(urlsplit(url).netloc)
+        if category is None:
+            return None, None
+
+        circuit = self._circuits.get(category)
+        if circuit is None:
+            circuit = self._circuits[category] = _Circuit()
+
+        return category, circuit
+
+    def before_request(
+        self,
+        url: str
+    ):
+        """Пропускает запрос или бросает `CircuitOpenError`.
+
+        Возвращает категорию, если вызывающему выпало сделать пробный запрос
+        (после него нужно вызвать `probe_finished`), иначе None.
+        """
+        if not self._enabled:
+            return None
+
+        with self._lock:
+            category, circuit = self._circuit(url=url)
+            if circuit is None or not circuit.is_open:
+                return None
+
+            if circuit.probing or circuit.opened_until > time.monotonic():
+                raise CircuitOpenError(
+                    f'Category "{category.value}" is unavailable, request to {url} skipped'
+                )
+
+            circuit.probing = True
+            return category
+
+    def probe_finished(
+        self,
+        category,
+        error: str | None
+    ) -> None:
+        with self._lock:
+            circuit = self._circuits[category]
+            circuit.probing = False
+
+            if error is None:
+                circuit.failures = 0
+                circuit.opened_until = 0.0
+            else:
+                circuit.opened_until = time.monotonic() + self._cooldown
+
+        if error is None:
+            app_logger.info(
+                msg=f'Circuit for category "{category.value}" closed after successful probe'
+            )
+            return
+
+        app_logger.warning(
+            msg=f'Circuit for category "{category.value}" stays open for {self._cooldown:.0f}s, probe error: {error}'
+        )
+        raise CircuitOpenError(
+            f'Category "{category.value}" is unavailable, probe error: {error}'
+        )
+
+    def record(
+        self,
+        url: str,
+        status_code: int | None = None
+    ) -> None:
+        """Учитывает исход попытки: None - сетевой сбой, 5xx - ошибка сервера."""
+        if not self._enabled:
+            return
+
+        failed = status_code is None or status_code >= 500
+
+        with self._lock:
+            category, circuit = self._circuit(url=url)
+            if circuit is None:
+                return
+
+            if not failed:
+                circuit.failures = 0
+                return
+
+            circuit.failures += 1
+            if circuit.is_open or circuit.failures < self._failure_threshold:
+                return
+
+            circuit.opened_until = time.monotonic() + self._cooldown
+
+        app_logger.warning(
+            msg=f'Circuit for category "{category.value}" opened for {self._cooldown:.0f}s '
+                f'after {self._failure_threshold} failures in a row'
+        )
+
+    def state(
+        self,
+        category
+    ) -> str:
+        with self._lock:
+            circuit = self._circuits.get(category)
+
+            if circuit is None or not circuit.is_open:
+                return 'closed'
+            if circuit.probing or circuit.opened_until <= time.monotonic():
+                return 'half-open'
+
+            return 'open'
@@ -1,5 +1,10 @@
 from .connector import get_session, init_db
-from .utils import try_to_find_model
+from .key_index import KeyIndex, RowSplit
+from .upsert import UpsertResult, bulk_upsert
+from .copy_loader import copy_upsert
+from .batch_writer import BatchWriter, WriteResult, write_rows
+from .checkpoints import get_checkpoint, save_checkpoint
+from .api_metrics import save_api_metrics
 from .models import (
     SupplierStock,
 )
@@ -8,6 +13,16 @@ from .models import (
 __all__ = [
     'get_session',
     'init_db',
-    'try_to_find_model',
+    'KeyIndex',
+    'RowSplit',
+    'UpsertResult',
+    'bulk_upsert',
+    'copy_upsert',
+    'BatchWriter',
+    'WriteResult',
+    'write_rows',
+    'get_checkpoint',
+    'save_checkpoint',
+    'save_api_metrics',
     'SupplierStock'
 ]
@@ -0,0 +1,49 @@
+import datetime
+
+import sqlalchemy.orm
+
+from wb.db.models import ApiMetric
+from wb.metrics import ApiMetrics
+
+
+def save_api_metrics(
+    session: sqlalchemy.orm.Session,
+    metrics: ApiMetrics,
+    run_id: str,
+    run_started_at: datetime.datetime
+) -> int:
+    """Сохраняет метрики запуска - по строке на эндпоинт, без commit."""
+    endpoints = metrics.snapshot()
+    payloads = metrics.payload_snapshot()
+
+    rows = []
+    for key in sorted(endpoints.keys() | payloads.keys()):
+        endpoint = endpoints.get(key)
+        payload = payloads.get(key)
+
+        rows.append(
+            ApiMetric(
+                run_id=run_id,
+                run_started_at=run_started_at,
+                endpoint=key,
+                category=endpoint.category if endpoint else None,
+                requests=endpoint.requests if endpoint else 0,
+                status_counts=dict(endpoint.status_counts) if endpoint else {},
+                throttled=endpoint.throttled if endpoint else 0,
+                retries=endpoint.retries if endpoint else 0,
+                backoff_seconds=endpoint.backoff_seconds if endpoint else 0.0,
+                rate_limit_wait_seconds=endpoint.rate_limit_wait_seconds if endpoint else 0.0,
+                latency_sum=endpoint.latency_sum if endpoint else 0.0,
+                latency_p50=endpoint.latency_quantile(quantile=0.5) if endpoint else None,
+                latency_p95=endpoint.latency_quantile(quantile=0.95) if endpoint else None,
+                latency_max=endpoint.latency_max if endpoint else None,
+                latency_buckets=list(endpoint.latency_buckets) if endpoint else None,
+                wire_bytes=payload.wire_bytes if payload else 0,
+                decoded_bytes=payload.decoded_bytes if payload else 0,
+                decode_seconds=payload.decode_seconds if payload else 0.0,
+            )
+        )
+
+    session.add_all(rows)
+
+    return len(rows)
@@ -0,0 +1,193 @@
+from dataclasses import dataclass
+from typing import Callable, Iterable, Sequence
+
+import sqlalchemy.exc
+import sqlalchemy.orm
+
+from config import settings
+from logs import app_logger
+from wb.db.key_index import KeyIndex, row_key
+from wb.db.upsert import UpsertResult, bulk_upsert
+
+
+@dataclass
+class WriteResult(UpsertResult):
+    rejected: int = 0
+
+    @property
+    def committed(
+        self
+    ) -> int:
+        return self.inserted + self.updated + self.unchanged
+
+    def __iadd__(
+        self,
+        other: UpsertResult
+    ) -> 'WriteResult':
+        super().__iadd__(other)
+        self.rejected += getattr(other, 'rejected', 0)
+        return self
+
+
+class BatchWriter:
+    """Запись строк в таблицу транзакциями по `batch_size` строк.
+
+    Пачка пишется загрузчиком (`bulk_upsert` или `copy_upsert`) под SAVEPOINT и
+    фиксируется одним COMMIT. Если пачка упала, она повторяется по одной строке,
+    каждая под своим SAVEPOINT: битые строки отбрасываются и считаются в `rejected`,
+    остальные коммитятся. Ошибки соединения (`OperationalError`) пробрасываются -
+    построчный повтор их не исправит.
+
+    `on_flush` выполняется в транзакции последней пачки при `flush`, перед её COMMIT, и
+    только если ни одна строка не отброшена: так курсор пагинации фиксируется вместе с
+    данными и не уходит дальше строк, которые в БД не попали.
+    """
+
+    def __init__(
+        self,
+        session: sqlalchemy.orm.Session,
+        model: type[sqlalchemy.orm.DeclarativeBase],
+        key_columns: Sequence[str],
+        batch_size: int | None = None,
+        key_index: KeyIndex | None = None,
+        loader: Callable[..., UpsertResult] = bulk_upsert,
+        on_flush: Callable[[], None] | None = None
+    ):
+        self.session = session
+        self.model = model
+        self.key_columns = list(key_columns)
+        self.batch_size = batch_size or settings.db.DB_WRITE_BATCH_SIZE
+        self.key_index = key_index
+        self.loader = loader
+        self.on_flush = on_flush
+        self.result = WriteResult()
+        self._buffer = []
+
+    def __enter__(
+        self
+    ) -> 'BatchWriter':
+        return self
+
+    def __exit__(
+        self,
+        exc_type,
+        exc_value,
+        traceback
+    ) -> None:
+        if exc_type is None:
+            self.flush()
+
+    def add(
+        self,
+        rows: Iterable[dict]
+    ) -> None:
+        self._buffer.extend(rows)
+
+        while len(self._buffer) >= self.batch_size:
+            batch = self._buffer[:self.batch_size]
+            del self._buffer[:self.batch_size]
+
+            self._write_batch(rows=batch)
+
+    def flush(
+        self
+    ) -> None:
+        if self._buffer or self.on_flush is not None:
+            batch = self._buffer
+            self._buffer = []
+
+            self._write_batch(
+                rows=batch,
+                final=True
+            )
+
+    def _write_batch(
+        self,
+        rows: list[dict],
+        final: bool = False
+    ) -> None:
+        result = WriteResult()
+
+        try:
+            if rows:
+                with self.session.begin_nested():
+                    result = self.loader(
+                        session=self.session,
+                        model=self.model,
+                        rows=rows,
+                        key_columns=self.key_columns,
+                        key_index=self.key_index
+                    )
+        except sqlalchemy.exc.OperationalError:
+            self.session.rollback()
+            raise
+        except Exception as e:
+            app_logger.warning(
+                msg=f'Problem with bulk save objects - {len(rows)} elements, retry row by row, error: {str(e)}'
+            )
+            result = self._write_rows(rows=rows)
+
+        self.result += result
+
+        if final and self.on_flush is not None and not self.result.rejected:
+            self.on_flush()
+
+        self.session.commit()
+
+    def _write_rows(
+        self,
+        rows: list[dict]
+    ) -> WriteResult:
+        result = WriteResult()
+
+        for row in rows:
+            try:
+                with self.session.begin_nested():
+                    result += bulk_upsert(
+                        session=self.session,
+                        model=self.model,
+                        rows=[row],
+                        key_columns=self.key_columns,
+                        key_index=self.key_index
+                    )
+            except sqlalchemy.exc.OperationalError:
+                self.session.rollback()
+                raise
+            except Exception as e:
+                result.rejected += 1
+
+                key = row_key(
+                    table=self.model.__table__,
+                    row=row,
+                    key_columns=self.key_columns
+                )
+                app_logger.error(
+                    msg=f'Rejected row {key}, error: {str(e)}'
+                )
+
+        return result
+
+
+def write_rows(
+    session: sqlalchemy.orm.Session,
+    model: type[sqlalchemy.orm.DeclarativeBase],
+    rows: Iterable[dict],
+    key_columns: Sequence[str],
+    batch_size: int | None = None,
+    key_index: KeyIndex | None = None,
+    loader: Callable[..., UpsertResult] = bulk_upsert,
+    on_flush: Callable[[], None] | None = None
+) -> WriteResult:
+    """Записывает все строки через `BatchWriter` и возвращает итог с числом отброшенных."""
+    with BatchWriter(
+        session=session,
+        model=model,
+        key_columns=key_columns,
+        batch_size=batch_size,
+        key_index=key_index,
+        loader=loader,
+        on_flush=on_flush
+    ) as writer:
+        writer.add(rows=rows)
+
+    return writer.result
@@ -0,0 +1,46 @@
+from typing import Any
+
+import sqlalchemy.orm
+
+from wb.db.models import PaginationCheckpoint
+
+
+def get_checkpoint(
+    session: sqlalchemy.orm.Session,
+    endpoint: str,
+    account: str
+) -> Any:
+    checkpoint = session.query(PaginationCheckpoint).filter_by(
+        endpoint=endpoint,
+        account=account
+    ).first()
+
+    return checkpoint.cursor if checkpoint else None
+
+
+def save_checkpoint(
+    session: sqlalchemy.orm.Session,
+    endpoint: str,
+    account: str,
+    cursor: Any
+) -> None:
+    """Записывает курсор в текущую транзакцию, без commit.
+
+    Коммитится вместе со страницей данных, поэтому после падения курсор
+    никогда не опережает то, что реально сохранено в БД.
+    """
+    checkpoint = session.query(PaginationCheckpoint).filter_by(
+        endpoint=endpoint,
+        account=account
+    ).with_for_update().first()
+
+    if checkpoint is None:
+        session.add(
+            PaginationCheckpoint(
+                endpoint=endpoint,
+                account=account,
+                cursor=cursor
+            )
+        )
+    else:
+        checkpoint.cursor = cursor
@@ -1,16 +1,25 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from config.settings import Settings
-from wb.db.utils import create_views, create_materialized_views
+from wb.db.utils import add_account_columns, add_not_null_columns, add_row_hash_columns, create_natural_keys, create_views, create_materialized_views
 
 settings = Settings()
 db_settings = settings.db
 
 Base = declarative_base()
 
+# модуль держит свою сессию всё время работы, а модули идут параллельно по кабинетам:
+# пул меньше ACCOUNTS_CONCURRENCY * MODULES_CONCURRENCY заставит потоки ждать
+# DB_POOL_TIMEOUT и пропускать данные модуля
+RUN_CONNECTIONS = settings.wb.ACCOUNTS_CONCURRENCY * settings.wb.MODULES_CONCURRENCY
+
+engine_settings = db_settings.engine_settings
+if 'pool_size' in engine_settings:
+    engine_settings['pool_size'] = max(engine_settings['pool_size'], RUN_CONNECTIONS)
+
 engine = create_engine(
     db_settings.database_url,
-    **db_settings.engine_settings
+    **engine_settings
 )
 
 SessionLocal = sessionmaker(
@@ -27,6 +36,27 @@ def init_db():
         bind=engine
     )
 
+    add_account_columns(
+        engine=engine,
+        tables=Base.metadata.sorted_tables
+    )
+
+    add_row_hash_columns(
+        engine=engine,
+        tables=Base.metadata.sorted_tables
+    )
+
+    add_not_null_columns(
+        engine=engine,
+        tables=Base.metadata.sorted_tables
+    )
+
+    create_natural_keys(
+        engine=engine,
+        tables=Base.metadata.sorted_tables,
+        deduplicate=db_settings.DB_DEDUPLICATE_ON_MIGRATION
+    )
+
     create_views(
         engine=engine
     )
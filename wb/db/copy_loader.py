@@ -0,0 +1,251 @@
+import csv
+import datetime
+import io
+import json
+from typing import Iterable, Iterator, Sequence
+
+import sqlalchemy.orm
+from sqlalchemy import text
+
+from wb.db.hashing import ROW_HASH_COLUMN, with_row_hashes
+from wb.db.key_index import KeyIndex, row_key
+from wb.db.upsert import UpsertResult, bulk_upsert, has_null_key, null_safe_key, use_native_upsert
+
+
+# меньше этого COPY не окупает создание staging-таблицы
+COPY_MIN_ROWS = 1000
+COPY_CHUNK_ROWS = 5000
+
+NULL_MARKER = r'\N'
+
+
+class CsvRowStream(io.RawIOBase):
+    """Файлоподобный поток CSV для `COPY FROM STDIN`: строки кодируются пачками по мере чтения."""
+
+    def __init__(
+        self,
+        rows: Iterable[dict],
+        columns: Sequence[str]
+    ):
+        self._chunks = _iter_csv_chunks(
+            rows=rows,
+            columns=columns
+        )
+        self._buffer = bytearray()
+
+    def readable(
+        self
+    ) -> bool:
+        return True
+
+    def read(
+        self,
+        size: int = -1
+    ) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+
+        if size < 0:
+            size = len(self._buffer)
+
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+
+        return data
+
+
+def _csv_value(
+    value
+):
+    if value is None:
+        return NULL_MARKER
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        # JSON-колонки: иначе csv запишет repr словаря, который PostgreSQL не разберёт
+        return json.dumps(value, ensure_ascii=False)
+
+    return value
+
+
+def _iter_csv_chunks(
+    rows: Iterable[dict],
+    columns: Sequence[str]
+) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+
+    for row_number, row in enumerate(rows):
+        writer.writerow([*(_csv_value(row.get(column)) for column in columns), row_number])
+
+        if (row_number + 1) % COPY_CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def copy_upsert(
+    session: sqlalchemy.orm.Session,
+    model: type[sqlalchemy.orm.DeclarativeBase],
+    rows: Sequence[dict],
+    key_columns: Sequence[str],
+    key_index: KeyIndex | None = None
+) -> UpsertResult:
+    """Загрузка большого объёма через COPY, без commit.
+
+    Строки потоком идут `COPY ... FROM STDIN (FORMAT csv)` во временную staging-таблицу,
+    а затем одним `INSERT ... SELECT ... ON CONFLICT DO UPDATE` сливаются в целевую по
+    естественному ключу. Вне PostgreSQL, без уникального ключа или для небольших пачек
+    работает обычный `bulk_upsert`, он же сверяет строки с NULL в ключе, если индекс
+    не `NULLS NOT DISTINCT`. Строки с разным набором колонок сливаются раздельно, так что
+    отсутствующее поле не затирается NULL. Строки с прежним `row_hash` не переписываются,
+    а с `key_index` неизменные строки отсеиваются ещё до COPY.
+    """
+    rows = with_row_hashes(table=model.__table__, rows=rows)
+
+    result = UpsertResult()
+    if key_index is not None:
+        split = key_index.split(rows=rows)
+        rows = split.changed
+        result.unchanged = len(split.unchanged)
+
+    copy_groups, upsert_rows = [], rows
+    if len(rows) >= COPY_MIN_ROWS and use_native_upsert(
+        session=session,
+        table=model.__table__,
+        key_columns=key_columns
+    ):
+        null_safe = null_safe_key(
+            session=session,
+            table=model.__table__,
+            key_columns=key_columns
+        )
+
+        # повтор ключа может попасть в разные группы ниже, поэтому последняя строка выбирается заранее
+        unique_rows = {}
+        for row in rows:
+            unique_rows[row_key(table=model.__table__, row=row, key_columns=key_columns)] = row
+
+        # одна staging-таблица - один набор колонок, иначе пропущенные поля затрутся NULL.
+        # Без NULLS NOT DISTINCT ON CONFLICT не сведёт NULL в ключе с уже лежащей строкой -
+        # такие строки, как и мелкие группы, сверяет bulk_upsert
+        groups = {}
+        upsert_rows = []
+        for row in unique_rows.values():
+            if not null_safe and has_null_key(row=row, key_columns=key_columns):
+                upsert_rows.append(row)
+            else:
+                groups.setdefault(frozenset(row), []).append(row)
+
+        for group in groups.values():
+            if len(group) >= COPY_MIN_ROWS:
+                copy_groups.append(group)
+            else:
+                upsert_rows.extend(group)
+
+    if upsert_rows:
+        result += bulk_upsert(
+            session=session,
+            model=model,
+            rows=upsert_rows,
+            key_columns=key_columns,
+            key_index=key_index
+        )
+
+    for copy_rows in copy_groups:
+        result += _copy_merge(
+            session=session,
+            table=model.__table__,
+            rows=copy_rows,
+            key_columns=key_columns
+        )
+
+        if key_index is not None:
+            key_index.remember(rows=copy_rows)
+
+    return result
+
+
+def _copy_merge(
+    session: sqlalchemy.orm.Session,
+    table,
+    rows: list[dict],
+    key_columns: Sequence[str]
+) -> UpsertResult:
+    # у всех строк пачки один набор колонок, так что UPDATE SET не трогает отсутствующие поля
+    columns = [
+        column.name for column in table.columns if column.name in rows[0] and column.name != 'id'
+    ]
+
+    staging = f'_staging_{table.name}'
+    column_list = ', '.join(columns)
+    key_list = ', '.join(key_columns)
+    update_columns = [column for column in columns if column not in key_columns]
+
+    # временная таблица не пишется в WAL и видна только своему соединению,
+    # так что параллельные модули и кабинеты друг другу не мешают
+    session.execute(text(f'DROP TABLE IF EXISTS {staging}'))
+    session.execute(
+        text(
+            f'CREATE TEMP TABLE {staging} ON COMMIT DROP AS '
+            f'SELECT {column_list}, 0::bigint AS _row_number FROM {table.name} WITH NO DATA'
+        )
+    )
+
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {staging} ({column_list}, _row_number) FROM STDIN WITH (FORMAT csv, NULL '{NULL_MARKER}')",
+            CsvRowStream(
+                rows=rows,
+                columns=columns
+            )
+        )
+    finally:
+        cursor.close()
+
+    if update_columns:
+        on_conflict = 'DO UPDATE SET ' + ', '.join(
+            f'{column} = EXCLUDED.{column}' for column in update_columns
+        )
+        if ROW_HASH_COLUMN in update_columns:
+            on_conflict += f' WHERE {table.name}.{ROW_HASH_COLUMN} IS DISTINCT FROM EXCLUDED.{ROW_HASH_COLUMN}'
+    else:
+        on_conflict = 'DO NOTHING'
+
+    # повторы ключа в одной пачке ON CONFLICT не переживёт: оставляем последнюю строку
+    inserted, updated = session.execute(
+        text(
+            f"""
+                WITH merged AS (
+                    INSERT INTO {table.name} ({column_list})
+                    SELECT DISTINCT ON ({key_list}) {column_list}
+                    FROM {staging}
+                    ORDER BY {key_list}, _row_number DESC
+                    ON CONFLICT ({key_list}) {on_conflict}
+                    RETURNING (xmax = 0) AS inserted
+                )
+                SELECT count(*) FILTER (WHERE inserted),
+                       count(*) FILTER (WHERE NOT inserted)
+                FROM merged
+            """
+        )
+    ).one()
+
+    session.execute(text(f'DROP TABLE {staging}'))
+
+    merged_count = len({
+        row_key(table=table, row=row, key_columns=key_columns) for row in rows
+    })
+
+    return UpsertResult(
+        inserted=inserted,
+        updated=updated,
+        unchanged=merged_count - inserted - updated
+    )
@@ -0,0 +1,53 @@
+import datetime
+import hashlib
+from typing import Iterable
+
+from sqlalchemy import Date, DateTime
+
+
+ROW_HASH_COLUMN = 'row_hash'
+
+
+def normalize_value(
+    column,
+    value
+):
+    # Date-колонка вернёт из БД date, а модули кладут в неё разобранный datetime
+    if isinstance(value, datetime.datetime) and isinstance(column.type, Date) and not isinstance(column.type, DateTime):
+        return value.date()
+
+    return value
+
+
+def row_hash(
+    table,
+    row: dict
+) -> str:
+    """Хэш значений строки по колонкам таблицы, без id и самого хэша.
+
+    Колонки, которых нет в строке, в хэш не входят: upsert их не трогает. Явный None
+    входит как значение - иначе запись NULL поверх старого значения сочлась бы неизменной.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+
+    for column in table.columns:
+        if column.name in ('id', ROW_HASH_COLUMN) or column.name not in row:
+            continue
+
+        value = normalize_value(column=column, value=row[column.name])
+        digest.update(f'{column.name}={value!r}\x1f'.encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def with_row_hashes(
+    table,
+    rows: Iterable[dict]
+) -> list[dict]:
+    """Копии строк с заполненным `row_hash`; для таблиц без этой колонки - строки как есть."""
+    if ROW_HASH_COLUMN not in table.c:
+        return list(rows)
+
+    return [
+        {**row, ROW_HASH_COLUMN: row_hash(table=table, row=row)} for row in rows
+    ]
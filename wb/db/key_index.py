@@ -0,0 +1,176 @@
+from dataclasses import dataclass, field
+from typing import Iterable, Sequence
+
+import sqlalchemy.orm
+
+from wb.db.hashing import ROW_HASH_COLUMN, normalize_value, row_hash
+
+
+@dataclass
+class RowSplit:
+    inserts: list[dict] = field(default_factory=list)
+    updates: list[dict] = field(default_factory=list)
+    unchanged: list[dict] = field(default_factory=list)
+
+    @property
+    def changed(
+        self
+    ) -> list[dict]:
+        return self.inserts + self.updates
+
+
+class KeyIndex:
+    """Ключи и версии строк, уже лежащих в БД за окно загрузки.
+
+    Загружается одним запросом по индексу (`load`), после чего входящие строки
+    раскладываются в памяти на новые, изменённые и неизменные (`split`) - в БД
+    уходят только первые два набора. Версия строки - значения `version_columns`,
+    по умолчанию `row_hash`, а у таблиц без него - все колонки кроме id и ключа.
+    Строки, записанные за прогон, запоминаются через `remember`, чтобы повтор ключа
+    на следующей странице не считался новым.
+    """
+
+    def __init__(
+        self,
+        model: type[sqlalchemy.orm.DeclarativeBase],
+        key_columns: Sequence[str],
+        version_columns: Sequence[str] | None = None
+    ):
+        table = model.__table__
+
+        if version_columns is None and ROW_HASH_COLUMN in table.c:
+            version_columns = [ROW_HASH_COLUMN]
+        elif version_columns is None:
+            version_columns = [
+                column.name for column in table.columns
+                if column.name != 'id' and column.name not in key_columns
+            ]
+
+        self.model = model
+        self.key_columns = list(key_columns)
+        self.version_columns = list(version_columns)
+        self._ids = {}
+        self._versions = {}
+
+    @classmethod
+    def load(
+        cls,
+        session: sqlalchemy.orm.Session,
+        model: type[sqlalchemy.orm.DeclarativeBase],
+        key_columns: Sequence[str],
+        where: Sequence = (),
+        version_columns: Sequence[str] | None = None
+    ) -> 'KeyIndex':
+        key_index = cls(
+            model=model,
+            key_columns=key_columns,
+            version_columns=version_columns
+        )
+
+        table = model.__table__
+        key_count = len(key_index.key_columns)
+
+        statement = sqlalchemy.select(
+            table.c.id,
+            *(table.c[column] for column in key_index.key_columns),
+            *(table.c[column] for column in key_index.version_columns)
+        ).where(*where)
+
+        for row in session.execute(statement):
+            key = tuple(row[1:key_count + 1])
+            key_index._ids.setdefault(key, row[0])
+            key_index._versions.setdefault(key, tuple(row[key_count + 1:]))
+
+        return key_index
+
+    def __len__(
+        self
+    ) -> int:
+        return len(self._versions)
+
+    def __contains__(
+        self,
+        key: tuple
+    ) -> bool:
+        return key in self._versions
+
+    def key(
+        self,
+        row: dict
+    ) -> tuple:
+        return row_key(
+            table=self.model.__table__,
+            row=row,
+            key_columns=self.key_columns
+        )
+
+    def get_id(
+        self,
+        key: tuple
+    ) -> int | None:
+        return self._ids.get(key)
+
+    def _with_versions(
+        self,
+        rows: Iterable[dict]
+    ) -> Iterable[dict]:
+        # без хэша во входной строке сравнивать нечего - любая строка сочлась бы неизменной
+        if ROW_HASH_COLUMN not in self.version_columns:
+            return rows
+
+        table = self.model.__table__
+
+        return [
+            row if ROW_HASH_COLUMN in row else {**row, ROW_HASH_COLUMN: row_hash(table=table, row=row)}
+            for row in rows
+        ]
+
+    def split(
+        self,
+        rows: Iterable[dict]
+    ) -> RowSplit:
+        table = self.model.__table__
+        result = RowSplit()
+
+        for row in self._with_versions(rows=rows):
+            key = self.key(row=row)
+            stored = self._versions.get(key)
+
+            if stored is None:
+                result.inserts.append(row)
+            elif any(
+                normalize_value(column=table.c[column], value=row[column]) != stored[position]
+                for position, column in enumerate(self.version_columns)
+                if column in row
+            ):
+                result.updates.append(row)
+            else:
+                result.unchanged.append(row)
+
+        return result
+
+    def remember(
+        self,
+        rows: Iterable[dict]
+    ) -> None:
+        table = self.model.__table__
+
+        for row in self._with_versions(rows=rows):
+            key = self.key(row=row)
+            stored = self._versions.get(key)
+
+            self._versions[key] = tuple(
+                normalize_value(column=table.c[column], value=row[column])
+                if column in row else (stored[position] if stored else None)
+                for position, column in enumerate(self.version_columns)
+            )
+
+
+def row_key(
+    table,
+    row: dict,
+    key_columns: Sequence[str]
+) -> tuple:
+    return tuple(
+        normalize_value(column=table.c[key], value=row.get(key)) for key in key_columns
+    )
@@ -13,6 +13,8 @@ from .advert_cost import AdvertCost
 from .acceptance_report import AcceptanceReport
 from .fbs_stock import FbsStock
 from .fbs_warehouse import FbsWarehouse
+from .pagination_checkpoint import PaginationCheckpoint
+from .api_metric import ApiMetric
 
 
 __all__ = [
@@ -31,4 +33,6 @@ __all__ = [
     'AcceptanceReport',
     'FbsStock',
     'FbsWarehouse',
+    'PaginationCheckpoint',
+    'ApiMetric',
 ]
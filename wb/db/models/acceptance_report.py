@@ -1,10 +1,19 @@
-from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean
+from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean, UniqueConstraint
 
 from wb.db.connector import Base
+from wb.db.models.account import AccountMixin
+from wb.db.models.row_hash import RowHashMixin
 
 
-class AcceptanceReport(Base):
+class AcceptanceReport(AccountMixin, RowHashMixin, Base):
     __tablename__ = 'acceptance_reports'
+    __table_args__ = (
+        UniqueConstraint(
+            'account_id', 'income_id', 'nm_id', 'shk_create_date_on',
+            name='uq_acceptance_reports_natural_key',
+            postgresql_nulls_not_distinct=True
+        ),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
 
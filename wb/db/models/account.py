@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String
+
+from wb.accounts import DEFAULT_ACCOUNT_ID
+
+
+class AccountMixin:
+    """Колонка кабинета продавца: строки разных кабинетов живут в одних таблицах."""
+
+    account_id = Column(
+        String,
+        nullable=False,
+        default=DEFAULT_ACCOUNT_ID,
+        server_default=DEFAULT_ACCOUNT_ID,
+        index=True
+    )
@@ -1,10 +1,20 @@
-from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean
+from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean, UniqueConstraint, Index
 
 from wb.db.connector import Base
+from wb.db.models.account import AccountMixin
+from wb.db.models.row_hash import RowHashMixin
 
 
-class Advert(Base):
+class Advert(AccountMixin, RowHashMixin, Base):
     __tablename__ = 'advert_list'
+    __table_args__ = (
+        UniqueConstraint(
+            'account_id', 'advert_id',
+            name='uq_advert_list_natural_key',
+            postgresql_nulls_not_distinct=True
+        ),
+        Index('ix_advert_list_account_id_change_time_at', 'account_id', 'change_time_at'),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
 
@@ -12,5 +22,5 @@ class Advert(Base):
     advert_status = Column(Integer)
     advert_count = Column(Integer)
 
-    advert_id = Column(Integer)
+    advert_id = Column(Integer, nullable=False)
     change_time_at = Column(DateTime)
@@ -1,17 +1,26 @@
-from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean
+from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean, UniqueConstraint
 
 from wb.db.connector import Base
+from wb.db.models.account import AccountMixin
+from wb.db.models.row_hash import RowHashMixin
 
 
-class AdvertCost(Base):
+class AdvertCost(AccountMixin, RowHashMixin, Base):
     __tablename__ = 'advert_costs'
+    __table_args__ = (
+        UniqueConstraint(
+            'account_id', 'advert_id', 'upd_num', 'upd_time_at',
+            name='uq_advert_costs_natural_key',
+            postgresql_nulls_not_distinct=True
+        ),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
 
     upd_num = Column(Integer)
     upd_time_at = Column(DateTime)
     upd_sum = Column(Integer)
-    advert_id = Column(Integer)
+    advert_id = Column(Integer, nullable=False)
     camp_name = Column(String)
     advert_type = Column(Integer)
     payment_type = Column(String)
@@ -1,17 +1,26 @@
-from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean
+from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean, UniqueConstraint
 
 from wb.db.connector import Base
+from wb.db.models.account import AccountMixin
+from wb.db.models.row_hash import RowHashMixin
 
 
-class AdvertFullStat(Base):
+class AdvertFullStat(AccountMixin, RowHashMixin, Base):
     __tablename__ = 'advert_full_stats'
+    __table_args__ = (
+        UniqueConstraint(
+            'account_id', 'date_at', 'app_type', 'advert_id', 'nm_id',
+            name='uq_advert_full_stats_natural_key',
+            postgresql_nulls_not_distinct=True
+        ),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
 
-    date_at = Column(DateTime)
+    date_at = Column(DateTime, nullable=False)
     app_type = Column(Integer)
     name = Column(String)
-    nm_id = Column(BigInteger)
+    nm_id = Column(BigInteger, nullable=False)
     views = Column(Integer)
     clicks = Column(Integer)
     ctr = Column(Float)
@@ -23,5 +32,5 @@ class AdvertFullStat(Base):
     shks = Column(Integer)
     sum_price = Column(Float)
     avg_position = Column(Integer)
-    advert_id = Column(BigInteger)
+    advert_id = Column(BigInteger, nullable=False)
     canceled = Column(Integer)
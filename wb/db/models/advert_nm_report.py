@@ -1,18 +1,27 @@
-from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean
+from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean, UniqueConstraint
 
 from wb.db.connector import Base
+from wb.db.models.account import AccountMixin
+from wb.db.models.row_hash import RowHashMixin
 
 
-class AdvertNMReport(Base):
+class AdvertNMReport(AccountMixin, RowHashMixin, Base):
     __tablename__ = 'advert_nm_report'
+    __table_args__ = (
+        UniqueConstraint(
+            'account_id', 'nm_id', 'dt_on',
+            name='uq_advert_nm_report_natural_key',
+            postgresql_nulls_not_distinct=True
+        ),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
 
-    nm_id = Column(BigInteger)
+    nm_id = Column(BigInteger, nullable=False)
     imt_name = Column(String)
     vendor_code = Column(String)
 
-    dt_on = Column(Date)
+    dt_on = Column(Date, nullable=False)
     open_card_count = Column(Integer)
     add_to_cart_count = Column(Integer)
     orders_count = Column(Integer)
@@ -1,15 +1,25 @@
-from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean
+from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean, UniqueConstraint, Index
 
 from wb.db.connector import Base
+from wb.db.models.account import AccountMixin
+from wb.db.models.row_hash import RowHashMixin
 
 
-class AdvertNMReportExtended(Base):
+class AdvertNMReportExtended(AccountMixin, RowHashMixin, Base):
     __tablename__ = 'advert_nm_report_extended'
+    __table_args__ = (
+        UniqueConstraint(
+            'account_id', 'nm_id', 'dt_on',
+            name='uq_advert_nm_report_extended_natural_key',
+            postgresql_nulls_not_distinct=True
+        ),
+        Index('ix_advert_nm_report_extended_account_id_dt_on', 'account_id', 'dt_on'),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
 
-    nm_id = Column(BigInteger)
-    dt_on = Column(Date)
+    nm_id = Column(BigInteger, nullable=False)
+    dt_on = Column(Date, nullable=False)
     open_card_count = Column(Integer)
     add_to_cart_count = Column(Integer)
     orders_count = Column(Integer)
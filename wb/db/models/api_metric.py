@@ -0,0 +1,32 @@
+from sqlalchemy import Column, BigInteger, DateTime, String, Integer, Float, JSON
+
+from wb.db.connector import Base
+
+
+class ApiMetric(Base):
+    __tablename__ = 'api_metrics'
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+
+    run_id = Column(String, nullable=False, index=True)
+    run_started_at = Column(DateTime)
+
+    endpoint = Column(String, nullable=False)
+    category = Column(String)
+
+    requests = Column(Integer)
+    status_counts = Column(JSON)
+    throttled = Column(Integer)
+    retries = Column(Integer)
+    backoff_seconds = Column(Float)
+    rate_limit_wait_seconds = Column(Float)
+
+    latency_sum = Column(Float)
+    latency_p50 = Column(Float)
+    latency_p95 = Column(Float)
+    latency_max = Column(Float)
+    latency_buckets = Column(JSON)
+
+    wire_bytes = Column(BigInteger)
+    decoded_bytes = Column(BigInteger)
+    decode_seconds = Column(Float)
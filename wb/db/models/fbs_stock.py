@@ -1,14 +1,23 @@
-from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean
+from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean, UniqueConstraint
 
 from wb.db.connector import Base
+from wb.db.models.account import AccountMixin
+from wb.db.models.row_hash import RowHashMixin
 
 
-class FbsStock(Base):
+class FbsStock(AccountMixin, RowHashMixin, Base):
     __tablename__ = 'stat_stocks_fbs'
+    __table_args__ = (
+        UniqueConstraint(
+            'account_id', 'warehouse_id', 'sku', 'date_on',
+            name='uq_stat_stocks_fbs_natural_key',
+            postgresql_nulls_not_distinct=True
+        ),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
 
-    date_on = Column(Date)
+    date_on = Column(Date, nullable=False)
 
     warehouse_id = Column(Integer)
     amount = Column(Integer)
@@ -1,10 +1,19 @@
-from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean
+from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean, UniqueConstraint
 
 from wb.db.connector import Base
+from wb.db.models.account import AccountMixin
+from wb.db.models.row_hash import RowHashMixin
 
 
-class FbsWarehouse(Base):
+class FbsWarehouse(AccountMixin, RowHashMixin, Base):
     __tablename__ = 'stat_fbs_warehouses'
+    __table_args__ = (
+        UniqueConstraint(
+            'account_id', 'warehouse_id', 'delivery_type', 'cargo_type', 'office_id',
+            name='uq_stat_fbs_warehouses_natural_key',
+            postgresql_nulls_not_distinct=True
+        ),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
 
@@ -1,14 +1,24 @@
-from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean
+from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean, UniqueConstraint, Index
 
 from wb.db.connector import Base
+from wb.db.models.account import AccountMixin
+from wb.db.models.row_hash import RowHashMixin
 
 
-class NmIDCard(Base):
+class NmIDCard(AccountMixin, RowHashMixin, Base):
     __tablename__ = 'nmids_list'
+    __table_args__ = (
+        UniqueConstraint(
+            'account_id', 'nm_id', 'chrt_id',
+            name='uq_nmids_list_natural_key',
+            postgresql_nulls_not_distinct=True
+        ),
+        Index('ix_nmids_list_account_id_barcode', 'account_id', 'barcode'),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
 
-    nm_id = Column(BigInteger)
+    nm_id = Column(BigInteger, nullable=False)
     imt_id = Column(Integer)
     nm_uuid = Column(String)
     subject_id = Column(String)
@@ -17,7 +27,7 @@ class NmIDCard(Base):
     brand = Column(String)
     title = Column(String)
     barcode = Column(String)
-    chrt_id = Column(Integer)
+    chrt_id = Column(Integer, nullable=False)
     tech_size = Column(String)
     wb_size = Column(String)
     length = Column(Integer)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, BigInteger, DateTime, String, JSON, UniqueConstraint, func
+
+from wb.db.connector import Base
+
+
+class PaginationCheckpoint(Base):
+    __tablename__ = 'pagination_checkpoints'
+    __table_args__ = (
+        UniqueConstraint('endpoint', 'account', name='uq_pagination_checkpoints_endpoint_account'),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+
+    endpoint = Column(String, nullable=False)
+    # id кабинета, тот же, что account_id в строках данных
+    account = Column(String, nullable=False)
+    cursor = Column(JSON)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -1,14 +1,23 @@
-from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean
+from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean, UniqueConstraint
 
 from wb.db.connector import Base
+from wb.db.models.account import AccountMixin
+from wb.db.models.row_hash import RowHashMixin
 
 
-class PaidStorage(Base):
+class PaidStorage(AccountMixin, RowHashMixin, Base):
     __tablename__ = 'paid_storage'
+    __table_args__ = (
+        UniqueConstraint(
+            'account_id', 'date_on', 'office_id', 'gi_id', 'chrt_id', 'calc_type', 'nm_id',
+            name='uq_paid_storage_natural_key',
+            postgresql_nulls_not_distinct=True
+        ),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
 
-    date_on = Column(Date)
+    date_on = Column(Date, nullable=False)
     log_warehouse_coef = Column(Float)
     office_id = Column(Integer)
     warehouse = Column(String)
@@ -20,7 +29,7 @@ class PaidStorage(Base):
     subject = Column(String)
     brand = Column(String)
     vendor_code = Column(String)
-    nm_id = Column(BigInteger)
+    nm_id = Column(BigInteger, nullable=False)
     volume = Column(Float)
     calc_type = Column(String)
     warehouse_price = Column(Float)
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, String
+
+
+class RowHashMixin:
+    """Хэш содержимого строки: повторная загрузка не переписывает строки, которые не изменились."""
+
+    row_hash = Column(
+        String(32)
+    )
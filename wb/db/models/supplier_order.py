@@ -1,10 +1,19 @@
-from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean
+from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean, UniqueConstraint
 
 from wb.db.connector import Base
+from wb.db.models.account import AccountMixin
+from wb.db.models.row_hash import RowHashMixin
 
 
-class SupplierOrder(Base):
+class SupplierOrder(AccountMixin, RowHashMixin, Base):
     __tablename__ = 'supplier_orders'
+    __table_args__ = (
+        UniqueConstraint(
+            'account_id', 'srid', 'nm_id',
+            name='uq_supplier_orders_natural_key',
+            postgresql_nulls_not_distinct=True
+        ),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
 
@@ -16,7 +25,7 @@ class SupplierOrder(Base):
     oblast_okrug_name = Column(String)
     region_name = Column(String)
     supplier_article = Column(String)
-    nm_id = Column(BigInteger)
+    nm_id = Column(BigInteger, nullable=False)
     barcode = Column(String)
     category = Column(String)
     subject = Column(String)
@@ -35,4 +44,4 @@ class SupplierOrder(Base):
     order_type = Column(String)
     sticker = Column(String)
     g_number = Column(String)
-    srid = Column(String)
+    srid = Column(String, nullable=False)
@@ -1,10 +1,19 @@
-from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean
+from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean, UniqueConstraint
 
 from wb.db.connector import Base
+from wb.db.models.account import AccountMixin
+from wb.db.models.row_hash import RowHashMixin
 
 
-class SupplierSale(Base):
+class SupplierSale(AccountMixin, RowHashMixin, Base):
     __tablename__ = 'supplier_sales'
+    __table_args__ = (
+        UniqueConstraint(
+            'account_id', 'srid', 'nm_id',
+            name='uq_supplier_sales_natural_key',
+            postgresql_nulls_not_distinct=True
+        ),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
 
@@ -16,7 +25,7 @@ class SupplierSale(Base):
     oblast_okrug_name = Column(String)
     region_name = Column(String)
     supplier_article = Column(String)
-    nm_id = Column(BigInteger)
+    nm_id = Column(BigInteger, nullable=False)
     barcode = Column(String)
     category = Column(String)
     subject = Column(String)
@@ -36,4 +45,4 @@ class SupplierSale(Base):
     order_type = Column(String)
     sticker = Column(String)
     g_number = Column(String)
-    srid = Column(String)
+    srid = Column(String, nullable=False)
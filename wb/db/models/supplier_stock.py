@@ -1,10 +1,19 @@
-from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean
+from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean, UniqueConstraint
 
 from wb.db.connector import Base
+from wb.db.models.account import AccountMixin
+from wb.db.models.row_hash import RowHashMixin
 
 
-class SupplierStock(Base):
+class SupplierStock(AccountMixin, RowHashMixin, Base):
     __tablename__ = 'supplier_stocks'
+    __table_args__ = (
+        UniqueConstraint(
+            'account_id', 'nm_id', 'barcode', 'warehouse_name', 'date_receiving',
+            name='uq_supplier_stocks_natural_key',
+            postgresql_nulls_not_distinct=True
+        ),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
 
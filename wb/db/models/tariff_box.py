@@ -1,15 +1,24 @@
-from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean
+from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean, UniqueConstraint
 
 from wb.db.connector import Base
+from wb.db.models.account import AccountMixin
+from wb.db.models.row_hash import RowHashMixin
 
 
-class TariffBox(Base):
+class TariffBox(AccountMixin, RowHashMixin, Base):
     __tablename__ = 'tariffs_box'
+    __table_args__ = (
+        UniqueConstraint(
+            'account_id', 'warehouse_name', 'upload_at',
+            name='uq_tariffs_box_natural_key',
+            postgresql_nulls_not_distinct=True
+        ),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
 
-    upload_at = Column(Date)
-    warehouse_name = Column(String)
+    upload_at = Column(Date, nullable=False)
+    warehouse_name = Column(String, nullable=False)
     box_delivery_and_storage_expr = Column(Float)
     box_delivery_base = Column(Float)
     box_delivery_liter = Column(Float)
@@ -1,14 +1,23 @@
-from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean
+from sqlalchemy import Column, BigInteger, Date, DateTime, String, Integer, Float, Boolean, UniqueConstraint
 
 from wb.db.connector import Base
+from wb.db.models.account import AccountMixin
+from wb.db.models.row_hash import RowHashMixin
 
 
-class TariffCommission(Base):
+class TariffCommission(AccountMixin, RowHashMixin, Base):
     __tablename__ = 'tariffs_commission'
+    __table_args__ = (
+        UniqueConstraint(
+            'account_id', 'parent_id', 'subject_id', 'upload_at',
+            name='uq_tariffs_commission_natural_key',
+            postgresql_nulls_not_distinct=True
+        ),
+    )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
 
-    upload_at = Column(Date)
+    upload_at = Column(Date, nullable=False)
     kgvp_marketplace = Column(Float)
     kgvp_supplier = Column(Float)
     kgvp_supplier_express = Column(Float)
@@ -0,0 +1,311 @@
+from dataclasses import dataclass
+from typing import Iterable, Sequence
+
+import sqlalchemy.orm
+from sqlalchemy import and_, literal_column, or_, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from config import settings
+from wb.db.hashing import ROW_HASH_COLUMN, with_row_hashes
+from wb.db.key_index import KeyIndex, row_key
+
+
+UPSERT_BATCH_SIZE = 1000
+
+
+@dataclass
+class UpsertResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    def __iadd__(
+        self,
+        other: 'UpsertResult'
+    ) -> 'UpsertResult':
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.unchanged += other.unchanged
+        return self
+
+
+def bulk_upsert(
+    session: sqlalchemy.orm.Session,
+    model: type[sqlalchemy.orm.DeclarativeBase],
+    rows: Iterable[dict],
+    key_columns: Sequence[str],
+    batch_size: int = UPSERT_BATCH_SIZE,
+    key_index: KeyIndex | None = None
+) -> UpsertResult:
+    """Вставляет строки или обновляет существующие по естественному ключу, без commit.
+
+    На PostgreSQL с `DB_USE_NATIVE_UPSERT` и уникальным индексом в БД на `key_columns` -
+    пачками `INSERT ... ON CONFLICT DO UPDATE`. Иначе - одна выборка id по ключам
+    на пачку, затем `bulk_update_mappings` и `bulk_insert_mappings`.
+    NULL в ключе совпадает с NULL, как в прежнем поиске через `IS NULL`: если индекс
+    в БД не `NULLS NOT DISTINCT` и колонки ключа не NOT NULL, такие строки сверяются выборкой.
+    Повторы ключа во входных строках схлопываются, побеждает последняя строка.
+    У таблиц с `row_hash` строки с тем же хэшем не переписываются, а с `key_index`
+    неизменные строки отсеиваются ещё в памяти и в БД не уходят.
+    """
+    table = model.__table__
+
+    unique_rows = {}
+    for row in with_row_hashes(table=table, rows=rows):
+        unique_rows[row_key(table=table, row=row, key_columns=key_columns)] = row
+
+    result = UpsertResult()
+
+    changed_rows = list(unique_rows.values())
+    if key_index is not None:
+        split = key_index.split(rows=changed_rows)
+        changed_rows = split.changed
+        result.unchanged = len(split.unchanged)
+
+    native = use_native_upsert(
+        session=session,
+        table=table,
+        key_columns=key_columns
+    )
+    native_null_keys = native and null_safe_key(
+        session=session,
+        table=table,
+        key_columns=key_columns
+    )
+
+    # одна пачка - один набор колонок, иначе пропущенные поля затрутся NULL
+    groups = {}
+    for row in changed_rows:
+        native_row = native and (native_null_keys or not has_null_key(row=row, key_columns=key_columns))
+        groups.setdefault((native_row, frozenset(row)), []).append(row)
+
+    for (native_group, _), group in groups.items():
+        for index in range(0, len(group), batch_size):
+            batch = group[index:index + batch_size]
+
+            if native_group:
+                result += _native_upsert(
+                    session=session,
+                    table=table,
+                    rows=batch,
+                    key_columns=key_columns
+                )
+            else:
+                result += _fallback_upsert(
+                    session=session,
+                    model=model,
+                    rows=batch,
+                    key_columns=key_columns,
+                    key_index=key_index
+                )
+
+    if key_index is not None:
+        key_index.remember(rows=changed_rows)
+
+    return result
+
+
+def has_null_key(
+    row: dict,
+    key_columns: Sequence[str]
+) -> bool:
+    return any(row.get(column) is None for column in key_columns)
+
+
+def key_filter(
+    columns: Sequence,
+    keys: Iterable[tuple]
+):
+    """Условие «ключ входит в `keys`», где NULL совпадает с NULL, как `IS NOT DISTINCT FROM`.
+
+    Полные ключи идут одним `IN` по кортежу, ключи с NULL - отдельными условиями `IS NULL`.
+    """
+    complete_keys = []
+    conditions = []
+
+    for key in keys:
+        if None not in key:
+            complete_keys.append(key)
+            continue
+
+        conditions.append(
+            and_(*(
+                column.is_(None) if value is None else column == value
+                for column, value in zip(columns, key)
+            ))
+        )
+
+    if complete_keys:
+        conditions.append(tuple_(*columns).in_(complete_keys))
+
+    return or_(*conditions)
+
+
+# (БД, таблица) -> наборы колонок уникальных индексов, которые реально есть в БД
+_UNIQUE_KEYS_CACHE = {}
+
+
+def unique_keys(
+    session: sqlalchemy.orm.Session,
+    table
+) -> dict[frozenset[str], bool]:
+    """Валидные уникальные индексы таблицы по `pg_index`, один запрос на таблицу.
+
+    Набор колонок -> совпадает ли NULL с NULL: индекс `NULLS NOT DISTINCT` или все колонки
+    NOT NULL. Индексы на выражениях (например, COALESCE) не годятся для ON CONFLICT
+    по колонкам и не возвращаются.
+    """
+    cache_key = (session.get_bind().url.render_as_string(), table.fullname)
+
+    if cache_key not in _UNIQUE_KEYS_CACHE:
+        # indnullsnotdistinct есть только с PostgreSQL 15, на старых версиях через jsonb читается NULL
+        _UNIQUE_KEYS_CACHE[cache_key] = {
+            frozenset(columns): null_safe for columns, null_safe in session.execute(
+                text(
+                    """
+                        SELECT array_agg(pg_attribute.attname),
+                               bool_or(coalesce((to_jsonb(pg_index) ->> 'indnullsnotdistinct')::boolean, false))
+                               OR bool_and(pg_attribute.attnotnull)
+                        FROM pg_index
+                        JOIN pg_attribute
+                            ON pg_attribute.attrelid = pg_index.indrelid
+                            AND pg_attribute.attnum = ANY(pg_index.indkey)
+                        WHERE pg_index.indrelid = to_regclass(:table_name)
+                        AND pg_index.indisunique
+                        AND pg_index.indisvalid
+                        AND pg_index.indpred IS NULL
+                        AND pg_index.indexprs IS NULL
+                        GROUP BY pg_index.indexrelid
+                    """
+                ),
+                {'table_name': table.fullname}
+            )
+        }
+
+    return _UNIQUE_KEYS_CACHE[cache_key]
+
+
+def use_native_upsert(
+    session: sqlalchemy.orm.Session,
+    table,
+    key_columns: Sequence[str]
+) -> bool:
+    # ON CONFLICT требует уникального индекса ровно на колонках ключа, причём в самой БД:
+    # в старой таблице миграция ключа могла не пройти (например, из-за дубликатов)
+    return (
+        settings.db.DB_USE_NATIVE_UPSERT
+        and session.get_bind().dialect.name == 'postgresql'
+        and frozenset(key_columns) in unique_keys(session=session, table=table)
+    )
+
+
+def null_safe_key(
+    session: sqlalchemy.orm.Session,
+    table,
+    key_columns: Sequence[str]
+) -> bool:
+    # без NULLS NOT DISTINCT ON CONFLICT не считает NULL в ключе совпадением и вставит дубликат
+    return unique_keys(session=session, table=table).get(frozenset(key_columns), False)
+
+
+def _native_upsert(
+    session: sqlalchemy.orm.Session,
+    table,
+    rows: list[dict],
+    key_columns: Sequence[str]
+) -> UpsertResult:
+    statement = pg_insert(table).values(rows)
+
+    update_columns = [
+        column for column in rows[0] if column not in key_columns and column != 'id'
+    ]
+
+    if update_columns:
+        where = None
+        if ROW_HASH_COLUMN in update_columns:
+            # строка с тем же хэшем не обновляется: ни новой версии, ни записи в WAL
+            where = table.c[ROW_HASH_COLUMN].is_distinct_from(statement.excluded[ROW_HASH_COLUMN])
+
+        statement = statement.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={column: statement.excluded[column] for column in update_columns},
+            where=where
+        )
+    else:
+        statement = statement.on_conflict_do_nothing(
+            index_elements=list(key_columns)
+        )
+
+    # xmax = 0 только у только что вставленной версии строки
+    inserted_flags = session.execute(
+        statement.returning(literal_column('(xmax = 0)'))
+    ).scalars().all()
+
+    inserted = sum(1 for flag in inserted_flags if flag)
+
+    return UpsertResult(
+        inserted=inserted,
+        updated=len(inserted_flags) - inserted,
+        unchanged=len(rows) - len(inserted_flags)
+    )
+
+
+def _fallback_upsert(
+    session: sqlalchemy.orm.Session,
+    model: type[sqlalchemy.orm.DeclarativeBase],
+    rows: list[dict],
+    key_columns: Sequence[str],
+    key_index: KeyIndex | None = None
+) -> UpsertResult:
+    table = model.__table__
+    columns = [table.c[key] for key in key_columns]
+
+    row_keys = [
+        row_key(table=table, row=row, key_columns=key_columns) for row in rows
+    ]
+
+    has_hash = ROW_HASH_COLUMN in table.c
+
+    # ключ -> (id, хэш в БД); для строк из key_index хэш уже сверен, им нужен только id
+    existing = {}
+    if key_index is not None:
+        for key in row_keys:
+            existing_id = key_index.get_id(key=key)
+            if existing_id is not None:
+                existing[key] = (existing_id, None)
+
+    # индекс покрывает только своё окно, остальные ключи проверяются в БД
+    unknown_keys = set(row_keys) - existing.keys()
+    if unknown_keys:
+        hash_column = table.c[ROW_HASH_COLUMN] if has_hash else sqlalchemy.null()
+
+        for existing_row in session.execute(
+            sqlalchemy.select(table.c.id, hash_column, *columns).where(
+                key_filter(columns=columns, keys=unknown_keys)
+            )
+        ):
+            existing.setdefault(tuple(existing_row[2:]), (existing_row[0], existing_row[1]))
+
+    inserts = []
+    updates = []
+    unchanged = 0
+    for key, row in zip(row_keys, rows):
+        existing_id, existing_hash = existing.get(key, (None, None))
+
+        if existing_id is None:
+            inserts.append(row)
+        elif has_hash and existing_hash is not None and existing_hash == row.get(ROW_HASH_COLUMN):
+            unchanged += 1
+        else:
+            updates.append({**row, 'id': existing_id})
+
+    if updates:
+        session.bulk_update_mappings(model, updates)
+    if inserts:
+        session.bulk_insert_mappings(model, inserts)
+
+    return UpsertResult(
+        inserted=len(inserts),
+        updated=len(updates),
+        unchanged=unchanged
+    )
@@ -1,28 +1,322 @@
-import sqlalchemy.orm
-from sqlalchemy import text
+from sqlalchemy import UniqueConstraint, inspect, text
 
 from logs import app_logger
+from wb.accounts import DEFAULT_ACCOUNT_ID
 
 
-def try_to_find_model(
-    model: sqlalchemy.orm.DeclarativeBase,
-    session: sqlalchemy.orm.Session,
-    filters: dict,
-    updates: dict
-):
-    model_in_db = session.query(model).filter_by(**filters).first()
-
-    if model_in_db:
-        for key, value in updates.items():
-            if key != 'id' and not key.startswith('_'):
-                setattr(
-                    model_in_db,
-                    key,
-                    value
+def add_account_columns(engine, tables):
+    """Добавляет `account_id` в таблицы, созданные до появления нескольких кабинетов.
+
+    Старые строки получают кабинет `default`, так что однокабинетная установка
+    продолжает работать без ручной миграции.
+    """
+    inspector = inspect(engine)
+
+    with engine.begin() as conn:
+        for table in tables:
+            if 'account_id' not in table.c:
+                continue
+
+            if not _has_column(inspector=inspector, table_name=table.name, column_name='account_id'):
+                conn.execute(
+                    text(
+                        f"ALTER TABLE {table.name} "
+                        f"ADD COLUMN account_id VARCHAR NOT NULL DEFAULT '{DEFAULT_ACCOUNT_ID}'"
+                    )
+                )
+
+            index_name = f'ix_{table.name}_account_id'
+            if index_name not in {index['name'] for index in inspector.get_indexes(table.name)}:
+                conn.execute(
+                    text(
+                        f'CREATE INDEX {index_name} ON {table.name} (account_id)'
+                    )
+                )
+
+
+def add_row_hash_columns(engine, tables):
+    """Добавляет `row_hash` в таблицы, созданные до его появления.
+
+    У старых строк хэш пустой, поэтому первая загрузка перепишет их один раз
+    и заполнит хэш, дальше неизменные строки пропускаются.
+    """
+    inspector = inspect(engine)
+
+    with engine.begin() as conn:
+        for table in tables:
+            if 'row_hash' not in table.c:
+                continue
+
+            if not _has_column(inspector=inspector, table_name=table.name, column_name='row_hash'):
+                conn.execute(
+                    text(
+                        f'ALTER TABLE {table.name} ADD COLUMN row_hash VARCHAR(32)'
+                    )
+                )
+
+
+def add_not_null_columns(engine, tables):
+    """Переводит в NOT NULL колонки, объявленные `nullable=False` после создания таблицы (только PostgreSQL).
+
+    Сначала ставится `CHECK (... IS NOT NULL) NOT VALID` и проверяется через VALIDATE, который
+    не блокирует запись, после него SET NOT NULL не сканирует таблицу. Если в колонке уже есть
+    NULL, она остаётся как есть, в лог пишется число таких строк.
+    """
+    if engine.dialect.name != 'postgresql':
+        return
+
+    inspector = inspect(engine)
+
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for table in tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            nullable_columns = {
+                column['name'] for column in inspector.get_columns(table.name) if column['nullable']
+            }
+
+            for column in table.columns:
+                if column.nullable or column.name not in nullable_columns:
+                    continue
+
+                _set_not_null(
+                    conn=conn,
+                    table_name=table.name,
+                    column_name=column.name
                 )
-        session.commit()
-        return True
-    return False
+
+
+def _set_not_null(conn, table_name, column_name):
+    null_rows = conn.execute(
+        text(f'SELECT count(*) FROM {table_name} WHERE {column_name} IS NULL')
+    ).scalar()
+
+    if null_rows:
+        app_logger.error(
+            msg=f'Found {null_rows} rows with NULL in {table_name}.{column_name}, '
+                f'column is not set to NOT NULL'
+        )
+        return
+
+    check_name = f'ck_{table_name}_{column_name}_not_null'
+
+    try:
+        conn.execute(
+            text(
+                f'ALTER TABLE {table_name} ADD CONSTRAINT {check_name} '
+                f'CHECK ({column_name} IS NOT NULL) NOT VALID'
+            )
+        )
+        conn.execute(
+            text(f'ALTER TABLE {table_name} VALIDATE CONSTRAINT {check_name}')
+        )
+        conn.execute(
+            text(
+                f'ALTER TABLE {table_name} ALTER COLUMN {column_name} SET NOT NULL; '
+                f'ALTER TABLE {table_name} DROP CONSTRAINT {check_name}'
+            )
+        )
+
+        app_logger.info(
+            msg=f'Column {table_name}.{column_name} set to NOT NULL'
+        )
+    except Exception as e:
+        # NULL мог успеть вставиться между проверкой и VALIDATE - повторим при следующем запуске
+        app_logger.error(
+            msg=f'Problem with set NOT NULL on {table_name}.{column_name}, error: {str(e)}'
+        )
+        conn.execute(
+            text(f'ALTER TABLE {table_name} DROP CONSTRAINT IF EXISTS {check_name}')
+        )
+
+
+def _has_column(inspector, table_name, column_name):
+    # ADD COLUMN IF NOT EXISTS есть не во всех СУБД, поэтому колонки сверяются через инспектор
+    return column_name in {column['name'] for column in inspector.get_columns(table_name)}
+
+
+def create_natural_keys(engine, tables, deduplicate=False):
+    """Онлайн-миграция естественных ключей для уже существующих таблиц (только PostgreSQL).
+
+    Для каждого объявленного `UniqueConstraint`, которого ещё нет в БД или который лежит в БД
+    со старым набором колонок либо без `NULLS NOT DISTINCT` (`postgresql_nulls_not_distinct`,
+    PostgreSQL 15+): индекс строится через CREATE INDEX CONCURRENTLY и затем
+    присоединяется как ограничение (старое снимается в той же транзакции). Если по новому
+    ключу есть дубликаты, ограничение не создаётся и в лог пишется их число; удаляются они
+    (остаётся строка с наибольшим id) только с `deduplicate`. Составные `Index` тоже строятся
+    CONCURRENTLY. Запись в таблицы на время сборки не блокируется. Новые таблицы получают
+    всё это сразу из `create_all`.
+    """
+    if engine.dialect.name != 'postgresql':
+        return
+
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for table in tables:
+            for constraint in table.constraints:
+                if isinstance(constraint, UniqueConstraint) and constraint.name:
+                    _migrate_unique_constraint(
+                        conn=conn,
+                        table_name=table.name,
+                        name=constraint.name,
+                        columns=[column.name for column in constraint.columns],
+                        nulls_not_distinct=bool(
+                            constraint.dialect_options['postgresql']['nulls_not_distinct']
+                        ),
+                        deduplicate=deduplicate
+                    )
+
+            for index in table.indexes:
+                try:
+                    _create_index_concurrently(
+                        conn=conn,
+                        table_name=table.name,
+                        name=index.name,
+                        columns=[column.name for column in index.columns],
+                        unique=index.unique
+                    )
+                except Exception as e:
+                    app_logger.error(
+                        msg=f'Problem with create index {index.name}, error: {str(e)}'
+                    )
+
+
+def _constraint_state(conn, table_name, name):
+    # indnullsnotdistinct есть только с PostgreSQL 15, на старых версиях через jsonb читается NULL
+    state = conn.execute(
+        text(
+            """
+                SELECT array_agg(pg_attribute.attname ORDER BY conkey.position),
+                       bool_or(coalesce((to_jsonb(pg_index) ->> 'indnullsnotdistinct')::boolean, false))
+                FROM pg_constraint
+                CROSS JOIN LATERAL unnest(pg_constraint.conkey) WITH ORDINALITY AS conkey(attnum, position)
+                JOIN pg_attribute
+                    ON pg_attribute.attrelid = pg_constraint.conrelid
+                    AND pg_attribute.attnum = conkey.attnum
+                LEFT JOIN pg_index
+                    ON pg_index.indexrelid = pg_constraint.conindid
+                WHERE pg_constraint.conname = :name
+                AND pg_constraint.conrelid = CAST(:table_name AS regclass)
+            """
+        ),
+        {'name': name, 'table_name': table_name}
+    ).one()
+
+    return state[0], bool(state[1])
+
+
+def _migrate_unique_constraint(conn, table_name, name, columns, nulls_not_distinct=False, deduplicate=False):
+    existing_columns, existing_nulls_not_distinct = _constraint_state(
+        conn=conn,
+        table_name=table_name,
+        name=name
+    )
+
+    if existing_columns == columns and existing_nulls_not_distinct == nulls_not_distinct:
+        return
+
+    column_list = ', '.join(columns)
+    duplicates_sql = f"""
+        SELECT id FROM (
+            SELECT id,
+                   row_number() OVER (PARTITION BY {column_list} ORDER BY id DESC) AS rn
+            FROM {table_name}
+        ) AS duplicates
+        WHERE duplicates.rn > 1
+    """
+
+    # у старого ограничения имя то же, поэтому новый индекс собирается рядом под временным
+    index_name = name if existing_columns is None else f'{name}_rebuild'
+
+    try:
+        duplicates = conn.execute(
+            text(f'SELECT count(*) FROM ({duplicates_sql}) AS counted')
+        ).scalar()
+
+        if duplicates and not deduplicate:
+            app_logger.error(
+                msg=f'Found {duplicates} duplicates in {table_name} by ({column_list}), '
+                    f'unique constraint {name} is not created. '
+                    f'Remove them manually or set DB_DEDUPLICATE_ON_MIGRATION=true'
+            )
+            return
+
+        if duplicates:
+            deleted = conn.execute(
+                text(f'DELETE FROM {table_name} WHERE id IN ({duplicates_sql})')
+            ).rowcount
+
+            app_logger.info(
+                msg=f'Removed {deleted} duplicates from {table_name} by ({column_list})'
+            )
+
+        _create_index_concurrently(
+            conn=conn,
+            table_name=table_name,
+            name=index_name,
+            columns=columns,
+            unique=True,
+            nulls_not_distinct=nulls_not_distinct
+        )
+
+        # несколько команд в одном запросе PostgreSQL выполняет одной транзакцией
+        conn.execute(
+            text(
+                (f'ALTER TABLE {table_name} DROP CONSTRAINT {name}; ' if existing_columns is not None else '')
+                + f'ALTER TABLE {table_name} ADD CONSTRAINT {name} UNIQUE USING INDEX {index_name}'
+            )
+        )
+
+        app_logger.info(
+            msg=f'Unique constraint {name} created successfully by ({column_list})'
+        )
+    except Exception as e:
+        # дубликат мог успеть вставиться между проверкой и сборкой - повторим при следующем запуске
+        app_logger.error(
+            msg=f'Problem with create unique constraint {name}, error: {str(e)}'
+        )
+        _drop_invalid_index(
+            conn=conn,
+            name=index_name
+        )
+
+
+def _create_index_concurrently(conn, table_name, name, columns, unique=False, nulls_not_distinct=False):
+    # после неудачной сборки CONCURRENTLY остаётся невалидный индекс, IF NOT EXISTS его не заменит
+    _drop_invalid_index(
+        conn=conn,
+        name=name
+    )
+
+    conn.execute(
+        text(
+            f'CREATE {"UNIQUE " if unique else ""}INDEX CONCURRENTLY IF NOT EXISTS {name} '
+            f'ON {table_name} ({", ".join(columns)})'
+            f'{" NULLS NOT DISTINCT" if nulls_not_distinct else ""}'
+        )
+    )
+
+
+def _drop_invalid_index(conn, name):
+    invalid = conn.execute(
+        text(
+            """
+                SELECT EXISTS(
+                    SELECT 1
+                    FROM pg_index
+                    JOIN pg_class ON pg_class.oid = pg_index.indexrelid
+                    WHERE pg_class.relname = :name
+                    AND NOT pg_index.indisvalid
+                )
+            """
+        ),
+        {'name': name}
+    ).scalar()
+
+    if invalid:
+        conn.execute(
+            text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+        )
 
 
 def create_views(engine):
@@ -33,51 +327,58 @@ CREATE OR REPLACE VIEW view_wb_acceptance_report_rnp AS
 SELECT war.shk_create_date_on,
        war.nm_id,
        sum(war.count) AS count,
-       (sum(war.total))::numeric AS total
+       (sum(war.total))::numeric AS total,
+       war.account_id
 FROM acceptance_reports war
-GROUP BY war.shk_create_date_on, war.nm_id;
+GROUP BY war.account_id, war.shk_create_date_on, war.nm_id;
 """,
         # 2
         "view_wb_advert_cost_from_doc": """
 CREATE OR REPLACE VIEW view_wb_advert_cost_from_doc AS
 WITH advert_groups AS (
-    SELECT date(advert_full_stats.date_at) AS date_at,
+    SELECT advert_full_stats.account_id,
+           date(advert_full_stats.date_at) AS date_at,
            advert_full_stats.advert_id,
            advert_full_stats.nm_id,
            sum(advert_full_stats.sum) AS adv_cost
     FROM advert_full_stats
-    GROUP BY date(advert_full_stats.date_at),
+    GROUP BY advert_full_stats.account_id,
+             date(advert_full_stats.date_at),
              advert_full_stats.advert_id,
              advert_full_stats.nm_id
 ),
 statistics_groups AS (
-    SELECT date(advert_costs.upd_time_at) AS date_at,
+    SELECT advert_costs.account_id,
+           date(advert_costs.upd_time_at) AS date_at,
            advert_costs.advert_id,
            sum(advert_costs.upd_sum) AS stat_cost
     FROM advert_costs
-    GROUP BY date(advert_costs.upd_time_at),
+    GROUP BY advert_costs.account_id,
+             date(advert_costs.upd_time_at),
              advert_costs.advert_id
 ),
 real_adv_cost AS (
-    SELECT a.date_at,
+    SELECT a.account_id,
+           a.date_at,
            a.nm_id,
            a.advert_id,
            COALESCE(
              (round((((s.stat_cost)::double precision
              * (a.adv_cost / NULLIF(sum(a.adv_cost)
-                  OVER (PARTITION BY a.date_at, a.advert_id),
+                  OVER (PARTITION BY a.account_id, a.date_at, a.advert_id),
                   (0)::double precision))))::numeric, 2))::double precision,
              a.adv_cost
            ) AS stat_cost_real
     FROM advert_groups a
     LEFT JOIN statistics_groups s
-      ON ( (s.date_at = a.date_at) AND (s.advert_id = a.advert_id) )
+      ON ( (s.account_id = a.account_id) AND (s.date_at = a.date_at) AND (s.advert_id = a.advert_id) )
 )
 SELECT real_adv_cost.date_at,
        real_adv_cost.nm_id,
-       sum(real_adv_cost.stat_cost_real) AS stat_cost_real
+       sum(real_adv_cost.stat_cost_real) AS stat_cost_real,
+       real_adv_cost.account_id
 FROM real_adv_cost
-GROUP BY real_adv_cost.date_at, real_adv_cost.nm_id;
+GROUP BY real_adv_cost.account_id, real_adv_cost.date_at, real_adv_cost.nm_id;
 """,
         # 3
         "view_wb_nmids_list_updated": """
@@ -94,8 +395,9 @@ WITH all_sku AS (
            nmids_list.length,
            nmids_list.width,
            nmids_list.height,
+           nmids_list.account_id,
            row_number() OVER (
-             PARTITION BY nmids_list.barcode, nmids_list.nm_id
+             PARTITION BY nmids_list.account_id, nmids_list.barcode, nmids_list.nm_id
              ORDER BY nmids_list.updated_at DESC
            ) AS rn
     FROM nmids_list
@@ -111,7 +413,8 @@ SELECT all_sku.nm_id,
        all_sku.length,
        all_sku.width,
        all_sku.height,
-       all_sku.rn
+       all_sku.rn,
+       all_sku.account_id
 FROM all_sku
 WHERE (all_sku.rn = 1);
 """,
@@ -128,8 +431,9 @@ WITH all_sku AS (
            nmids_list.length,
            nmids_list.width,
            nmids_list.height,
+           nmids_list.account_id,
            row_number() OVER (
-             PARTITION BY nmids_list.nm_id
+             PARTITION BY nmids_list.account_id, nmids_list.nm_id
              ORDER BY nmids_list.updated_at DESC
            ) AS rn
     FROM nmids_list
@@ -143,7 +447,8 @@ SELECT all_sku.nm_id,
        all_sku.length,
        all_sku.width,
        all_sku.height,
-       all_sku.rn
+       all_sku.rn,
+       all_sku.account_id
 FROM all_sku
 WHERE (all_sku.rn = 1);
 """,
@@ -161,8 +466,9 @@ WITH last_orders AS (
            supplier_orders.price_with_disc,
            supplier_orders.is_cancel,
            supplier_orders.srid,
+           supplier_orders.account_id,
            row_number() OVER (
-             PARTITION BY supplier_orders.srid
+             PARTITION BY supplier_orders.account_id, supplier_orders.srid
              ORDER BY supplier_orders.last_change_date_on DESC
            ) AS rn
     FROM supplier_orders
@@ -180,8 +486,9 @@ last_sales AS (
            supplier_sales.price_with_disc,
            supplier_sales.sale_id,
            supplier_sales.srid,
+           supplier_sales.account_id,
            row_number() OVER (
-             PARTITION BY supplier_sales.sale_id, supplier_sales.srid
+             PARTITION BY supplier_sales.account_id, supplier_sales.sale_id, supplier_sales.srid
              ORDER BY supplier_sales.last_change_date_at DESC
            ) AS rn
     FROM supplier_sales
@@ -210,23 +517,26 @@ SELECT date(o.date_on) AS date_on,
            )) AS sum_item_in_way,
        sum(o.finished_price) AS sum_orders_after_spp,
        sum((COALESCE(s.finished_price, (0)::double precision)
-         - COALESCE(r.finished_price, (0)::double precision))) AS sum_sales_after_spp
+         - COALESCE(r.finished_price, (0)::double precision))) AS sum_sales_after_spp,
+       o.account_id
 FROM ((last_orders o
   LEFT JOIN last_sales s
     ON (
-      ((s.srid)::text = (o.srid)::text)
+      ((s.account_id)::text = (o.account_id)::text)
+      AND ((s.srid)::text = (o.srid)::text)
       AND ((s.sale_id)::text ~~ 'S%'::text)
       AND (s.rn = 1)
     ))
   LEFT JOIN last_sales r
     ON (
-      ((r.srid)::text = (o.srid)::text)
+      ((r.account_id)::text = (o.account_id)::text)
+      AND ((r.srid)::text = (o.srid)::text)
       AND ((r.sale_id)::text ~~ 'R%'::text)
       AND (r.rn = 1)
     ))
 WHERE (o.rn = 1)
-GROUP BY date(o.date_on), o.nm_id
-ORDER BY date(o.date_on), o.nm_id;
+GROUP BY o.account_id, date(o.date_on), o.nm_id
+ORDER BY o.account_id, date(o.date_on), o.nm_id;
 """,
         # 6
         "view_wb_paid_storage_logistika": """
@@ -234,9 +544,11 @@ CREATE OR REPLACE VIEW view_wb_paid_storage_logistika AS
 SELECT paid_storage.date_on,
        lower(TRIM(BOTH FROM paid_storage.vendor_code)) AS vendor_code,
        paid_storage.nm_id,
-       (sum(paid_storage.warehouse_price))::numeric AS summ
+       (sum(paid_storage.warehouse_price))::numeric AS summ,
+       paid_storage.account_id
 FROM paid_storage
-GROUP BY paid_storage.date_on,
+GROUP BY paid_storage.account_id,
+         paid_storage.date_on,
          paid_storage.vendor_code,
          paid_storage.nm_id;
 """,
@@ -255,12 +567,15 @@ SELECT date(o.date_on) AS date,
        count(DISTINCT s.srid) AS count_sales,
        count(DISTINCT
          CASE WHEN ((s.sale_id)::text ~~ 'R%'::text) THEN s.srid ELSE NULL::character varying END
-       ) AS count_return_sales
+       ) AS count_return_sales,
+       o.account_id
 FROM (supplier_orders o
   LEFT JOIN supplier_sales s
-    ON ((s.srid)::text = (o.srid)::text))
+    ON (((s.account_id)::text = (o.account_id)::text)
+      AND ((s.srid)::text = (o.srid)::text)))
 WHERE (o.date_on >= '2024-08-01 00:00:00'::timestamp without time zone)
-GROUP BY date(o.date_on),
+GROUP BY o.account_id,
+         date(o.date_on),
          TRIM(BOTH FROM lower((o.supplier_article)::text)),
          o.nm_id,
          o.warehouse_name,
@@ -272,11 +587,13 @@ CREATE OR REPLACE VIEW view_wb_redemption_percentage_by_30_days AS
 SELECT view_wb_percent_of_buy_with_warehouse_type.nm_id,
        ((sum(view_wb_percent_of_buy_with_warehouse_type.count_sales)
          - sum(view_wb_percent_of_buy_with_warehouse_type.count_return_sales))
-        / sum(view_wb_percent_of_buy_with_warehouse_type.count_orders)) AS redemption_percentage
+        / sum(view_wb_percent_of_buy_with_warehouse_type.count_orders)) AS redemption_percentage,
+       view_wb_percent_of_buy_with_warehouse_type.account_id
 FROM view_wb_percent_of_buy_with_warehouse_type
 WHERE ((view_wb_percent_of_buy_with_warehouse_type.date >= (CURRENT_DATE - '37 days'::interval))
   AND (view_wb_percent_of_buy_with_warehouse_type.date <= (CURRENT_DATE - '7 days'::interval)))
-GROUP BY view_wb_percent_of_buy_with_warehouse_type.nm_id;
+GROUP BY view_wb_percent_of_buy_with_warehouse_type.account_id,
+         view_wb_percent_of_buy_with_warehouse_type.nm_id;
 """,
         # 9
         "view_wb_redemption_percentage_dynamic_7day": """
@@ -288,15 +605,17 @@ SELECT d.date_on,
          ELSE round((sum(s.count_sales)
            / (sum(s.count_sales) + sum(s.count_cancel_orders))),
            3)
-       END AS redemption_percentage
+       END AS redemption_percentage,
+       d.account_id
 FROM (view_wb_orders_sales_cancels_returns_by_order_date d
   CROSS JOIN view_wb_orders_sales_cancels_returns_by_order_date s)
 WHERE ((s.date_on >= (d.date_on - '14 days'::interval))
   AND (s.date_on <= d.date_on)
+  AND ((s.account_id)::text = (d.account_id)::text)
   AND (s.nm_id = d.nm_id)
   AND (s.count_orders > 0))
-GROUP BY d.date_on, d.nm_id
-ORDER BY d.date_on DESC, d.nm_id;
+GROUP BY d.account_id, d.date_on, d.nm_id
+ORDER BY d.account_id, d.date_on DESC, d.nm_id;
 """,
         # 10
         "view_wb_stocks": """
@@ -306,21 +625,24 @@ SELECT supplier_stocks.date_receiving,
        sum(supplier_stocks.quantity) AS summ,
        sum(supplier_stocks.in_way_to_client) AS in_way_to_client,
        sum(supplier_stocks.in_way_from_client) AS in_way_from_client,
-       sum(supplier_stocks.quantity_full) AS quantity_full
+       sum(supplier_stocks.quantity_full) AS quantity_full,
+       supplier_stocks.account_id
 FROM supplier_stocks
-GROUP BY supplier_stocks.date_receiving, supplier_stocks.nm_id;
+GROUP BY supplier_stocks.account_id, supplier_stocks.date_receiving, supplier_stocks.nm_id;
 """,
         # 11
         "view_wb_stocks_fbs": """
 CREATE OR REPLACE VIEW view_wb_stocks_fbs AS
 SELECT s.date_on,
        nl.nm_id,
-       sum(s.amount) AS quantity
+       sum(s.amount) AS quantity,
+       s.account_id
 FROM stat_stocks_fbs s
 LEFT JOIN view_wb_nmids_list_updated nl
-  ON ((nl.barcode)::text = (s.sku)::text)
+  ON (((nl.account_id)::text = (s.account_id)::text)
+    AND ((nl.barcode)::text = (s.sku)::text))
 WHERE (s.amount > 0)
-GROUP BY s.date_on, nl.nm_id;
+GROUP BY s.account_id, s.date_on, nl.nm_id;
 """,
         # 12
         "view_wb_tariffs_commission": """
@@ -335,23 +657,27 @@ SELECT wtc.id,
        wtc.parent_name,
        wtc.subject_id,
        wtc.subject_name,
-       nl.nm_id
+       nl.nm_id,
+       wtc.account_id
 FROM tariffs_commission wtc
 LEFT JOIN (
     SELECT DISTINCT nmids_list.nm_id,
            nmids_list.subject_name,
-           row_number() OVER (PARTITION BY nmids_list.nm_id
+           nmids_list.account_id,
+           row_number() OVER (PARTITION BY nmids_list.account_id, nmids_list.nm_id
                               ORDER BY nmids_list.updated_at DESC) AS rn
     FROM nmids_list
 ) nl
-  ON ((nl.subject_name)::text = (wtc.subject_name)::text)
+  ON (((nl.account_id)::text = (wtc.account_id)::text)
+    AND ((nl.subject_name)::text = (wtc.subject_name)::text))
 WHERE (nl.rn = 1);
 """,
         # 13
         "sum_for_logistics": """
 CREATE OR REPLACE VIEW public.sum_for_logistics
 AS WITH volume_by_liter AS (
-         SELECT t.nm_id,
+         SELECT t.account_id,
+            t.nm_id,
             avg(t.length) * avg(t.width) * avg(t.height) / 1000::numeric AS total_volume_by_item,
             avg(t.length) * avg(t.width) * avg(t.height) / 1000::numeric - 1::numeric AS volume_add_liter
            FROM ( SELECT nmids_list.id,
@@ -371,18 +697,21 @@ AS WITH volume_by_liter AS (
                     nmids_list.height,
                     nmids_list.created_at,
                     nmids_list.updated_at,
-                    row_number() OVER (PARTITION BY nmids_list.barcode ORDER BY nmids_list.updated_at DESC) AS rn
+                    nmids_list.account_id,
+                    row_number() OVER (PARTITION BY nmids_list.account_id, nmids_list.barcode ORDER BY nmids_list.updated_at DESC) AS rn
                    FROM nmids_list) t
           WHERE t.rn = 1
-          GROUP BY t.nm_id
+          GROUP BY t.account_id, t.nm_id
         ), avg_wb_tariffs_box AS (
-         SELECT tariffs_box.warehouse_name,
+         SELECT tariffs_box.account_id,
+            tariffs_box.warehouse_name,
             avg(tariffs_box.box_delivery_base) AS avg_box_delivery_base,
             avg(tariffs_box.box_delivery_liter) AS avg_box_delivery_liter
            FROM tariffs_box
-          GROUP BY tariffs_box.warehouse_name
+          GROUP BY tariffs_box.account_id, tariffs_box.warehouse_name
         ), logistics_by_warehouse_and_item AS (
-         SELECT pob.date AS date_on,
+         SELECT pob.account_id,
+            pob.date AS date_on,
             pob.supplierarticle AS sa_article,
             pob.nm_id,
             pob.warehouse_name,
@@ -398,11 +727,11 @@ AS WITH volume_by_liter AS (
             50::numeric * (1::numeric - rp7.redemption_percentage) AS reverse_logistics,
             (COALESCE(wb_seller.box_delivery_base, wb_wb.box_delivery_base, avg_wb.avg_box_delivery_base) + COALESCE(wb_seller.box_delivery_liter, wb_wb.box_delivery_liter, avg_wb.avg_box_delivery_liter) * vbl.volume_add_liter::double precision + (50::numeric * (1::numeric - rp7.redemption_percentage))::double precision) * pob.count_orders::double precision AS all_logistics
            FROM view_wb_percent_of_buy_with_warehouse_type pob
-             LEFT JOIN volume_by_liter vbl ON pob.nm_id = vbl.nm_id
-             LEFT JOIN tariffs_box wb_seller ON wb_seller.warehouse_name::text ~~ 'Маркетплейс%'::text AND pob.warehouse_type::text = 'Склад продавца'::text AND wb_seller.upload_at = pob.date
-             LEFT JOIN tariffs_box wb_wb ON wb_wb.warehouse_name::text = pob.warehouse_name::text AND pob.warehouse_type::text = 'Склад WB'::text AND wb_wb.upload_at = pob.date
-             LEFT JOIN avg_wb_tariffs_box avg_wb ON avg_wb.warehouse_name::text = pob.warehouse_name::text AND pob.warehouse_type::text = 'Склад WB'::text
-             LEFT JOIN view_wb_redemption_percentage_dynamic_7day rp7 ON pob.nm_id = rp7.nm_id AND pob.date = rp7.date_on
+             LEFT JOIN volume_by_liter vbl ON vbl.account_id::text = pob.account_id::text AND pob.nm_id = vbl.nm_id
+             LEFT JOIN tariffs_box wb_seller ON wb_seller.account_id::text = pob.account_id::text AND wb_seller.warehouse_name::text ~~ 'Маркетплейс%'::text AND pob.warehouse_type::text = 'Склад продавца'::text AND wb_seller.upload_at = pob.date
+             LEFT JOIN tariffs_box wb_wb ON wb_wb.account_id::text = pob.account_id::text AND wb_wb.warehouse_name::text = pob.warehouse_name::text AND pob.warehouse_type::text = 'Склад WB'::text AND wb_wb.upload_at = pob.date
+             LEFT JOIN avg_wb_tariffs_box avg_wb ON avg_wb.account_id::text = pob.account_id::text AND avg_wb.warehouse_name::text = pob.warehouse_name::text AND pob.warehouse_type::text = 'Склад WB'::text
+             LEFT JOIN view_wb_redemption_percentage_dynamic_7day rp7 ON rp7.account_id::text = pob.account_id::text AND pob.nm_id = rp7.nm_id AND pob.date = rp7.date_on
         )
  SELECT l.date_on,
     l.sa_article,
@@ -411,10 +740,11 @@ AS WITH volume_by_liter AS (
     sum(l.count_sales) AS count_sales,
     sum(l.count_return_sales) AS count_return_sales,
     sum(l.count_orders) AS count_orders,
-    rp.redemption_percentage
+    rp.redemption_percentage,
+    l.account_id
    FROM logistics_by_warehouse_and_item l
-     LEFT JOIN view_wb_redemption_percentage_by_30_days rp ON rp.nm_id = l.nm_id
-  GROUP BY l.date_on, l.sa_article, l.nm_id, rp.redemption_percentage
+     LEFT JOIN view_wb_redemption_percentage_by_30_days rp ON rp.account_id::text = l.account_id::text AND rp.nm_id = l.nm_id
+  GROUP BY l.account_id, l.date_on, l.sa_article, l.nm_id, rp.redemption_percentage
   ORDER BY l.date_on DESC;
 """,
         # 14
@@ -428,12 +758,15 @@ WITH normal_nm_rep AS (
            nmr.orders_count AS orderscount,
            nmr.orders_sum_rub AS orderssumrub,
            nmr.buyouts_count AS buyoutscount,
-           nmr.buyouts_sum_bub AS buyoutssumrub
+           nmr.buyouts_sum_bub AS buyoutssumrub,
+           nmr.account_id
     FROM advert_nm_report nmr
 ),
 min_date_all AS (
-    SELECT min(normal_nm_rep.date) AS min_date
+    SELECT normal_nm_rep.account_id,
+           min(normal_nm_rep.date) AS min_date
     FROM normal_nm_rep
+    GROUP BY normal_nm_rep.account_id
 )
 SELECT nm.dt_on,
        nm.nm_id,
@@ -442,9 +775,11 @@ SELECT nm.dt_on,
        nm.orders_count,
        nm.orders_sum_rub,
        nm.buyouts_count,
-       nm.buyouts_sum_rub
+       nm.buyouts_sum_rub,
+       nm.account_id
 FROM (advert_nm_report_extended nm
-  CROSS JOIN min_date_all d)
+  JOIN min_date_all d
+    ON ((d.account_id)::text = (nm.account_id)::text))
 WHERE (d.min_date > nm.dt_on)
 UNION ALL
 SELECT normal_nm_rep.date AS dt_on,
@@ -454,7 +789,8 @@ SELECT normal_nm_rep.date AS dt_on,
        normal_nm_rep.orderscount AS orders_count,
        normal_nm_rep.orderssumrub AS orders_sum_rub,
        normal_nm_rep.buyoutscount AS buyouts_count,
-       normal_nm_rep.buyoutssumrub AS buyouts_sum_rub
+       normal_nm_rep.buyoutssumrub AS buyouts_sum_rub,
+       normal_nm_rep.account_id
 FROM normal_nm_rep;
 """,
         # 15
@@ -471,9 +807,11 @@ WITH aggregated_nm_report AS (
            sum(view_wb_advert_nm_report_union_djem.buyouts_sum_rub) AS buyouts_sum_bub,
            NULL::double precision AS buyout_percent,
            NULL::double precision AS add_to_cart_conversion,
-           NULL::double precision AS cart_to_order_conversion
+           NULL::double precision AS cart_to_order_conversion,
+           view_wb_advert_nm_report_union_djem.account_id
     FROM view_wb_advert_nm_report_union_djem
-    GROUP BY view_wb_advert_nm_report_union_djem.nm_id,
+    GROUP BY view_wb_advert_nm_report_union_djem.account_id,
+             view_wb_advert_nm_report_union_djem.nm_id,
              view_wb_advert_nm_report_union_djem.dt_on
 ),
 aggregated_advert_fullstats AS (
@@ -490,9 +828,11 @@ aggregated_advert_fullstats AS (
            avg(advert_full_stats.cr) AS cr,
            sum(advert_full_stats.shks) AS shks,
            sum(advert_full_stats.sum_price) AS sum_price,
-           avg(advert_full_stats.avg_position) AS avg_position
+           avg(advert_full_stats.avg_position) AS avg_position,
+           advert_full_stats.account_id
     FROM advert_full_stats
-    GROUP BY advert_full_stats.nm_id,
+    GROUP BY advert_full_stats.account_id,
+             advert_full_stats.nm_id,
              (date(advert_full_stats.date_at)),
              advert_full_stats.name
 )
@@ -524,13 +864,16 @@ SELECT nm_rep.nm_id,
        sku.title AS name,
        sku.barcode,
        NULL::double precision AS prime_price,
-       sku.nm_id AS wb_nm_id
+       sku.nm_id AS wb_nm_id,
+       nm_rep.account_id
 FROM ((aggregated_nm_report nm_rep
   LEFT JOIN aggregated_advert_fullstats adv_fs
-    ON ((nm_rep.dt_on = adv_fs.date_fullstats)
+    ON (((nm_rep.account_id)::text = (adv_fs.account_id)::text)
+       AND (nm_rep.dt_on = adv_fs.date_fullstats)
        AND (nm_rep.nm_id = adv_fs.nm_id)))
   LEFT JOIN nmids_list sku
-    ON ((nm_rep.nm_id = sku.nm_id) AND (sku.nm_id IS NOT NULL)));
+    ON (((nm_rep.account_id)::text = (sku.account_id)::text)
+       AND (nm_rep.nm_id = sku.nm_id) AND (sku.nm_id IS NOT NULL)));
 """,
     }
 
@@ -554,6 +897,14 @@ def create_materialized_views(engine):
 
         mv_exists = conn.execute(check_mv).scalar()
 
+        if mv_exists and not _mv_has_account_column(conn=conn):
+            # витрина до мультикабинетности: уникальный индекс без account_id не переживёт второй кабинет
+            app_logger.info(
+                msg='Materialized view mv_wb_pivot_by_day_dl has no account_id, recreating'
+            )
+            conn.execute(text('DROP MATERIALIZED VIEW mv_wb_pivot_by_day_dl'))
+            mv_exists = False
+
         if not mv_exists:
             app_logger.info(
                 msg='Creating materialized view mv_wb_pivot_by_day_dl'
@@ -630,28 +981,29 @@ def create_materialized_views(engine):
                                    WHEN (nm_rep.dt_on = (CURRENT_DATE - '1 day'::interval))
                                      THEN stkf.quantity
                                    ELSE (0)::bigint
-                               END AS "stkf.quantity_at_end_month"
+                               END AS "stkf.quantity_at_end_month",
+                               nm_rep.account_id
                         FROM dasboard_summary nm_rep
                         LEFT JOIN view_wb_stocks stk
-                            ON nm_rep.dt_on = stk.date_receiving AND nm_rep.nm_id = stk.nm_id
+                            ON nm_rep.account_id = stk.account_id AND nm_rep.dt_on = stk.date_receiving AND nm_rep.nm_id = stk.nm_id
                         LEFT JOIN view_wb_stocks_fbs stkf
-                            ON nm_rep.dt_on = stkf.date_on AND nm_rep.nm_id = stkf.nm_id
+                            ON nm_rep.account_id = stkf.account_id AND nm_rep.dt_on = stkf.date_on AND nm_rep.nm_id = stkf.nm_id
                         LEFT JOIN sum_for_logistics sl
-                            ON nm_rep.dt_on = sl.date_on AND nm_rep.nm_id = sl.nm_id
+                            ON nm_rep.account_id = sl.account_id AND nm_rep.dt_on = sl.date_on AND nm_rep.nm_id = sl.nm_id
                         LEFT JOIN view_wb_paid_storage_logistika psl
-                            ON nm_rep.dt_on = psl.date_on AND nm_rep.nm_id = psl.nm_id
+                            ON nm_rep.account_id = psl.account_id AND nm_rep.dt_on = psl.date_on AND nm_rep.nm_id = psl.nm_id
                         LEFT JOIN view_wb_acceptance_report_rnp ar
-                            ON nm_rep.dt_on = ar.shk_create_date_on AND nm_rep.nm_id = ar.nm_id
+                            ON nm_rep.account_id = ar.account_id AND nm_rep.dt_on = ar.shk_create_date_on AND nm_rep.nm_id = ar.nm_id
                         LEFT JOIN view_wb_tariffs_commission tc
-                            ON nm_rep.dt_on = tc.upload_at AND nm_rep.nm_id = tc.nm_id
+                            ON nm_rep.account_id = tc.account_id AND nm_rep.dt_on = tc.upload_at AND nm_rep.nm_id = tc.nm_id
                         LEFT JOIN view_wb_orders_sales_cancels_returns_by_order_date fs
-                            ON nm_rep.dt_on = fs.date_on AND nm_rep.nm_id = fs.nm_id
+                            ON nm_rep.account_id = fs.account_id AND nm_rep.dt_on = fs.date_on AND nm_rep.nm_id = fs.nm_id
                         LEFT JOIN view_wb_redemption_percentage_dynamic_7day rp
-                            ON nm_rep.dt_on = rp.date_on AND nm_rep.nm_id = rp.nm_id
+                            ON nm_rep.account_id = rp.account_id AND nm_rep.dt_on = rp.date_on AND nm_rep.nm_id = rp.nm_id
                         LEFT JOIN view_wb_advert_cost_from_doc ac
-                            ON nm_rep.dt_on = ac.date_at AND nm_rep.nm_id = ac.nm_id
+                            ON nm_rep.account_id = ac.account_id AND nm_rep.dt_on = ac.date_at AND nm_rep.nm_id = ac.nm_id
                         LEFT JOIN view_wb_nmids_list_updated_no_barcode nml
-                            ON nm_rep.nm_id = nml.nm_id
+                            ON nm_rep.account_id = nml.account_id AND nm_rep.nm_id = nml.nm_id
                         WITH NO DATA;
                 """
                 )
@@ -662,7 +1014,7 @@ def create_materialized_views(engine):
                     text(
                         """
                             CREATE UNIQUE INDEX idx_mv_wb_pivot_unique 
-                            ON mv_wb_pivot_by_day_dl ("nm_rep.nm_id", "nm_rep.date_on");
+                            ON mv_wb_pivot_by_day_dl (account_id, "nm_rep.nm_id", "nm_rep.date_on");
                         """
                     )
                 )
@@ -679,7 +1031,7 @@ def create_materialized_views(engine):
                     text(
                     """
                         CREATE INDEX idx_mv_wb_pivot_date 
-                        ON mv_wb_pivot_by_day_dl ("nm_rep.date_on");
+                        ON mv_wb_pivot_by_day_dl (account_id, "nm_rep.date_on");
                     """
                     )
                 )
@@ -694,3 +1046,19 @@ def create_materialized_views(engine):
             app_logger.info(
                 msg='Materialized view mv_wb_pivot_by_day_dl already exists, skipping creation'
             )
+
+
+def _mv_has_account_column(conn) -> bool:
+    return conn.execute(
+        text(
+            """
+                SELECT EXISTS(
+                    SELECT 1
+                    FROM pg_attribute
+                    WHERE attrelid = 'public.mv_wb_pivot_by_day_dl'::regclass
+                    AND attname = 'account_id'
+                    AND NOT attisdropped
+                )
+            """
+        )
+    ).scalar()
@@ -0,0 +1,126 @@
+import codecs
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+class JsonArrayDecoder:
+    """Инкрементальный декодер JSON-массива верхнего уровня.
+
+    Принимает байты кусками через `feed` и возвращает элементы массива, которые уже
+    полностью пришли. Если установлен `ijson`, разбор идёт через его самый быстрый
+    доступный backend (yajl2_c), иначе - через `json.JSONDecoder.raw_decode`.
+    """
+
+    def __init__(
+        self
+    ):
+        if ijson is not None:
+            self._items = ijson.sendable_list()
+            self._coro = ijson.items_coro(self._items, 'item', use_float=True)
+        else:
+            self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+            self._json_decoder = json.JSONDecoder()
+            self._buffer = ''
+            self._started = False
+            self._finished = False
+
+    def feed(
+        self,
+        chunk: bytes
+    ) -> list:
+        if ijson is not None:
+            self._coro.send(chunk)
+            items = list(self._items)
+            del self._items[:]
+            return items
+
+        self._buffer += self._text_decoder.decode(chunk)
+        return self._drain()
+
+    def close(
+        self
+    ) -> list:
+        if ijson is not None:
+            self._coro.close()
+            items = list(self._items)
+            del self._items[:]
+            return items
+
+        self._buffer += self._text_decoder.decode(b'', final=True)
+        items = self._drain()
+
+        if not self._finished:
+            raise ValueError('Unexpected end of JSON array')
+
+        return items
+
+    def _drain(
+        self
+    ) -> list:
+        items = []
+        buffer = self._buffer
+        position = 0
+
+        while not self._finished:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+
+            if position >= len(buffer):
+                break
+
+            if not self._started:
+                if buffer[position] != '[':
+                    raise ValueError('Expected a top-level JSON array')
+
+                self._started = True
+                position += 1
+                continue
+
+            if buffer[position] == ']':
+                self._finished = True
+                position += 1
+                break
+
+            try:
+                item, end = self._json_decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+
+            # число может быть обрезано посередине ("1." из "1.25"), ждём разделитель
+            if isinstance(item, (int, float)) and (end == len(buffer) or buffer[end] not in ' \t\r\n,]'):
+                break
+
+            items.append(item)
+            position = end
+
+        self._buffer = buffer[position:]
+        return items
+
+
+def iter_json_array(
+    chunks: Iterable[bytes]
+) -> Iterator[Any]:
+    decoder = JsonArrayDecoder()
+
+    for chunk in chunks:
+        yield from decoder.feed(chunk=chunk)
+
+    yield from decoder.close()
+
+
+async def aiter_json_array(
+    chunks: AsyncIterable[bytes]
+) -> AsyncIterator[Any]:
+    decoder = JsonArrayDecoder()
+
+    async for chunk in chunks:
+        for item in decoder.feed(chunk=chunk):
+            yield item
+
+    for item in decoder.close():
+        yield item
@@ -1,88 +1,89 @@
-import time
 from datetime import datetime, timedelta
 
 import sqlalchemy.orm
 
 from logs import app_logger
+from wb.accounts import Account, get_account
 from wb.api import WBApi
 
-from wb.db import try_to_find_model
+from wb.db import write_rows
 from wb.db.models import AcceptanceReport
+from wb.report_jobs import REPORT_JOBS, ReportJob, task_status_ready
 
 
 def main(
-    session: sqlalchemy.orm.Session
+    session: sqlalchemy.orm.Session,
+    account: Account | None = None
 ):
     app_logger.info(
         msg='Start work'
     )
 
-    wb = WBApi()
+    if account is None:
+        account = get_account()
+
+    wb = WBApi(
+        token=account.token
+    )
 
     date_from = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
     date_to = (datetime.now()).strftime('%Y-%m-%d')
 
     filtered_acceptance_reports_list = []
 
-    task_id = wb.get_id_acceptance_reports(
-        date_from=date_from,
-        date_to=date_to
-    ).get('taskId')
-
-    for _ in range(5):
-        time.sleep(60)
-
-        status = wb.get_status_acceptance_reports(
-            task_id=task_id
-        )
-        status = status.get('status')
-
-        if status == 'done':
-            try:
-                acceptance_reports = wb.get_acceptance_reports(
+    try:
+        acceptance_reports = REPORT_JOBS.run(
+            job=ReportJob(
+                name='acceptance_reports',
+                create=lambda: wb.get_id_acceptance_reports(
+                    date_from=date_from,
+                    date_to=date_to
+                ).get('taskId'),
+                is_ready=lambda task_id: task_status_ready(
+                    status=wb.get_status_acceptance_reports(task_id=task_id).get('status')
+                ),
+                download=lambda task_id: wb.get_acceptance_reports(
                     task_id=task_id
-                )
-            except Exception as e:
-                app_logger.error(
-                    f'Problem with get_acceptance_reports WB, error: {str(e)}'
-                )
-                continue
-
-            if acceptance_reports:
-                for acceptance_report in acceptance_reports:
-                    acceptance_report_info = {
-                        'income_id': acceptance_report.get('incomeId'),
-                        'nm_id': acceptance_report.get('nmID'),
-                        'shk_create_date_on': acceptance_report.get('shkCreateDate'),
-                        'count': acceptance_report.get('count'),
-                        'gi_create_date_on': acceptance_report.get('giCreateDate'),
-                        'subject_name': acceptance_report.get('subjectName'),
-                        'total': acceptance_report.get('total'),
-                    }
-
-                    if not try_to_find_model(
-                        session=session,
-                        model=AcceptanceReport,
-                        filters={
-                            'income_id': acceptance_report_info.get('income_id'),
-                            'nm_id': acceptance_report_info.get('nm_id'),
-                        },
-                        updates=acceptance_report_info
-                    ):
-                        filtered_acceptance_reports_list.append(AcceptanceReport(**acceptance_report_info))
-            else:
-                app_logger.info(
-                    msg=f'Has no acceptance reports for date period: {date_from} - {date_to}'
-                )
-                break
+                ),
+            )
+        )
+    except Exception as e:
+        app_logger.error(
+            f'Problem with get_acceptance_reports WB, error: {str(e)}'
+        )
+        acceptance_reports = []
+
+    if acceptance_reports:
+        for acceptance_report in acceptance_reports:
+            acceptance_report_info = {
+                'account_id': account.id,
+                'income_id': acceptance_report.get('incomeId'),
+                'nm_id': acceptance_report.get('nmID'),
+                'shk_create_date_on': acceptance_report.get('shkCreateDate'),
+                'count': acceptance_report.get('count'),
+                'gi_create_date_on': acceptance_report.get('giCreateDate'),
+                'subject_name': acceptance_report.get('subjectName'),
+                'total': acceptance_report.get('total'),
+            }
+
+            filtered_acceptance_reports_list.append(acceptance_report_info)
+    else:
+        app_logger.info(
+            msg=f'Has no acceptance reports for date period: {date_from} - {date_to}'
+        )
 
     if filtered_acceptance_reports_list:
         try:
-            session.bulk_save_objects(filtered_acceptance_reports_list)
-            session.commit()
+            result = write_rows(
+                session=session,
+                model=AcceptanceReport,
+                rows=filtered_acceptance_reports_list,
+                key_columns=['account_id', 'income_id', 'nm_id', 'shk_create_date_on']
+            )
 
             app_logger.info(
-                msg=f'Successfully was saved - {len(filtered_acceptance_reports_list)} elements to db'
+                msg=f'Successfully was saved - {result.inserted} elements to db, updated - {result.updated}, '
+                    f'unchanged - {result.unchanged}, rejected - {result.rejected}'
             )
         except Exception as e:
             app_logger.error(
@@ -3,21 +3,32 @@ from datetime import datetime, timedelta
 import sqlalchemy.orm
 
 from logs import app_logger
+from wb.accounts import Account, get_account
 from wb.api import WBApi
 from dateutil import parser
 
-from wb.db import try_to_find_model
+from wb.db import write_rows
 from wb.db.models import AdvertCost
 
 
+# строка - списание по документу: одна кампания получает их много за период
+KEY_COLUMNS = ['account_id', 'advert_id', 'upd_num', 'upd_time_at']
+
+
 def main(
-    session: sqlalchemy.orm.Session
+    session: sqlalchemy.orm.Session,
+    account: Account | None = None
 ):
     app_logger.info(
         msg='Start work'
     )
 
-    wb = WBApi()
+    if account is None:
+        account = get_account()
+
+    wb = WBApi(
+        token=account.token
+    )
 
     filtered_advert_cost_list = []
 
@@ -34,6 +45,7 @@ def main(
 
     for advert_cost in advert_costs:
         advert_cost_dict = {
+            'account_id': account.id,
             'upd_time_at': advert_cost.get('updTime'),
             'camp_name': advert_cost.get('campName'),
             'payment_type': advert_cost.get('paymentType'),
@@ -50,23 +62,20 @@ def main(
                 timestr=upd_time
             )
 
-        if not try_to_find_model(
-            session=session,
-            model=AdvertCost,
-            filters={
-                'advert_id': advert_cost_dict.get('advert_id'),
-            },
-            updates=advert_cost_dict
-        ):
-            filtered_advert_cost_list.append(AdvertCost(**advert_cost_dict))
+        filtered_advert_cost_list.append(advert_cost_dict)
 
     if filtered_advert_cost_list:
         try:
-            session.bulk_save_objects(filtered_advert_cost_list)
-            session.commit()
+            result = write_rows(
+                session=session,
+                model=AdvertCost,
+                rows=filtered_advert_cost_list,
+                key_columns=KEY_COLUMNS
+            )
 
             app_logger.info(
-                msg=f'Successfully was saved - {len(filtered_advert_cost_list)} elements to db'
+                msg=f'Successfully was saved - {result.inserted} elements to db, updated - {result.updated}, '
+                    f'unchanged - {result.unchanged}, rejected - {result.rejected}'
             )
         except Exception as e:
             app_logger.error(
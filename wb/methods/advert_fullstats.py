@@ -4,16 +4,25 @@ import sqlalchemy.orm
 from sqlalchemy import func
 
 from logs import app_logger
-from wb.api import WBApi
+from wb.accounts import Account, get_account
+from wb.async_api import AsyncWBApi, iter_fan_out_retrying
+from wb.retry import CHUNK_RETRY_POLICY
 from dateutil import parser
 
-from wb.db import try_to_find_model
+from wb.db import write_rows
 from wb.db.models import AdvertFullStat, Advert
 from wb.pydantic_models import AdvertFullStatResponse
 
 
+FULLSTATS_URL = 'https://advert-api.wildberries.ru/adv/v3/fullstats'
+
+# статистика дневная: без даты в ключе дни одной карточки схлопываются в одну строку
+KEY_COLUMNS = ['account_id', 'date_at', 'app_type', 'advert_id', 'nm_id']
+
+
 def get_unique_advert_ids(
     session: sqlalchemy.orm.Session,
+    account_id: str
 ):
     three_month_ago = datetime.now() - timedelta(days=90)
 
@@ -29,6 +38,7 @@ def get_unique_advert_ids(
             Advert.change_time_at,
             rn
         ).filter(
+            Advert.account_id == account_id,
             Advert.change_time_at >= three_month_ago
         ).subquery()
     )
@@ -59,17 +69,100 @@ def chunk_list(
         yield lst[index:index + chunk_size]
 
 
+def parse_advert_full_stats(
+    account_id: str,
+    advert_full_stats_data: list[dict]
+) -> list[dict]:
+    filtered_advert_full_stats_list = []
+
+    for advert_full_stat_data in advert_full_stats_data:
+        try:
+            advert_full_stat_response = AdvertFullStatResponse(**advert_full_stat_data)
+        except Exception as e:
+            app_logger.exception(
+                msg=f'Problem with unpack data: {str(e)}'
+            )
+            continue
+
+        for day in advert_full_stat_response.days or []:
+            try:
+                if day.day_date:
+                    advert_date = parser.parse(
+                        timestr=day.day_date
+                    )
+
+                    advert_id = advert_full_stat_response.advert_id
+
+                    booster_stats = advert_full_stat_response.booster_stats or []
+                    day_apps = day.day_apps or []
+
+                    if day_apps:
+                        for app in day_apps:
+                            app_type = app.app_type
+
+                            app_nms = app.app_nms or []
+                            if app_nms:
+                                for nm in app_nms:
+                                    advert_full_stat_dict = {
+                                        'account_id': account_id,
+                                        'date_at': advert_date,
+                                        'advert_id': advert_id,
+                                        'app_type': app_type,
+                                        'name': nm.nm_name,
+                                        'nm_id': nm.nm_id,
+                                        'views': nm.nm_views,
+                                        'clicks': nm.nm_clicks,
+                                        'ctr': nm.nm_ctr,
+                                        'cpc': nm.nm_cpc,
+                                        'sum': nm.nm_sum,
+                                        'atbs': nm.nm_atbs,
+                                        'orders': nm.nm_orders,
+                                        'cr': nm.nm_cr,
+                                        'shks': nm.nm_shks,
+                                        'sum_price': nm.nm_sum_price,
+                                        'canceled': nm.nm_canceled
+                                    }
+
+                                    if booster_stats:
+                                        for booster_stat in booster_stats:
+                                            booster_date = parser.parse(
+                                                timestr=booster_stat.booster_date
+                                            )
+
+                                            if (
+                                                booster_date == advert_date and
+                                                booster_stat.booster_nm == advert_full_stat_dict.get('nm_id')
+                                            ):
+                                                advert_full_stat_dict.update(
+                                                    {
+                                                        'avg_position': booster_stat.booster_avg_position
+                                                    }
+                                                )
+
+                                    filtered_advert_full_stats_list.append(advert_full_stat_dict)
+            except Exception as e:
+                app_logger.exception(
+                    msg=f'Problem with advert {advert_full_stat_data}, error: {str(e)}'
+                )
+                continue
+
+    return filtered_advert_full_stats_list
+
+
 def main(
-    session: sqlalchemy.orm.Session
+    session: sqlalchemy.orm.Session,
+    account: Account | None = None
 ):
     app_logger.info(
         msg='Start work'
     )
 
-    wb = WBApi()
+    if account is None:
+        account = get_account()
 
     advert_ids = get_unique_advert_ids(
-        session=session
+        session=session,
+        account_id=account.id
     )
 
     if advert_ids is None:
@@ -78,123 +171,79 @@ def main(
         )
         return
 
-    filtered_advert_full_stats_list = []
-
     interval_end = (datetime.now()).strftime('%Y-%m-%d')
     interval_begin = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
 
-    for advert_ids_chunk in chunk_list(
-        lst=advert_ids,
-        chunk_size=50
+    advert_ids_chunks = list(
+        chunk_list(
+            lst=advert_ids,
+            chunk_size=50
+        )
+    )
+
+    async def fetch_chunk(
+        wb: AsyncWBApi,
+        advert_ids_chunk: list[int]
     ):
-        try:
-            advert_full_stats_data = wb.advert_full_stats(
-                advert_ids=advert_ids_chunk,
-                interval_begin=interval_begin,
-                interval_end=interval_end
-            )
-        except Exception as e:
+        return await wb.advert_full_stats(
+            advert_ids=advert_ids_chunk,
+            interval_begin=interval_begin,
+            interval_end=interval_end,
+            retry_policy=CHUNK_RETRY_POLICY
+        )
+
+    saved_count = 0
+    failed_chunks = []
+
+    # чанки приходят по мере готовности, разбор и запись идут, пока остальные ещё в полёте
+    for advert_ids_chunk, advert_full_stats_data, error in iter_fan_out_retrying(
+        jobs=advert_ids_chunks,
+        call=fetch_chunk,
+        concurrency=AsyncWBApi.fan_out_concurrency(url=FULLSTATS_URL),
+        token=account.token
+    ):
+        if error is not None:
             app_logger.error(
-                msg=f'Problem with get data from WB, error: {str(e)}'
+                msg=f'Problem with get data from WB for adverts {advert_ids_chunk}, error: {str(error)}'
             )
-            advert_full_stats_data = []
-
-        for advert_full_stat_data in advert_full_stats_data:
-            try:
-                advert_full_stat_response = AdvertFullStatResponse(**advert_full_stat_data)
-            except Exception as e:
-                app_logger.exception(
-                    msg=f'Problem with unpack data: {str(e)}'
-                )
-                continue
+            failed_chunks.append(advert_ids_chunk)
+            continue
 
-            for day in advert_full_stat_response.days or []:
-                try:
-                    if day.day_date:
-                        advert_date = parser.parse(
-                            timestr=day.day_date
-                        )
-
-                        advert_id = advert_full_stat_response.advert_id
-
-                        booster_stats = advert_full_stat_response.booster_stats or []
-                        day_apps = day.day_apps or []
-
-                        if day_apps:
-                            for app in day_apps:
-                                app_type = app.app_type
-
-                                app_nms = app.app_nms or []
-                                if app_nms:
-                                    for nm in app_nms:
-                                        advert_full_stat_dict = {
-                                            'date_at': advert_date,
-                                            'advert_id': advert_id,
-                                            'app_type': app_type,
-                                            'name': nm.nm_name,
-                                            'nm_id': nm.nm_id,
-                                            'views': nm.nm_views,
-                                            'clicks': nm.nm_clicks,
-                                            'ctr': nm.nm_ctr,
-                                            'cpc': nm.nm_cpc,
-                                            'sum': nm.nm_sum,
-                                            'atbs': nm.nm_atbs,
-                                            'orders': nm.nm_orders,
-                                            'cr': nm.nm_cr,
-                                            'shks': nm.nm_shks,
-                                            'sum_price': nm.nm_sum_price,
-                                            'canceled': nm.nm_canceled
-                                        }
-
-                                        if booster_stats:
-                                            for booster_stat in booster_stats:
-                                                booster_date = parser.parse(
-                                                    timestr=booster_stat.booster_date
-                                                )
+        filtered_advert_full_stats_list = parse_advert_full_stats(
+            account_id=account.id,
+            advert_full_stats_data=advert_full_stats_data
+        )
 
-                                                if (
-                                                    booster_date == advert_date and
-                                                    booster_stat.booster_nm == advert_full_stat_dict.get('nm_id')
-                                                ):
-                                                    advert_full_stat_dict.update(
-                                                        {
-                                                            'avg_position': booster_stat.booster_avg_position
-                                                        }
-                                                    )
-
-                                        if not try_to_find_model(
-                                            session=session,
-                                            model=AdvertFullStat,
-                                            filters={
-                                                'app_type': advert_full_stat_dict.get('app_type'),
-                                                'advert_id': advert_full_stat_dict.get('advert_id'),
-                                                'nm_id': advert_full_stat_dict.get('nm_id'),
-                                            },
-                                            updates=advert_full_stat_dict
-                                        ):
-                                            filtered_advert_full_stats_list.append(
-                                                AdvertFullStat(**advert_full_stat_dict)
-                                            )
-                except Exception as e:
-                    app_logger.exception(
-                        msg=f'Problem with advert {advert_full_stat_data}, error: {str(e)}'
-                    )
-                    continue
+        if not filtered_advert_full_stats_list:
+            continue
 
-    if filtered_advert_full_stats_list:
         try:
-            session.bulk_save_objects(filtered_advert_full_stats_list)
-            session.commit()
+            result = write_rows(
+                session=session,
+                model=AdvertFullStat,
+                rows=filtered_advert_full_stats_list,
+                key_columns=KEY_COLUMNS
+            )
+
+            saved_count += result.committed
 
             app_logger.info(
-                msg=f'Successfully was saved - {len(filtered_advert_full_stats_list)} elements to db'
+                msg=f'Successfully was saved - {result.inserted} elements to db, updated - {result.updated}, '
+                    f'unchanged - {result.unchanged}, rejected - {result.rejected}'
             )
         except Exception as e:
             app_logger.error(
                 msg=f'Problem with bulk save objects - {len(filtered_advert_full_stats_list)} elements, error: {str(e)}'
             )
             session.rollback()
-    else:
+
+    if failed_chunks:
+        app_logger.error(
+            msg=f'Failed {len(failed_chunks)} of {len(advert_ids_chunks)} chunks, '
+                f'adverts: {[advert_id for chunk in failed_chunks for advert_id in chunk]}'
+        )
+
+    if not saved_count:
         app_logger.info(
             msg=f'No new records'
         )
@@ -1,21 +1,28 @@
 import sqlalchemy.orm
 
 from logs import app_logger
+from wb.accounts import Account, get_account
 from wb.api import WBApi
 from dateutil import parser
 
-from wb.db import try_to_find_model
+from wb.db import write_rows
 from wb.db.models import Advert
 
 
 def main(
-    session: sqlalchemy.orm.Session
+    session: sqlalchemy.orm.Session,
+    account: Account | None = None
 ):
     app_logger.info(
         msg='Start work'
     )
 
-    wb = WBApi()
+    if account is None:
+        account = get_account()
+
+    wb = WBApi(
+        token=account.token
+    )
 
     filtered_adverts_list = []
 
@@ -36,6 +43,7 @@ def main(
 
         for advert_el in advert.get('advert_list', []):
             advert_info = {
+                'account_id': account.id,
                 'advert_id': advert_el.get('advertId'),
                 'change_time_at': advert_el.get('changeTime')
             }
@@ -48,23 +56,20 @@ def main(
                     timestr=change_time
                 )
 
-            if not try_to_find_model(
-                session=session,
-                model=Advert,
-                filters={
-                    'advert_id': advert_info.get('advert_id'),
-                },
-                updates=advert_info
-            ):
-                filtered_adverts_list.append(Advert(**advert_info))
+            filtered_adverts_list.append(advert_info)
 
     if filtered_adverts_list:
         try:
-            session.bulk_save_objects(filtered_adverts_list)
-            session.commit()
+            result = write_rows(
+                session=session,
+                model=Advert,
+                rows=filtered_adverts_list,
+                key_columns=['account_id', 'advert_id']
+            )
 
             app_logger.info(
-                msg=f'Successfully was saved - {len(filtered_adverts_list)} elements to db'
+                msg=f'Successfully was saved - {result.inserted} elements to db, updated - {result.updated}, '
+                    f'unchanged - {result.unchanged}, rejected - {result.rejected}'
             )
         except Exception as e:
             app_logger.error(
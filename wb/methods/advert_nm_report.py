@@ -1,30 +1,44 @@
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
+from time import perf_counter
 
 import sqlalchemy.orm
 from sqlalchemy import text
 
 from logs import app_logger
-from wb.api import WBApi
+from wb.accounts import Account, get_account
+from wb.async_api import AsyncWBApi, iter_fan_out_retrying
+from wb.retry import CHUNK_RETRY_POLICY
 from dateutil import parser
 
-from wb.db import try_to_find_model
+from wb.db import KeyIndex, write_rows
 from wb.db.models import AdvertNMReport
 
 
+NM_REPORT_URL = 'https://seller-analytics-api.wildberries.ru/api/v2/nm-report/detail/history'
+
+PARSE_WORKERS = 4
+WRITE_BATCH_SIZE = 5000
+
+
 def get_all_nmids_union(
-    session: sqlalchemy.orm.Session
+    session: sqlalchemy.orm.Session,
+    account_id: str
 ) -> list[int]:
     statement = text(
         """
             SELECT DISTINCT nm_id FROM (
-                SELECT nm_id FROM supplier_stocks
+                SELECT nm_id FROM supplier_stocks WHERE account_id = :account_id
                 UNION
-                SELECT nm_id FROM nmids_list
+                SELECT nm_id FROM nmids_list WHERE account_id = :account_id
             ) AS unioned_nmids
         """
     )
 
-    result = session.execute(statement).scalars().all()
+    result = session.execute(
+        statement,
+        {'account_id': account_id}
+    ).scalars().all()
     return result
 
 
@@ -36,17 +50,89 @@ def chunk_list(
         yield lst[index:index + chunk_size]
 
 
+def parse_advert_nm_report(
+    account_id: str,
+    advert_nm_report_data: list[dict]
+) -> list[dict]:
+    advert_nm_report_list = []
+
+    for advert_nm_report_element in advert_nm_report_data:
+        history_element = advert_nm_report_element.get('history')
+
+        if history_element:
+            for date_history_element in history_element:
+                advert_nm_report_info = {
+                    'account_id': account_id,
+                    'nm_id': advert_nm_report_element.get('nmID'),
+                    'imt_name': advert_nm_report_element.get('imtName'),
+                    'vendor_code': advert_nm_report_element.get('vendorCode'),
+
+                    'dt_on': date_history_element.get('dt'),
+                    'open_card_count': date_history_element.get('openCardCount'),
+                    'add_to_cart_count': date_history_element.get('addToCartCount'),
+                    'add_to_cart_conversion': date_history_element.get('addToCartConversion'),
+                    'orders_count': date_history_element.get('ordersCount'),
+                    'orders_sum_rub': date_history_element.get('ordersSumRub'),
+                    'cart_to_order_conversion': date_history_element.get('cartToOrderConversion'),
+                    'buyouts_count': date_history_element.get('buyoutsCount'),
+                    'buyouts_sum_bub': date_history_element.get('buyoutsSumRub'),
+                    'buyout_percent': date_history_element.get('buyoutPercent')
+                }
+
+                dt = advert_nm_report_info.get('dt_on')
+                if dt:
+                    advert_nm_report_info['dt_on'] = parser.parse(
+                        timestr=dt
+                    )
+
+                advert_nm_report_list.append(advert_nm_report_info)
+
+    return advert_nm_report_list
+
+
+def write_advert_nm_report(
+    session: sqlalchemy.orm.Session,
+    advert_nm_report_list: list[dict],
+    key_index: KeyIndex | None = None
+) -> int:
+    if not advert_nm_report_list:
+        return 0
+
+    try:
+        result = write_rows(
+            session=session,
+            model=AdvertNMReport,
+            rows=advert_nm_report_list,
+            key_columns=['account_id', 'nm_id', 'dt_on'],
+            key_index=key_index
+        )
+    except Exception as e:
+        app_logger.error(
+            msg=f'Problem with bulk save objects - {len(advert_nm_report_list)} elements, error: {str(e)}'
+        )
+        session.rollback()
+        return 0
+
+    return result.inserted + result.updated
+
+
 def main(
-    session: sqlalchemy.orm.Session
+    session: sqlalchemy.orm.Session,
+    account: Account | None = None
 ):
+    """Конвейер: чанки nm_id запрашиваются параллельно, разбираются в пуле потоков,
+    а пишет в БД только текущий поток - пачками по `WRITE_BATCH_SIZE` строк через чанки.
+    """
     app_logger.info(
         msg='Start work'
     )
 
-    wb = WBApi()
+    if account is None:
+        account = get_account()
 
     nmids_list = get_all_nmids_union(
-        session=session
+        session=session,
+        account_id=account.id
     )
 
     if nmids_list is None:
@@ -58,73 +144,118 @@ def main(
     date_to = (datetime.now()).strftime('%Y-%m-%d')
     date_from = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
 
-    saved_count = 0
+    key_index = KeyIndex.load(
+        session=session,
+        model=AdvertNMReport,
+        key_columns=['account_id', 'nm_id', 'dt_on'],
+        where=[
+            AdvertNMReport.account_id == account.id,
+            AdvertNMReport.dt_on.between(
+                datetime.strptime(date_from, '%Y-%m-%d').date(),
+                datetime.strptime(date_to, '%Y-%m-%d').date()
+            )
+        ]
+    )
+
+    nmids_chunks = list(
+        chunk_list(
+            lst=nmids_list,
+            chunk_size=20
+        )
+    )
 
-    for nmids_chunk in chunk_list(
-        lst=nmids_list,
-        chunk_size=20
+    async def fetch_chunk(
+        wb: AsyncWBApi,
+        nmids_chunk: list[int]
     ):
-        filtered_advert_nm_report_list = []
+        return await wb.advert_nm_report(
+            nmids=nmids_chunk,
+            date_from=date_from,
+            date_to=date_to,
+            retry_policy=CHUNK_RETRY_POLICY
+        )
+
+    started_at = perf_counter()
+
+    saved_count = 0
+    processed_skus = 0
+    failed_chunks = []
+
+    batch = []
+    parsing: set[Future] = set()
+
+    def collect(
+        futures: set[Future]
+    ) -> None:
+        nonlocal saved_count, batch
 
-        try:
-            advert_nm_report_data = wb.advert_nm_report(
-                nmids=nmids_chunk,
-                date_from=date_from,
-                date_to=date_to
+        for future in futures:
+            try:
+                batch.extend(future.result())
+            except Exception as e:
+                app_logger.exception(
+                    msg=f'Problem with parse nm report chunk, error: {str(e)}'
+                )
+
+        parsing.difference_update(futures)
+
+        if len(batch) >= WRITE_BATCH_SIZE:
+            saved_count += write_advert_nm_report(
+                session=session,
+                advert_nm_report_list=batch,
+                key_index=key_index
             )
-        except Exception as e:
-            app_logger.error(
-                msg=f'Problem with get data from WB, error: {str(e)}'
+            batch = []
+
+    with ThreadPoolExecutor(max_workers=PARSE_WORKERS) as parse_pool:
+        for nmids_chunk, advert_nm_report_data, error in iter_fan_out_retrying(
+            jobs=nmids_chunks,
+            call=fetch_chunk,
+            concurrency=AsyncWBApi.fan_out_concurrency(url=NM_REPORT_URL),
+            token=account.token
+        ):
+            if error is not None:
+                app_logger.error(
+                    msg=f'Problem with get data from WB for nm ids {nmids_chunk}, error: {str(error)}'
+                )
+                failed_chunks.append(nmids_chunk)
+                continue
+
+            processed_skus += len(nmids_chunk)
+            parsing.add(
+                parse_pool.submit(
+                    parse_advert_nm_report,
+                    account.id,
+                    advert_nm_report_data
+                )
             )
-            advert_nm_report_data = []
-
-        for advert_nm_report_element in advert_nm_report_data:
-            history_element = advert_nm_report_element.get('history')
-
-            if history_element:
-                for date_history_element in history_element:
-                    advert_nm_report_info = {
-                        'nm_id': advert_nm_report_element.get('nmID'),
-                        'imt_name': advert_nm_report_element.get('imtName'),
-                        'vendor_code': advert_nm_report_element.get('vendorCode'),
-
-                        'dt_on': date_history_element.get('dt'),
-                        'open_card_count': date_history_element.get('openCardCount'),
-                        'add_to_cart_count': date_history_element.get('addToCartCount'),
-                        'add_to_cart_conversion': date_history_element.get('addToCartConversion'),
-                        'orders_count': date_history_element.get('ordersCount'),
-                        'orders_sum_rub': date_history_element.get('ordersSumRub'),
-                        'cart_to_order_conversion': date_history_element.get('cartToOrderConversion'),
-                        'buyouts_count': date_history_element.get('buyoutsCount'),
-                        'buyouts_sum_bub': date_history_element.get('buyoutsSumRub'),
-                        'buyout_percent': date_history_element.get('buyoutPercent')
-                    }
-
-                    dt = advert_nm_report_info.get('dt_on')
-                    if dt:
-                        advert_nm_report_info['dt_on'] = parser.parse(
-                            timestr=dt
-                        )
-
-                    if not try_to_find_model(
-                        session=session,
-                        model=AdvertNMReport,
-                        filters={
-                            'nm_id': advert_nm_report_info.get('nm_id'),
-                            'dt_on': advert_nm_report_info.get('dt_on'),
-                        },
-                        updates=advert_nm_report_info
-                    ):
-                        filtered_advert_nm_report_list.append(AdvertNMReport(**advert_nm_report_info))
-
-        if filtered_advert_nm_report_list:
-            try:
-                session.bulk_save_objects(filtered_advert_nm_report_list)
-                session.commit()
 
-                saved_count += len(filtered_advert_nm_report_list)
-            except Exception:
-                session.rollback()
+            collect(
+                futures={future for future in parsing if future.done()}
+            )
+
+        parse_pool.shutdown(wait=True)
+        collect(
+            futures=set(parsing)
+        )
+
+    if batch:
+        saved_count += write_advert_nm_report(
+            session=session,
+            advert_nm_report_list=batch,
+            key_index=key_index
+        )
+
+    elapsed = perf_counter() - started_at
+    app_logger.info(
+        msg=f'Processed {processed_skus} SKUs in {elapsed:.1f}s - {processed_skus / elapsed if elapsed else 0:.1f} SKUs/s'
+    )
+
+    if failed_chunks:
+        app_logger.error(
+            msg=f'Failed {len(failed_chunks)} of {len(nmids_chunks)} chunks, '
+                f'nm ids: {[nm_id for chunk in failed_chunks for nm_id in chunk]}'
+        )
 
     if saved_count > 0:
         app_logger.info(
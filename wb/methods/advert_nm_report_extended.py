@@ -1,21 +1,103 @@
 import csv
 import datetime
-import os
+import io
+import itertools
 import tempfile
-import time
 import uuid
 import zipfile
+from typing import Callable, Iterator
 
 import sqlalchemy.orm
 from dateutil.relativedelta import relativedelta
 from sqlalchemy import func
 
 from logs import app_logger
+from wb.accounts import Account, get_account
 from wb.api import WBApi
 from dateutil import parser
 
-from wb.db import try_to_find_model
+from wb.db import KeyIndex, write_rows
 from wb.db.models import AdvertNMReportExtended
+from wb.report_jobs import REPORT_JOBS, ReportJob, task_status_ready
+
+
+WRITE_BATCH_SIZE = 5000
+
+# архив держится в памяти и уходит на диск, только если вырос больше этого размера
+SPOOL_MAX_SIZE = 64 * 1024 * 1024
+
+
+def _to_int(
+    value: str
+) -> int:
+    try:
+        return int(value or 0)
+    except ValueError:
+        return int(float(value))
+
+
+def _to_float(
+    value: str
+) -> float:
+    return float(value or 0)
+
+
+def _to_date(
+    value: str
+) -> datetime.date | None:
+    if not value:
+        return None
+
+    try:
+        return datetime.date.fromisoformat(value[:10])
+    except ValueError:
+        return parser.parse(timestr=value).date()
+
+
+# колонка CSV -> (поле модели, конвертер)
+REPORT_SCHEMA: dict[str, tuple[str, Callable]] = {
+    'nmID': ('nm_id', _to_int),
+    'dt': ('dt_on', _to_date),
+    'openCardCount': ('open_card_count', _to_int),
+    'addToCartCount': ('add_to_cart_count', _to_int),
+    'ordersCount': ('orders_count', _to_int),
+    'ordersSumRub': ('orders_sum_rub', _to_int),
+    'buyoutsCount': ('buyouts_count', _to_int),
+    'buyoutsSumRub': ('buyouts_sum_rub', _to_int),
+    'cancelCount': ('cancel_count', _to_int),
+    'cancelSumRub': ('cancel_sum_rub', _to_int),
+    'addToCartConversion': ('add_to_cart_conversion', _to_float),
+    'cartToOrderConversion': ('cart_to_order_conversion', _to_float),
+    'buyoutPercent': ('buyout_percent', _to_int),
+}
+
+
+def parse_advert_nm_extended_report(
+    csv_file: io.TextIOBase
+) -> Iterator[dict]:
+    """Построчно переводит CSV отчёта в записи модели по `REPORT_SCHEMA` за один проход."""
+    csv_reader = csv.reader(csv_file)
+    header = next(csv_reader, None)
+
+    if not header:
+        return
+
+    positions = {column: index for index, column in enumerate(header)}
+    plan = [
+        (field, convert, positions.get(column))
+        for column, (field, convert) in REPORT_SCHEMA.items()
+    ]
+
+    for row in csv_reader:
+        try:
+            yield {
+                field: convert(row[index] if index is not None else '')
+                for field, convert, index in plan
+            }
+        except Exception as e:
+            app_logger.error(
+                f'Error with processing record: {row} - {str(e)}'
+            )
 
 
 def get_advert_nm_extended_report(
@@ -23,48 +105,41 @@ def get_advert_nm_extended_report(
     date_start: datetime,
     date_end: datetime,
     nm_ids: list[int] = None
-) -> list[dict]:
+) -> Iterator[dict]:
+    """Заказывает расширенный отчёт и отдаёт его строки по мере чтения CSV прямо из архива."""
     report_uuid = str(uuid.uuid4())
 
-    report_created = wb.create_extended_advert_nm_report(
-        report_uuid=report_uuid,
-        start_date=date_start,
-        end_date=date_end,
-        nm_ids=nm_ids if nm_ids else []
-    )
-
-    if not report_created:
-        app_logger.error(
-            msg=f'Failed to create report with UUID: {report_uuid}'
-        )
-        return []
-
-    with tempfile.TemporaryDirectory() as temp_dir:
-        zip_path = os.path.join(
-            temp_dir, f'{report_uuid}.zip'
-        )
-
-        for _ in range(5):
-            time.sleep(30)
-
-            downloaded_path = wb.download_extended_advert_nm_report(
-                report_uuid=report_uuid,
-                save_path=zip_path
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as archive:
+        downloaded = REPORT_JOBS.run(
+            job=ReportJob(
+                name='advert_nm_report_extended',
+                create=lambda: report_uuid if wb.create_extended_advert_nm_report(
+                    report_uuid=report_uuid,
+                    start_date=date_start,
+                    end_date=date_end,
+                    nm_ids=nm_ids if nm_ids else []
+                ) else None,
+                is_ready=lambda task_id: task_status_ready(
+                    status=wb.extended_advert_nm_report_status(report_uuid=task_id).get('status')
+                ),
+                download=lambda task_id: wb.download_extended_advert_nm_report(
+                    report_uuid=task_id,
+                    save_path=archive
+                ),
+                first_poll=10.0,
             )
+        )
 
-            if not downloaded_path:
-                continue
-            break
-
-        if not downloaded_path:
+        if not downloaded:
             app_logger.error(
                 msg=f'Failed to download report with UUID: {report_uuid}'
             )
-            return []
+            return
+
+        archive.seek(0)
 
-        report_data = []
         with zipfile.ZipFile(
-            file=zip_path,
+            file=archive,
             mode='r'
         ) as zip_ref:
             csv_files = [
@@ -75,61 +150,50 @@ def get_advert_nm_extended_report(
                 app_logger.error(
                     msg=f'No CSV files found in the archive for report UUID: {report_uuid}'
                 )
-                return []
+                return
 
-            csv_path = os.path.join(
-                temp_dir, csv_files[0]
-            )
+            with zip_ref.open(csv_files[0]) as csv_member:
+                yield from parse_advert_nm_extended_report(
+                    csv_file=io.TextIOWrapper(csv_member, encoding='utf-8', newline='')
+                )
 
-            zip_ref.extract(
-                member=csv_files[0],
-                path=temp_dir
-            )
 
-            with open(
-                file=csv_path,
-                mode='r',
-                encoding='utf-8'
-            ) as csv_file:
-                csv_reader = csv.DictReader(
-                    f=csv_file
-                )
+def write_advert_nm_extended_report(
+    session: sqlalchemy.orm.Session,
+    account_id: str,
+    report_records: list[dict],
+    key_index: KeyIndex | None = None
+) -> int:
+    for db_record in report_records:
+        db_record['account_id'] = account_id
 
-                for row in csv_reader:
-                    numeric_fields = [
-                        'openCardCount',
-                        'addToCartCount',
-                        'ordersCount',
-                        'ordersSumRub',
-                        'buyoutsCount',
-                        'buyoutsSumRub',
-                        'cancelCount',
-                        'cancelSumRub',
-                        'addToCartConversion',
-                        'cartToOrderConversion',
-                        'buyoutPercent',
-                    ]
-
-                    for field in numeric_fields:
-                        if field in row and row[field]:
-                            try:
-                                if '.' in row[field]:
-                                    row[field] = float(row[field])
-                                else:
-                                    row[field] = int(row[field])
-                            except ValueError:
-                                pass
-
-                    report_data.append(row)
-
-        return report_data
+    try:
+        result = write_rows(
+            session=session,
+            model=AdvertNMReportExtended,
+            rows=report_records,
+            key_columns=['account_id', 'nm_id', 'dt_on'],
+            key_index=key_index
+        )
+    except Exception as e:
+        app_logger.error(
+            msg=f'Problem with bulk save objects - {len(report_records)} elements,'
+                f' error: {str(e)}'
+        )
+        session.rollback()
+        return 0
+
+    return result.inserted + result.updated
 
 
 def compute_date_range(
-    session: sqlalchemy.orm.Session
+    session: sqlalchemy.orm.Session,
+    account_id: str
 ):
     max_dt_on = session.query(
         func.max(AdvertNMReportExtended.dt_on)
+    ).filter(
+        AdvertNMReportExtended.account_id == account_id
     ).scalar()
 
     if not max_dt_on:
@@ -145,91 +209,72 @@ def compute_date_range(
 
 
 def main(
-    session: sqlalchemy.orm.Session
+    session: sqlalchemy.orm.Session,
+    account: Account | None = None
 ):
     app_logger.info(
         msg='Start work'
     )
 
-    wb = WBApi()
+    if account is None:
+        account = get_account()
+
+    wb = WBApi(
+        token=account.token
+    )
 
     date_from, date_to = compute_date_range(
         session=session,
+        account_id=account.id
     )
 
-    filtered_extended_advert_nm_report_list = []
+    key_index = KeyIndex.load(
+        session=session,
+        model=AdvertNMReportExtended,
+        key_columns=['account_id', 'nm_id', 'dt_on'],
+        where=[
+            AdvertNMReportExtended.account_id == account.id,
+            AdvertNMReportExtended.dt_on.between(
+                datetime.date.fromisoformat(date_from),
+                datetime.date.fromisoformat(date_to)
+            )
+        ]
+    )
+
+    received_count = 0
+    saved_count = 0
 
     try:
-        report_data = get_advert_nm_extended_report(
+        report_records = get_advert_nm_extended_report(
             wb=wb,
             date_start=date_from,
             date_end=date_to,
         )
+
+        while batch := list(itertools.islice(report_records, WRITE_BATCH_SIZE)):
+            received_count += len(batch)
+            saved_count += write_advert_nm_extended_report(
+                session=session,
+                account_id=account.id,
+                report_records=batch,
+                key_index=key_index
+            )
     except Exception as e:
         app_logger.error(
             f'Error while processing report data - {str(e)}'
         )
         return
 
-    if not report_data:
+    if not received_count:
         app_logger.warning(
             f'No data received'
         )
         return
-    for report_item in report_data:
-        try:
-            db_record = {
-                'nm_id': int(report_item.get('nmID', 0)),
-                'dt_on': report_item.get('dt'),
-                'open_card_count': int(report_item.get('openCardCount', 0)),
-                'add_to_cart_count': int(report_item.get('addToCartCount', 0)),
-                'orders_count': int(report_item.get('ordersCount', 0)),
-                'orders_sum_rub': int(report_item.get('ordersSumRub', 0)),
-                'buyouts_count': int(report_item.get('buyoutsCount', 0)),
-                'buyouts_sum_rub': int(report_item.get('buyoutsSumRub', 0)),
-                'cancel_count': int(report_item.get('cancelCount', 0)),
-                'cancel_sum_rub': int(report_item.get('cancelSumRub', 0)),
-                'add_to_cart_conversion': float(report_item.get('addToCartConversion', 0.0)),
-                'cart_to_order_conversion': float(report_item.get('cartToOrderConversion', 0.0)),
-                'buyout_percent': int(report_item.get('buyoutPercent', 0)),
-            }
-
-            dt_on = db_record.get('dt_on')
-            if dt_on:
-                db_record['dt_on'] = parser.parse(
-                    timestr=dt_on
-                )
-
-            if not try_to_find_model(
-                session=session,
-                model=AdvertNMReportExtended,
-                filters={
-                    'nm_id': db_record.get('nm_id'),
-                    'dt_on': db_record.get('dt_on'),
-                },
-                updates=db_record
-            ):
-                filtered_extended_advert_nm_report_list.append(AdvertNMReportExtended(**db_record))
-        except Exception as e:
-            app_logger.error(
-                f'Error with processing record: {report_item} - {str(e)}'
-            )
-            continue
 
-    if filtered_extended_advert_nm_report_list:
-        try:
-            session.bulk_save_objects(filtered_extended_advert_nm_report_list)
-            session.commit()
-
-            app_logger.info(
-                msg=f'Successfully was saved - {len(filtered_extended_advert_nm_report_list)} elements to db'
-            )
-        except Exception as e:
-            app_logger.error(
-                msg=f'Problem with bulk save objects - {len(filtered_extended_advert_nm_report_list)} elements,'
-                    f' error: {str(e)}'
-            )
-            session.rollback()
+    if saved_count:
+        app_logger.info(
+            msg=f'Successfully was saved - {saved_count} elements to db'
+        )
     else:
         app_logger.info(
             msg=f'No new records'
@@ -1,20 +1,27 @@
 import sqlalchemy.orm
 
 from logs import app_logger
+from wb.accounts import Account, get_account
 from wb.api import WBApi
 
-from wb.db import try_to_find_model
+from wb.db import write_rows
 from wb.db.models import FbsWarehouse
 
 
 def main(
-    session: sqlalchemy.orm.Session
+    session: sqlalchemy.orm.Session,
+    account: Account | None = None
 ):
     app_logger.info(
         msg='Start work'
     )
 
-    wb = WBApi()
+    if account is None:
+        account = get_account()
+
+    wb = WBApi(
+        token=account.token
+    )
 
     filtered_fbs_warehouse_list = []
 
@@ -28,6 +35,7 @@ def main(
 
     for fbs_warehouse_element in fbs_warehouse_data:
         fbs_warehouse_info = {
+            'account_id': account.id,
             'name': fbs_warehouse_element.get('name'),
             'office_id': fbs_warehouse_element.get('officeId'),
             'warehouse_id': fbs_warehouse_element.get('id'),
@@ -35,26 +43,20 @@ def main(
             'delivery_type': fbs_warehouse_element.get('deliveryType'),
         }
 
-        if not try_to_find_model(
-            session=session,
-            model=FbsWarehouse,
-            filters={
-                'warehouse_id': fbs_warehouse_info.get('warehouse_id'),
-                'delivery_type': fbs_warehouse_info.get('delivery_type'),
-                'cargo_type': fbs_warehouse_info.get('cargo_type'),
-                'office_id': fbs_warehouse_info.get('office_id'),
-            },
-            updates=fbs_warehouse_info
-        ):
-            filtered_fbs_warehouse_list.append(FbsWarehouse(**fbs_warehouse_info))
+        filtered_fbs_warehouse_list.append(fbs_warehouse_info)
 
     if filtered_fbs_warehouse_list:
         try:
-            session.bulk_save_objects(filtered_fbs_warehouse_list)
-            session.commit()
+            result = write_rows(
+                session=session,
+                model=FbsWarehouse,
+                rows=filtered_fbs_warehouse_list,
+                key_columns=['account_id', 'warehouse_id', 'delivery_type', 'cargo_type', 'office_id']
+            )
 
             app_logger.info(
-                msg=f'Successfully was saved - {len(filtered_fbs_warehouse_list)} elements to db'
+                msg=f'Successfully was saved - {result.inserted} elements to db, updated - {result.updated}, '
+                    f'unchanged - {result.unchanged}, rejected - {result.rejected}'
             )
         except Exception as e:
             app_logger.error(
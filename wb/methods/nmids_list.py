@@ -1,98 +1,150 @@
 import sqlalchemy.orm
 
 from logs import app_logger
+from wb.accounts import Account, get_account
 from wb.api import WBApi
 from dateutil import parser
 
-from wb.db import try_to_find_model
+from wb.db import get_checkpoint, save_checkpoint, write_rows
 from wb.db.models import NmIDCard
+from wb.pagination import prefetch
+
+
+CHECKPOINT_ENDPOINT = 'content/v2/get/cards/list'
 
 
 def main(
-    session: sqlalchemy.orm.Session
+    session: sqlalchemy.orm.Session,
+    account: Account | None = None
 ):
     app_logger.info(
         msg='Start work'
     )
 
-    wb = WBApi()
+    if account is None:
+        account = get_account()
+
+    wb = WBApi(
+        token=account.token
+    )
+
+    checkpoint = get_checkpoint(
+        session=session,
+        endpoint=CHECKPOINT_ENDPOINT,
+        account=account.id
+    )
+    if checkpoint:
+        app_logger.info(
+            msg=f'Resume from checkpoint cursor={checkpoint}'
+        )
 
-    filtered_nmid_cards_list = []
+    saved_count = 0
+    # после страницы с отброшенными строками курсор больше не двигается:
+    # следующий запуск перечитает её и всё, что после неё
+    checkpoint_frozen = False
+    completed = False
 
     try:
-        nmid_cards_data = wb.cards_list()
+        for page in prefetch(pages=wb.iter_cards(cursor=checkpoint)):
+            filtered_nmid_cards_list = []
+
+            for nmid_card_data in page.items:
+                sizes = nmid_card_data.get('sizes')
+
+                if sizes:
+                    for nmid_card_size in sizes:
+                        nmid_card = {
+                            'account_id': account.id,
+                            'nm_id': nmid_card_data.get('nmID'),
+                            'imt_id': nmid_card_data.get('imtID'),
+                            'nm_uuid': nmid_card_data.get('nmUUID'),
+                            'subject_id': nmid_card_data.get('subjectID'),
+                            'subject_name': nmid_card_data.get('subjectName'),
+                            'vendor_code': nmid_card_data.get('vendorCode'),
+                            'brand': nmid_card_data.get('brand'),
+                            'title': nmid_card_data.get('title'),
+                            'chrt_id': nmid_card_size.get('chrtID'),
+                            'tech_size': nmid_card_size.get('techSize'),
+                            'wb_size': nmid_card_size.get('wbSize'),
+                            'length': nmid_card_data.get('dimensions').get('length'),
+                            'width': nmid_card_data.get('dimensions').get('width'),
+                            'height': nmid_card_data.get('dimensions').get('height'),
+                            'created_at': nmid_card_data.get('createdAt'),
+                            'updated_at': nmid_card_data.get('updatedAt'),
+                        }
+
+                        if len(nmid_card_size['skus']) > 0:
+                            nmid_card['barcode'] = nmid_card_size.get('skus')[0]
+                        else:
+                            nmid_card['barcode'] = None
+
+                        createdAt = nmid_card.get('created_at')
+                        if createdAt:
+                            nmid_card['created_at'] = parser.parse(
+                                timestr=createdAt
+                            )
+
+                        updatedAt = nmid_card.get('updated_at')
+                        if updatedAt:
+                            nmid_card['updated_at'] = parser.parse(
+                                timestr=updatedAt
+                            )
+
+                        filtered_nmid_cards_list.append(nmid_card)
+
+            try:
+                result = write_rows(
+                    session=session,
+                    model=NmIDCard,
+                    rows=filtered_nmid_cards_list,
+                    key_columns=['account_id', 'nm_id', 'chrt_id'],
+                    # курсор пишется в транзакции последней пачки страницы
+                    on_flush=None if checkpoint_frozen else lambda: save_checkpoint(
+                        session=session,
+                        endpoint=CHECKPOINT_ENDPOINT,
+                        account=account.id,
+                        cursor=page.cursor
+                    )
+                )
+            except Exception as e:
+                app_logger.error(
+                    msg=f'Problem with bulk save objects - {len(filtered_nmid_cards_list)} elements, error: {str(e)}'
+                )
+                session.rollback()
+                break
+
+            if result.rejected and not checkpoint_frozen:
+                checkpoint_frozen = True
+
+                app_logger.warning(
+                    msg=f'Checkpoint is not moved past page cursor={page.cursor}, rejected - {result.rejected}'
+                )
+
+            if filtered_nmid_cards_list:
+                saved_count += result.committed
+
+                app_logger.info(
+                    msg=f'Successfully was saved - {result.inserted} elements to db, updated - {result.updated}, '
+                        f'unchanged - {result.unchanged}, rejected - {result.rejected}'
+                )
+        else:
+            completed = True
     except Exception as e:
         app_logger.error(
             msg=f'Problem with get data from WB, error: {str(e)}'
         )
-        nmid_cards_data = []
-
-    for nmid_card_data in nmid_cards_data:
-        sizes = nmid_card_data.get('sizes')
-
-        if sizes:
-            for nmid_card_size in sizes:
-                nmid_card = {
-                    'nm_id': nmid_card_data.get('nmID'),
-                    'imt_id': nmid_card_data.get('imtID'),
-                    'nm_uuid': nmid_card_data.get('nmUUID'),
-                    'subject_id': nmid_card_data.get('subjectID'),
-                    'subject_name': nmid_card_data.get('subjectName'),
-                    'vendor_code': nmid_card_data.get('vendorCode'),
-                    'brand': nmid_card_data.get('brand'),
-                    'title': nmid_card_data.get('title'),
-                    'chrt_id': nmid_card_size.get('chrtID'),
-                    'tech_size': nmid_card_size.get('techSize'),
-                    'wb_size': nmid_card_size.get('wbSize'),
-                    'length': nmid_card_data.get('dimensions').get('length'),
-                    'width': nmid_card_data.get('dimensions').get('width'),
-                    'height': nmid_card_data.get('dimensions').get('height'),
-                    'created_at': nmid_card_data.get('createdAt'),
-                    'updated_at': nmid_card_data.get('updatedAt'),
-                }
-
-                if len(nmid_card_size['skus']) > 0:
-                    nmid_card['barcode'] = nmid_card_size.get('skus')[0]
-                else:
-                    nmid_card['barcode'] = None
-
-                createdAt = nmid_card.get('created_at')
-                if createdAt:
-                    nmid_card['created_at'] = parser.parse(
-                        timestr=createdAt
-                    )
 
-                updatedAt = nmid_card.get('updated_at')
-                if updatedAt:
-                    nmid_card['updated_at'] = parser.parse(
-                        timestr=updatedAt
-                    )
+    # обход каталога завершён - следующий запуск снова начнёт с первой страницы
+    if completed:
+        save_checkpoint(
+            session=session,
+            endpoint=CHECKPOINT_ENDPOINT,
+            account=account.id,
+            cursor=None
+        )
+        session.commit()
 
-                if not try_to_find_model(
-                    session=session,
-                    model=NmIDCard,
-                    filters={
-                        'nm_id': nmid_card.get('nm_id'),
-                        'chrt_id': nmid_card.get('chrt_id'),
-                    },
-                    updates=nmid_card
-                ):
-                    filtered_nmid_cards_list.append(NmIDCard(**nmid_card))
-
-    if filtered_nmid_cards_list:
-        try:
-            session.bulk_save_objects(filtered_nmid_cards_list)
-            session.commit()
-
-            app_logger.info(
-                msg=f'Successfully was saved - {len(filtered_nmid_cards_list)} elements to db'
-            )
-        except Exception as e:
-            app_logger.error(
-                msg=f'Problem with bulk save objects - {len(filtered_nmid_cards_list)} elements, error: {str(e)}'
-            )
-            session.rollback()
-    else:
+    if not saved_count:
         app_logger.info(
             msg=f'No new records'
         )
@@ -3,19 +3,25 @@ from datetime import datetime
 import sqlalchemy.orm
 
 from logs import app_logger
-from wb.api import WBApi
-from dateutil import parser
+from wb.accounts import Account, get_account
+from wb.async_api import AsyncWBApi, iter_fan_out_retrying
+from wb.retry import CHUNK_RETRY_POLICY
 
-from wb.db import try_to_find_model
-from wb.db.models import AdvertNMReport, NmIDCard, FbsWarehouse, FbsStock
+from wb.db import write_rows
+from wb.db.models import NmIDCard, FbsWarehouse, FbsStock
+
+
+STOCKS_URL = 'https://marketplace-api.wildberries.ru/api/v3/stocks/{warehouse_id}'
 
 
 def get_unique_barcodes(
-    session: sqlalchemy.orm.Session
+    session: sqlalchemy.orm.Session,
+    account_id: str
 ):
     rows = session.query(
         NmIDCard.barcode
     ).filter(
+        NmIDCard.account_id == account_id,
         NmIDCard.barcode.isnot(None)
     ).distinct().all()
 
@@ -23,10 +29,13 @@ def get_unique_barcodes(
 
 
 def get_unique_warehouses(
-    session: sqlalchemy.orm.Session
+    session: sqlalchemy.orm.Session,
+    account_id: str
 ):
     rows = session.query(
         FbsWarehouse.warehouse_id
+    ).filter(
+        FbsWarehouse.account_id == account_id
     ).distinct().all()
 
     return [row[0] for row in rows]
@@ -41,16 +50,19 @@ def chunk_list(
 
 
 def main(
-    session: sqlalchemy.orm.Session
+    session: sqlalchemy.orm.Session,
+    account: Account | None = None
 ):
     app_logger.info(
         msg='Start work'
     )
 
-    wb = WBApi()
+    if account is None:
+        account = get_account()
 
     barcode_list = get_unique_barcodes(
-        session=session
+        session=session,
+        account_id=account.id
     )
 
     if barcode_list is None:
@@ -60,7 +72,8 @@ def main(
         return
 
     warehouse_list = get_unique_warehouses(
-        session=session
+        session=session,
+        account_id=account.id
     )
 
     if warehouse_list is None:
@@ -69,56 +82,77 @@ def main(
         )
         return
 
-    filtered_stocks_fbs_list = []
-
     date_on = datetime.now().date()
 
-    for warehouse_id in warehouse_list:
+    jobs = [
+        (warehouse_id, batch)
+        for warehouse_id in warehouse_list
         for batch in chunk_list(
             lst=barcode_list,
             chunk_size=1000
-        ):
-            try:
-                stocks_fbs_data = wb.get_stocks_fbs(
-                    warehouse_id=warehouse_id,
-                    barcodes=batch
-                )
-            except Exception as e:
-                app_logger.error(
-                    msg=f'Problem with get data from WB, error: {str(e)}'
-                )
-                stocks_fbs_data = []
-
-            for stock_fbs_element in stocks_fbs_data:
-                fbs_stock_info = {
-                    'amount': stock_fbs_element.get('amount'),
-                    'sku': stock_fbs_element.get('sku'),
-                    'warehouse_id': warehouse_id,
-                    'date_on': date_on
-                }
-
-                if not try_to_find_model(
-                    session=session,
-                    model=FbsStock,
-                    filters={
-                        'sku': fbs_stock_info.get('sku'),
-                        'date_on': fbs_stock_info.get('date_on'),
-                    },
-                    updates=fbs_stock_info
-                ):
-                    filtered_stocks_fbs_list.append(FbsStock(**fbs_stock_info))
-
-    if filtered_stocks_fbs_list:
+        )
+    ]
+
+    async def fetch_stocks(
+        wb: AsyncWBApi,
+        job: tuple[int, list]
+    ):
+        warehouse_id, batch = job
+
+        return await wb.get_stocks_fbs(
+            warehouse_id=warehouse_id,
+            barcodes=batch,
+            retry_policy=CHUNK_RETRY_POLICY
+        )
+
+    stocks_fbs = {}
+    failed_jobs = 0
+
+    for (warehouse_id, batch), stocks_fbs_data, error in iter_fan_out_retrying(
+        jobs=jobs,
+        call=fetch_stocks,
+        concurrency=AsyncWBApi.fan_out_concurrency(url=STOCKS_URL),
+        token=account.token
+    ):
+        if error is not None:
+            app_logger.error(
+                msg=f'Problem with get data from WB for warehouse {warehouse_id}, error: {str(error)}'
+            )
+            failed_jobs += 1
+            continue
+
+        for stock_fbs_element in stocks_fbs_data:
+            fbs_stock_info = {
+                'account_id': account.id,
+                'amount': stock_fbs_element.get('amount'),
+                'sku': stock_fbs_element.get('sku'),
+                'warehouse_id': warehouse_id,
+                'date_on': date_on
+            }
+
+            stocks_fbs[(warehouse_id, fbs_stock_info.get('sku'))] = fbs_stock_info
+
+    if failed_jobs:
+        app_logger.error(
+            msg=f'Failed {failed_jobs} of {len(jobs)} warehouse batches'
+        )
+
+    if stocks_fbs:
         try:
-            session.bulk_save_objects(filtered_stocks_fbs_list)
-            session.commit()
+            result = write_rows(
+                session=session,
+                model=FbsStock,
+                rows=list(stocks_fbs.values()),
+                key_columns=['account_id', 'warehouse_id', 'sku', 'date_on']
+            )
 
             app_logger.info(
-                msg=f'Successfully was saved - {len(filtered_stocks_fbs_list)} elements to db'
+                msg=f'Successfully was saved - {result.inserted} elements to db, updated - {result.updated}, '
+                    f'unchanged - {result.unchanged}, rejected - {result.rejected}'
             )
         except Exception as e:
             app_logger.error(
-                msg=f'Problem with bulk save objects - {len(filtered_stocks_fbs_list)} elements, error: {str(e)}'
+                msg=f'Problem with bulk save objects - {len(stocks_fbs)} elements, error: {str(e)}'
             )
             session.rollback()
     else:
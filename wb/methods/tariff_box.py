@@ -3,9 +3,10 @@ from datetime import date
 import sqlalchemy.orm
 
 from logs import app_logger
+from wb.accounts import Account, get_account
 from wb.api import WBApi
 
-from wb.db import try_to_find_model
+from wb.db import write_rows
 from wb.db.models import TariffBox
 
 
@@ -34,13 +35,19 @@ def convert_fields_to_float(
 
 
 def main(
-    session: sqlalchemy.orm.Session
+    session: sqlalchemy.orm.Session,
+    account: Account | None = None
 ):
     app_logger.info(
         msg='Start work'
     )
 
-    wb = WBApi()
+    if account is None:
+        account = get_account()
+
+    wb = WBApi(
+        token=account.token
+    )
 
     upload_at = date.today()
 
@@ -58,6 +65,7 @@ def main(
 
     for tariff_box in tariffs_box:
         tariff_box_dict = {
+            'account_id': account.id,
             'warehouse_name': tariff_box.get('warehouseName'),
             'box_delivery_and_storage_expr': tariff_box.get('boxDeliveryAndStorageExpr'),
             'box_delivery_base': tariff_box.get('boxDeliveryBase'),
@@ -85,24 +93,20 @@ def main(
 
             continue
 
-        if not try_to_find_model(
-            session=session,
-            model=TariffBox,
-            filters={
-                'warehouse_name': tariff_box_data.get('warehouse_name'),
-                'upload_at': tariff_box_data.get('upload_at'),
-            },
-            updates=tariff_box_data
-        ):
-            filtered_tariffs_box.append(TariffBox(**tariff_box_data))
+        filtered_tariffs_box.append(tariff_box_data)
 
     if filtered_tariffs_box:
         try:
-            session.bulk_save_objects(filtered_tariffs_box)
-            session.commit()
+            result = write_rows(
+                session=session,
+                model=TariffBox,
+                rows=filtered_tariffs_box,
+                key_columns=['account_id', 'warehouse_name', 'upload_at']
+            )
 
             app_logger.info(
-                msg=f'Successfully was saved - {len(filtered_tariffs_box)} elements to db'
+                msg=f'Successfully was saved - {result.inserted} elements to db, updated - {result.updated}, '
+                    f'unchanged - {result.unchanged}, rejected - {result.rejected}'
             )
         except Exception as e:
             app_logger.error(
@@ -3,20 +3,27 @@ from datetime import date
 import sqlalchemy.orm
 
 from logs import app_logger
+from wb.accounts import Account, get_account
 from wb.api import WBApi
 
-from wb.db import try_to_find_model
+from wb.db import write_rows
 from wb.db.models import TariffBox, TariffCommission
 
 
 def main(
-    session: sqlalchemy.orm.Session
+    session: sqlalchemy.orm.Session,
+    account: Account | None = None
 ):
     app_logger.info(
         msg='Start work'
     )
 
-    wb = WBApi()
+    if account is None:
+        account = get_account()
+
+    wb = WBApi(
+        token=account.token
+    )
 
     upload_at = date.today()
 
@@ -32,6 +39,7 @@ def main(
 
     for tariff_commission in tariffs_commission:
         tariff_commission_dict = {
+            'account_id': account.id,
             'kgvp_marketplace': tariff_commission.get('kgvpMarketplace'),
             'kgvp_supplier': tariff_commission.get('kgvpSupplier'),
             'kgvp_supplier_express': tariff_commission.get('kgvpSupplierExpress'),
@@ -43,25 +51,20 @@ def main(
             'upload_at': upload_at
         }
 
-        if not try_to_find_model(
-            session=session,
-            model=TariffCommission,
-            filters={
-                'parent_id': tariff_commission_dict.get('parent_id'),
-                'subject_id': tariff_commission_dict.get('subject_id'),
-                'upload_at': tariff_commission_dict.get('upload_at'),
-            },
-            updates=tariff_commission_dict
-        ):
-            filtered_tariffs_commission.append(TariffCommission(**tariff_commission_dict))
+        filtered_tariffs_commission.append(tariff_commission_dict)
 
     if filtered_tariffs_commission:
         try:
-            session.bulk_save_objects(filtered_tariffs_commission)
-            session.commit()
+            result = write_rows(
+                session=session,
+                model=TariffCommission,
+                rows=filtered_tariffs_commission,
+                key_columns=['account_id', 'parent_id', 'subject_id', 'upload_at']
+            )
 
             app_logger.info(
-                msg=f'Successfully was saved - {len(filtered_tariffs_commission)} elements to db'
+                msg=f'Successfully was saved - {result.inserted} elements to db, updated - {result.updated}, '
+                    f'unchanged - {result.unchanged}, rejected - {result.rejected}'
             )
         except Exception as e:
             app_logger.error(
@@ -0,0 +1,271 @@
+import bisect
+import math
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Mapping
+from urllib.parse import urlsplit
+
+from wb.payload import PayloadStats, endpoint_key
+
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, math.inf)
+
+
+@dataclass
+class EndpointMetrics:
+    category: str
+    requests: int = 0
+    status_counts: Counter = field(default_factory=Counter)
+    latency_buckets: list[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+    latency_sum: float = 0.0
+    latency_max: float = 0.0
+    throttled: int = 0
+    retries: int = 0
+    backoff_seconds: float = 0.0
+    rate_limit_wait_seconds: float = 0.0
+
+    def observe_latency(
+        self,
+        seconds: float
+    ) -> None:
+        self.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.latency_sum += seconds
+        self.latency_max = max(self.latency_max, seconds)
+
+    def latency_quantile(
+        self,
+        quantile: float
+    ) -> float | None:
+        """Оценка квантиля по гистограмме: верхняя граница корзины, куда он попал."""
+        total = sum(self.latency_buckets)
+        if not total:
+            return None
+
+        rank = quantile * total
+        cumulative = 0
+
+        for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.latency_max)
+
+        return self.latency_max
+
+    def copy(
+        self
+    ) -> 'EndpointMetrics':
+        return EndpointMetrics(
+            category=self.category,
+            requests=self.requests,
+            status_counts=Counter(self.status_counts),
+            latency_buckets=list(self.latency_buckets),
+            latency_sum=self.latency_sum,
+            latency_max=self.latency_max,
+            throttled=self.throttled,
+            retries=self.retries,
+            backoff_seconds=self.backoff_seconds,
+            rate_limit_wait_seconds=self.rate_limit_wait_seconds,
+        )
+
+
+class ApiMetrics:
+    """Метрики HTTP-вызовов WB API в памяти процесса, по эндпоинтам и категориям.
+
+    Каждая попытка запроса - отдельное наблюдение: задержка, статус (или `error` для
+    сетевых сбоев), ожидание в лимитере, повторы и время backoff. Размеры ответов
+    берутся из `PayloadStats`, чтобы не считать их дважды.
+    """
+
+    def __init__(
+        self,
+        host_categories: Mapping[str, str],
+        payload_stats: PayloadStats
+    ):
+        self._host_categories = dict(host_categories)
+        self._payload_stats = payload_stats
+        self._lock = threading.Lock()
+        self._endpoints: dict[str, EndpointMetrics] = {}
+
+    def _endpoint(
+        self,
+        url: str
+    ) -> EndpointMetrics:
+        key = endpoint_key(url=url)
+
+        endpoint = self._endpoints.get(key)
+        if endpoint is None:
+            category = self._host_categories.get(urlsplit(url).netloc)
+            endpoint = self._endpoints[key] = EndpointMetrics(
+                category=category.name if category is not None else 'UNKNOWN'
+            )
+
+        return endpoint
+
+    def observe_request(
+        self,
+        url: str,
+        seconds: float,
+        status_code: int | None = None
+    ) -> None:
+        with self._lock:
+            endpoint = self._endpoint(url=url)
+            endpoint.requests += 1
+            endpoint.status_counts[str(status_code) if status_code is not None else 'error'] += 1
+            endpoint.observe_latency(seconds=seconds)
+
+            if status_code == 429:
+                endpoint.throttled += 1
+
+    def observe_retry(
+        self,
+        url: str,
+        delay: float
+    ) -> None:
+        with self._lock:
+            endpoint = self._endpoint(url=url)
+            endpoint.retries += 1
+            endpoint.backoff_seconds += delay
+
+    def observe_rate_limit_wait(
+        self,
+        url: str,
+        seconds: float
+    ) -> None:
+        if seconds <= 0:
+            return
+
+        with self._lock:
+            self._endpoint(url=url).rate_limit_wait_seconds += seconds
+
+    def snapshot(
+        self
+    ) -> dict[str, EndpointMetrics]:
+        with self._lock:
+            return {key: endpoint.copy() for key, endpoint in self._endpoints.items()}
+
+    def payload_snapshot(
+        self
+    ):
+        return self._payload_stats.snapshot()
+
+    def reset(
+        self
+    ) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+        self._payload_stats.reset()
+
+    def render_prometheus(
+        self
+    ) -> str:
+        """Метрики в текстовом формате Prometheus (exposition format 0.0.4)."""
+        endpoints = self.snapshot()
+        payloads = self.payload_snapshot()
+
+        lines = []
+
+        def family(
+            name: str,
+            kind: str,
+            help_text: str
+        ):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def labels(
+            key: str,
+            endpoint: EndpointMetrics | None = None,
+            **extra
+        ) -> str:
+            values = {'endpoint': key}
+            if endpoint is not None:
+                values['category'] = endpoint.category
+            values.update(extra)
+
+            return ','.join(f'{name}="{_escape(value)}"' for name, value in values.items())
+
+        family('wb_api_request_duration_seconds', 'histogram', 'WB API request latency per attempt.')
+        for key, endpoint in sorted(endpoints.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, endpoint.latency_buckets):
+                cumulative += count
+                le = '+Inf' if math.isinf(bound) else repr(bound)
+                lines.append(f'wb_api_request_duration_seconds_bucket{{{labels(key, endpoint, le=le)}}} {cumulative}')
+            lines.append(f'wb_api_request_duration_seconds_sum{{{labels(key, endpoint)}}} {endpoint.latency_sum}')
+            lines.append(f'wb_api_request_duration_seconds_count{{{labels(key, endpoint)}}} {endpoint.requests}')
+
+        family('wb_api_responses_total', 'counter', 'WB API responses by status code.')
+        for key, endpoint in sorted(endpoints.items()):
+            for status, count in sorted(endpoint.status_counts.items()):
+                lines.append(f'wb_api_responses_total{{{labels(key, endpoint, status=status)}}} {count}')
+
+        for name, attribute, help_text in (
+            ('wb_api_throttled_total', 'throttled', 'WB API responses with status 429.'),
+            ('wb_api_retries_total', 'retries', 'WB API request retries.'),
+            ('wb_api_backoff_seconds_total', 'backoff_seconds', 'Seconds slept before retries.'),
+            ('wb_api_rate_limit_wait_seconds_total', 'rate_limit_wait_seconds', 'Seconds waited in the rate limiter.'),
+        ):
+            family(name, 'counter', help_text)
+            for key, endpoint in sorted(endpoints.items()):
+                lines.append(f'{name}{{{labels(key, endpoint)}}} {getattr(endpoint, attribute)}')
+
+        for name, attribute, help_text in (
+            ('wb_api_response_wire_bytes_total', 'wire_bytes', 'Response bytes received over the wire.'),
+            ('wb_api_response_decoded_bytes_total', 'decoded_bytes', 'Response bytes after decompression.'),
+            ('wb_api_decode_seconds_total', 'decode_seconds', 'Seconds spent decoding JSON responses.'),
+        ):
+            family(name, 'counter', help_text)
+            for key, counter in sorted(payloads.items()):
+                lines.append(f'{name}{{{labels(key, endpoints.get(key))}}} {getattr(counter, attribute)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(
+    value: str
+) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def serve_metrics(
+    metrics: ApiMetrics,
+    port: int,
+    host: str = '0.0.0.0'
+) -> ThreadingHTTPServer:
+    """Поднимает в фоновом потоке HTTP-эндпоинт `/metrics` для Prometheus."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(
+            self
+        ):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+
+            body = metrics.render_prometheus().encode('utf-8')
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(
+            self,
+            *args
+        ):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+
+    threading.Thread(
+        target=server.serve_forever,
+        name='wb-metrics',
+        daemon=True
+    ).start()
+
+    return server
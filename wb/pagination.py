@@ -0,0 +1,69 @@
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+
+@dataclass(frozen=True)
+class Page:
+    """Страница выдачи и курсор, с которого продолжать после неё."""
+
+    items: list
+    cursor: Any
+
+
+_PREFETCH_DONE = object()
+
+
+def prefetch(
+    pages: Iterator,
+    depth: int = 1
+) -> Iterator:
+    """Забирает следующие элементы итератора в фоновом потоке.
+
+    Пока вызывающий разбирает и сохраняет страницу N, запрос страницы N+1 уже в полёте.
+    Ошибка итератора пробрасывается вызывающему в том месте, где она случилась.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def put(
+        item
+    ) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for page in pages:
+                if not put((page, None)):
+                    return
+        except Exception as e:
+            put((None, e))
+        finally:
+            put((_PREFETCH_DONE, None))
+
+    worker = threading.Thread(
+        target=produce,
+        daemon=True
+    )
+    worker.start()
+
+    try:
+        while True:
+            page, error = buffer.get()
+
+            if error is not None:
+                raise error
+            if page is _PREFETCH_DONE:
+                break
+
+            yield page
+    finally:
+        stopped.set()
+        worker.join()
@@ -0,0 +1,120 @@
+import json
+import re
+import threading
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Any
+from urllib.parse import urlsplit
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+
+# br объявляем только если его есть чем распаковать: и urllib3, и httpx берут тот же модуль
+ACCEPT_ENCODING = 'br, gzip, deflate' if brotli is not None else 'gzip, deflate'
+
+
+def loads(
+    content: bytes
+) -> Any:
+    """Разбирает JSON через orjson, если он установлен, иначе через стандартный json."""
+    if orjson is not None:
+        return orjson.loads(content)
+
+    return json.loads(content)
+
+
+def endpoint_key(
+    url: str
+) -> str:
+    """Хост и путь запроса без идентификаторов: `/tasks/<uuid>/status` -> `/tasks/{id}/status`."""
+    parts = urlsplit(url)
+    path = re.sub(r'/[0-9a-fA-F-]{8,}(?=/|$)|/\d+(?=/|$)', '/{id}', parts.path)
+
+    return f'{parts.netloc}{path}'
+
+
+@dataclass
+class PayloadCounter:
+    responses: int = 0
+    wire_bytes: int = 0
+    decoded_bytes: int = 0
+    decode_seconds: float = 0.0
+
+    @property
+    def compression_ratio(
+        self
+    ) -> float:
+        return self.decoded_bytes / self.wire_bytes if self.wire_bytes else 1.0
+
+
+class PayloadStats:
+    """Счётчики размеров ответов по эндпоинтам: сколько байт пришло по сети и во что
+    они распаковались, плюс время разбора JSON."""
+
+    def __init__(
+        self
+    ):
+        self._lock = threading.Lock()
+        self._counters: dict[str, PayloadCounter] = {}
+
+    def record(
+        self,
+        url: str,
+        wire_bytes: int,
+        decoded_bytes: int,
+        decode_seconds: float = 0.0
+    ) -> None:
+        key = endpoint_key(url=url)
+
+        with self._lock:
+            counter = self._counters.setdefault(key, PayloadCounter())
+            counter.responses += 1
+            counter.wire_bytes += wire_bytes
+            counter.decoded_bytes += decoded_bytes
+            counter.decode_seconds += decode_seconds
+
+    def snapshot(
+        self
+    ) -> dict[str, PayloadCounter]:
+        with self._lock:
+            return {
+                key: PayloadCounter(**vars(counter)) for key, counter in self._counters.items()
+            }
+
+    def reset(
+        self
+    ) -> None:
+        with self._lock:
+            self._counters.clear()
+
+
+class DecodeTimer:
+    """Накапливает время, потраченное на разбор тела ответа."""
+
+    def __init__(
+        self
+    ):
+        self.seconds = 0.0
+
+    def __enter__(
+        self
+    ):
+        self._started = perf_counter()
+        return self
+
+    def __exit__(
+        self,
+        *exc_info
+    ):
+        self.seconds += perf_counter() - self._started
@@ -0,0 +1,255 @@
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from fnmatch import fnmatch
+from typing import Mapping
+from urllib.parse import urlsplit
+
+
+@dataclass(frozen=True)
+class RateQuota:
+    requests: int
+    period: float
+    burst: int = 1
+
+    @property
+    def rate(
+        self
+    ) -> float:
+        return self.requests / self.period
+
+
+class TokenBucket:
+    """Token bucket с резервированием: вызывающий сразу узнаёт, сколько ждать до отправки.
+
+    Токены могут уходить в минус - так параллельные потоки и корутины выстраиваются
+    в очередь, а не наваливаются на лимит одновременно.
+    """
+
+    def __init__(
+        self,
+        quota: RateQuota
+    ):
+        self._rate = quota.rate
+        self._capacity = float(quota.burst)
+        self._tokens = float(quota.burst)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(
+        self,
+        now: float
+    ) -> None:
+        self._tokens = min(
+            self._capacity,
+            self._tokens + (now - self._updated_at) * self._rate
+        )
+        self._updated_at = now
+
+    def reserve(
+        self
+    ) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now=now)
+
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+
+            return max(wait, self._blocked_until - now)
+
+    def acquire(
+        self
+    ) -> float:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(
+        self
+    ) -> float:
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def block_for(
+        self,
+        seconds: float
+    ) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now=now)
+
+            self._tokens = min(self._tokens, 0.0)
+            self._blocked_until = max(self._blocked_until, now + seconds)
+
+    def limit_remaining(
+        self,
+        remaining: int
+    ) -> None:
+        with self._lock:
+            self._refill(now=time.monotonic())
+            self._tokens = min(self._tokens, float(remaining))
+
+    @property
+    def interval(
+        self
+    ) -> float:
+        return 1 / self._rate
+
+
+def _header_seconds(
+    headers: Mapping[str, str],
+    name: str
+) -> float | None:
+    value = headers.get(name)
+    if value is None:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Общий для потоков и корутин лимитер запросов к WB API.
+
+    Бакеты заводятся на тройку (аккаунт, хост, шаблон эндпоинта) по известным квотам
+    категории - WB считает лимиты на каждого продавца отдельно, - а затем подстраиваются
+    по заголовкам X-Ratelimit-* / Retry-After из ответов.
+    """
+
+    def __init__(
+        self,
+        host_categories: Mapping[str, str],
+        quotas: Mapping[str, Mapping[str, RateQuota]],
+        default_quota: RateQuota,
+        enabled: bool = True,
+    ):
+        self._host_categories = dict(host_categories)
+        self._quotas = quotas
+        self._default_quota = default_quota
+        self._enabled = enabled
+
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(
+        self
+    ) -> bool:
+        return self._enabled
+
+    def _quota_for(
+        self,
+        category,
+        path: str
+    ) -> tuple[str, RateQuota]:
+        category_quotas = self._quotas.get(category, {})
+
+        for pattern, quota in category_quotas.items():
+            if pattern != '*' and fnmatch(path, pattern):
+                return pattern, quota
+
+        return '*', category_quotas.get('*', self._default_quota)
+
+    def _resolve(
+        self,
+        url: str,
+        account: str | None = None
+    ) -> tuple[tuple[str | None, str, str], RateQuota]:
+        parts = urlsplit(url)
+        path = parts.path.strip('/')
+
+        category = self._host_categories.get(parts.netloc)
+        pattern, quota = self._quota_for(
+            category=category,
+            path=path
+        )
+
+        return (account, parts.netloc, pattern), quota
+
+    def quota_for(
+        self,
+        url: str
+    ) -> RateQuota:
+        return self._resolve(url=url)[1]
+
+    def bucket_for(
+        self,
+        url: str,
+        account: str | None = None
+    ) -> TokenBucket:
+        key, quota = self._resolve(
+            url=url,
+            account=account
+        )
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(
+                    quota=quota
+                )
+
+        return bucket
+
+    def acquire(
+        self,
+        url: str,
+        account: str | None = None
+    ) -> float:
+        if not self._enabled:
+            return 0.0
+
+        return self.bucket_for(url=url, account=account).acquire()
+
+    async def acquire_async(
+        self,
+        url: str,
+        account: str | None = None
+    ) -> float:
+        if not self._enabled:
+            return 0.0
+
+        return await self.bucket_for(url=url, account=account).acquire_async()
+
+    def update(
+        self,
+        url: str,
+        status_code: int,
+        headers: Mapping[str, str],
+        account: str | None = None
+    ) -> None:
+        if not self._enabled:
+            return
+
+        bucket = self.bucket_for(url=url, account=account)
+
+        retry = _header_seconds(headers=headers, name='X-Ratelimit-Retry')
+        if retry is None:
+            retry = _header_seconds(headers=headers, name='Retry-After')
+
+        if retry is not None:
+            bucket.block_for(seconds=retry)
+        elif status_code == 429:
+            bucket.block_for(seconds=bucket.interval)
+
+        remaining = headers.get('X-Ratelimit-Remaining')
+        if remaining is not None and remaining.isdigit():
+            bucket.limit_remaining(remaining=int(remaining))
+
+            reset = _header_seconds(headers=headers, name='X-Ratelimit-Reset')
+            if int(remaining) == 0 and reset is not None:
+                bucket.block_for(seconds=reset)
@@ -0,0 +1,211 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from config import settings
+from logs import app_logger
+from wb.circuit_breaker import CircuitOpenError
+
+
+READY_STATUSES = frozenset({'done', 'success'})
+FAILED_STATUSES = frozenset({'canceled', 'purged', 'failed', 'error'})
+
+
+class ReportJobError(Exception):
+    """Отчёт не удалось получить: задание упало на стороне WB или вышел дедлайн."""
+
+
+def task_status_ready(
+    status: str | None
+) -> bool:
+    """Статус задания WB -> готов ли отчёт; для конечных статусов-ошибок - исключение."""
+    status = (status or '').lower()
+
+    if status in FAILED_STATUSES:
+        raise ReportJobError(
+            f'Report task finished with status: {status}'
+        )
+
+    return status in READY_STATUSES
+
+
+@dataclass
+class ReportJob:
+    """Отложенный отчёт WB: создать задание, дождаться готовности, скачать.
+
+    `create` возвращает id задания, `is_ready(task_id)` - готов ли отчёт,
+    `download(task_id)` - сам отчёт. Интервал опроса растёт от `first_poll`
+    в `backoff` раз до `max_interval`, после `deadline` секунд задание бросается.
+    """
+
+    name: str
+    create: Callable[[], Any]
+    is_ready: Callable[[Any], bool]
+    download: Callable[[Any], Any]
+    first_poll: float = 5.0
+    max_interval: float = 60.0
+    backoff: float = 1.5
+    deadline: float = field(default_factory=lambda: settings.wb.REPORT_JOB_DEADLINE)
+
+
+@dataclass
+class _JobState:
+    job: ReportJob
+    future: Future
+    expires_at: float
+    interval: float
+    task_id: Any = None
+    polls: int = 0
+
+
+class ReportJobManager:
+    """Общий для процесса планировщик отложенных отчётов WB.
+
+    Модули отдают задания через `submit` и ждут свой Future, а опросы статусов всех
+    заданий идут вперемешку по расписанию одного потока-планировщика. Сами запросы
+    выполняются в пуле, так что ожидание лимита одного эндпоинта не задерживает
+    опросы остальных, а готовый отчёт скачивается сразу, не дожидаясь соседей.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4
+    ):
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix='report-jobs'
+        )
+        self._condition = threading.Condition()
+        self._schedule = []
+        self._sequence = itertools.count()
+        self._scheduler = None
+
+    def submit(
+        self,
+        job: ReportJob
+    ) -> Future:
+        state = _JobState(
+            job=job,
+            future=Future(),
+            expires_at=time.monotonic() + job.deadline,
+            interval=job.first_poll,
+        )
+
+        self._ensure_scheduler()
+        self._executor.submit(self._create, state)
+
+        return state.future
+
+    def run(
+        self,
+        job: ReportJob
+    ) -> Any:
+        return self.submit(job=job).result()
+
+    def _ensure_scheduler(
+        self
+    ) -> None:
+        with self._condition:
+            if self._scheduler is None or not self._scheduler.is_alive():
+                self._scheduler = threading.Thread(
+                    target=self._schedule_loop,
+                    name='report-jobs-scheduler',
+                    daemon=True
+                )
+                self._scheduler.start()
+
+    def _schedule_poll(
+        self,
+        state: _JobState,
+        delay: float
+    ) -> None:
+        poll_at = min(time.monotonic() + delay, state.expires_at)
+
+        with self._condition:
+            heapq.heappush(self._schedule, (poll_at, next(self._sequence), state))
+            self._condition.notify()
+
+    def _schedule_loop(
+        self
+    ) -> None:
+        while True:
+            with self._condition:
+                while not self._schedule or self._schedule[0][0] > time.monotonic():
+                    timeout = self._schedule[0][0] - time.monotonic() if self._schedule else None
+                    self._condition.wait(timeout=timeout)
+
+                _, _, state = heapq.heappop(self._schedule)
+
+            self._executor.submit(self._poll, state)
+
+    def _create(
+        self,
+        state: _JobState
+    ) -> None:
+        try:
+            state.task_id = state.job.create()
+        except Exception as e:
+            state.future.set_exception(e)
+            return
+
+        if state.task_id is None:
+            state.future.set_exception(
+                ReportJobError(f'{state.job.name}: report task was not created')
+            )
+            return
+
+        self._schedule_poll(
+            state=state,
+            delay=state.interval
+        )
+
+    def _poll(
+        self,
+        state: _JobState
+    ) -> None:
+        job = state.job
+        state.polls += 1
+
+        try:
+            ready = job.is_ready(state.task_id)
+        except (ReportJobError, CircuitOpenError) as e:
+            state.future.set_exception(e)
+            return
+        except Exception as e:
+            # статус - дешёвый идемпотентный GET, сбой опроса не повод бросать отчёт
+            app_logger.warning(
+                msg=f'{job.name}: problem with check status of task {state.task_id}, error: {str(e)}'
+            )
+            ready = False
+
+        if ready:
+            try:
+                state.future.set_result(job.download(state.task_id))
+
+                app_logger.info(
+                    msg=f'{job.name}: report {state.task_id} downloaded after {state.polls} polls'
+                )
+            except Exception as e:
+                state.future.set_exception(e)
+            return
+
+        if time.monotonic() >= state.expires_at:
+            state.future.set_exception(
+                ReportJobError(
+                    f'{job.name}: report {state.task_id} is not ready after {job.deadline:.0f}s'
+                )
+            )
+            return
+
+        state.interval = min(state.interval * job.backoff, job.max_interval)
+        self._schedule_poll(
+            state=state,
+            delay=state.interval
+        )
+
+
+REPORT_JOBS = ReportJobManager()
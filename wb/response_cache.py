@@ -0,0 +1,181 @@
+import hashlib
+import json
+import time
+from dataclasses import asdict, dataclass
+from fnmatch import fnmatch
+from typing import Any, Mapping, Protocol
+from urllib.parse import urlsplit
+
+
+class ResponseStore(Protocol):
+    def get(
+        self,
+        key: str,
+        default: Any = None
+    ) -> Any:
+        ...
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: float
+    ) -> None:
+        ...
+
+    def delete(
+        self,
+        key: str
+    ) -> None:
+        ...
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: Any
+    fresh_until: float
+    etag: str | None = None
+    last_modified: str | None = None
+
+    @property
+    def is_fresh(
+        self
+    ) -> bool:
+        return self.fresh_until > time.time()
+
+    def conditional_headers(
+        self
+    ) -> dict:
+        headers = {}
+
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+
+        return headers
+
+
+class ResponseCache:
+    """Кэш ответов справочных эндпоинтов WB поверх key-value хранилища.
+
+    Пока запись свежая (TTL эндпоинта), запрос в сеть не уходит вовсе. Протухшая запись
+    хранится ещё `stale_ttl` секунд: если WB отдал ETag/Last-Modified, она
+    перепроверяется условным запросом и при 304 продлевается без скачивания тела.
+    """
+
+    def __init__(
+        self,
+        store: ResponseStore,
+        ttls: Mapping[str, float],
+        enabled: bool = True,
+        stale_ttl: float = 7 * 24 * 60 * 60,
+    ):
+        self._store = store
+        self._ttls = ttls
+        self._enabled = enabled
+        self._stale_ttl = stale_ttl
+
+    def ttl_for(
+        self,
+        url: str
+    ) -> float | None:
+        path = urlsplit(url).path.strip('/')
+
+        for pattern, ttl in self._ttls.items():
+            if fnmatch(path, pattern):
+                return ttl
+
+        return None
+
+    def key_for(
+        self,
+        account: str,
+        request_kwargs: dict
+    ) -> str | None:
+        """Ключ кэша для запроса или None, если эндпоинт не кэшируется."""
+        if not self._enabled or self.ttl_for(url=request_kwargs['url']) is None:
+            return None
+
+        fingerprint = json.dumps(
+            [
+                account,
+                request_kwargs['method'].upper(),
+                request_kwargs['url'],
+                request_kwargs.get('params'),
+                request_kwargs.get('json'),
+                request_kwargs.get('data'),
+            ],
+            sort_keys=True,
+            default=str
+        )
+
+        return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()
+
+    def get(
+        self,
+        key: str
+    ) -> CachedResponse | None:
+        entry = self._store.get(key=key)
+        if not entry:
+            return None
+
+        try:
+            return CachedResponse(**entry)
+        except TypeError:
+            return None
+
+    def set(
+        self,
+        key: str,
+        url: str,
+        body: Any,
+        headers: Mapping[str, str]
+    ) -> None:
+        ttl = self.ttl_for(url=url) or 0
+
+        self._write(
+            key=key,
+            cached=CachedResponse(
+                body=body,
+                fresh_until=time.time() + ttl,
+                etag=headers.get('ETag'),
+                last_modified=headers.get('Last-Modified'),
+            ),
+            ttl=ttl
+        )
+
+    def revalidated(
+        self,
+        key: str,
+        url: str,
+        cached: CachedResponse,
+        headers: Mapping[str, str]
+    ) -> None:
+        ttl = self.ttl_for(url=url) or 0
+
+        self._write(
+            key=key,
+            cached=CachedResponse(
+                body=cached.body,
+                fresh_until=time.time() + ttl,
+                etag=headers.get('ETag', cached.etag),
+                last_modified=headers.get('Last-Modified', cached.last_modified),
+            ),
+            ttl=ttl
+        )
+
+    def _write(
+        self,
+        key: str,
+        cached: CachedResponse,
+        ttl: float
+    ) -> None:
+        # без валидаторов протухшая запись бесполезна, держим её только на время TTL
+        keep_for = ttl + self._stale_ttl if cached.etag or cached.last_modified else ttl
+
+        self._store.set(
+            key=key,
+            value=asdict(cached),
+            ttl=keep_for
+        )
@@ -0,0 +1,93 @@
+import random
+from dataclasses import dataclass, field
+
+
+IDEMPOTENT_METHODS = frozenset(
+    {
+        'GET',
+        'HEAD',
+        'OPTIONS',
+        'PUT',
+        'DELETE',
+    }
+)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Политика повторов запроса: экспоненциальная задержка с full jitter и общий дедлайн.
+
+    Ошибки соединения, таймауты и 5xx повторяются только для идемпотентных запросов,
+    429 - всегда: такой запрос сервер гарантированно не обработал.
+    """
+
+    max_attempts: int = 8
+    deadline: float = 600.0
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+    retry_statuses: frozenset[int] = field(
+        default_factory=lambda: frozenset({429, 500, 502, 503, 504})
+    )
+    retry_transport_errors: bool = True
+
+    def backoff(
+        self,
+        attempt: int
+    ) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def is_retryable_status(
+        self,
+        status_code: int
+    ) -> bool:
+        return status_code in self.retry_statuses
+
+    def next_delay(
+        self,
+        attempt: int,
+        elapsed: float,
+        idempotent: bool,
+        status_code: int | None = None,
+        transport_error: bool = False,
+        paced: bool = False,
+    ) -> float | None:
+        """Возвращает задержку перед следующей попыткой или None, если повторять не нужно.
+
+        Args:
+            attempt (int): Номер завершившейся попытки, начиная с 0.
+            elapsed (float): Сколько секунд прошло с первой попытки.
+            idempotent (bool): Можно ли безопасно повторить запрос.
+            status_code (int | None): Статус ответа, если ответ получен.
+            transport_error (bool): Запрос упал на соединении или таймауте.
+            paced (bool): Ожидание после 429 уже обеспечивает лимитер запросов.
+
+        Returns:
+            float | None: Задержка в секундах или None.
+        """
+        if attempt + 1 >= self.max_attempts:
+            return None
+
+        if transport_error:
+            if not (self.retry_transport_errors and idempotent):
+                return None
+        elif status_code is None or not self.is_retryable_status(status_code=status_code):
+            return None
+        elif status_code != 429 and not idempotent:
+            return None
+
+        delay = 0.0 if status_code == 429 and paced else self.backoff(attempt=attempt)
+
+        if elapsed + delay >= self.deadline:
+            return None
+
+        return delay
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+CHUNK_RETRY_POLICY = RetryPolicy(
+    max_attempts=5,
+    deadline=180.0,
+    base_delay=0.5,
+    max_delay=15.0,
+)
@@ -0,0 +1,121 @@
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from typing import Callable
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class SessionPool:
+    """Общий keep-alive `requests.Session` с отдельным пулом соединений на каждый хост WB API.
+
+    Сессия пересоздаётся по истечении `max_age` секунд (аналог DB_POOL_RECYCLE),
+    предыдущая закрывается только на следующей ротации, чтобы не оборвать запросы,
+    которые ещё выполняются в других потоках.
+    """
+
+    def __init__(
+        self,
+        hosts: list[str],
+        pool_connections: int = 10,
+        pool_maxsize: int = 20,
+        pool_block: bool = False,
+        max_age: int = 1800,
+        url_rewrite: Callable[[str], str] | None = None,
+    ):
+        self._hosts = sorted(
+            {
+                self._base_of(url=host) for host in hosts
+            }
+        )
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._pool_block = pool_block
+        self._max_age = max_age
+        self._url_rewrite = url_rewrite
+
+        self._lock = threading.Lock()
+        self._session = None
+        self._created_at = 0.0
+        self._retired = []
+
+    @staticmethod
+    def _base_of(
+        url: str
+    ) -> str:
+        parts = urlsplit(url)
+        return f'{parts.scheme}://{parts.netloc}'
+
+    def _make_adapter(
+        self
+    ) -> HTTPAdapter:
+        return HTTPAdapter(
+            pool_connections=self._pool_connections,
+            pool_maxsize=self._pool_maxsize,
+            pool_block=self._pool_block,
+        )
+
+    def _create_session(
+        self
+    ) -> requests.Session:
+        session = requests.Session()
+
+        # WB API не использует cookies, а общий CookieJar между потоками - лишняя гонка
+        session.cookies.set_policy(
+            DefaultCookiePolicy(
+                allowed_domains=[]
+            )
+        )
+
+        session.mount('https://', self._make_adapter())
+        session.mount('http://', self._make_adapter())
+
+        for host in self._hosts:
+            session.mount(host, self._make_adapter())
+
+        return session
+
+    @property
+    def session(
+        self
+    ) -> requests.Session:
+        with self._lock:
+            now = time.monotonic()
+
+            if self._session is None or now - self._created_at >= self._max_age:
+                for retired in self._retired:
+                    retired.close()
+
+                self._retired = [self._session] if self._session is not None else []
+                self._session = self._create_session()
+                self._created_at = now
+
+            return self._session
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        **kwargs
+    ) -> requests.Response:
+        if self._url_rewrite is not None:
+            url = self._url_rewrite(url)
+
+        return self.session.request(
+            method=method,
+            url=url,
+            **kwargs
+        )
+
+    def close(
+        self
+    ) -> None:
+        with self._lock:
+            for session in [*self._retired, self._session]:
+                if session is not None:
+                    session.close()
+
+            self._retired = []
+            self._session = None
@@ -1,17 +1,33 @@
+import datetime
 import importlib
 import pkgutil
-import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from sqlalchemy import text
 
+from config import settings
 from logs import app_logger
+from wb.accounts import Account, get_accounts
 from wb.api import WBApi, WBCategory
+from wb.db import save_api_metrics
 from wb.db.connector import get_session, init_db
+from wb.metrics import serve_metrics
 
 
-def check_token():
+METHODS_PATH = Path(__file__).parent / 'methods'
+
+# зависят от справочников первой волны (РК, карточки, склады)
+DEPENDENT_MODULES = ['advert_fullstats', 'advert_nm_report', 'stocks_fbs']
+
+
+def check_token(
+    account: Account
+):
     try:
-        wb = WBApi()
+        wb = WBApi(
+            token=account.token
+        )
 
         wb.validate_token(
             required_categories=[
@@ -77,8 +93,45 @@ def refresh_materialized_view(session):
             raise
 
 
+def log_payload_stats():
+    for endpoint, counter in sorted(WBApi.PAYLOAD_STATS.snapshot().items()):
+        app_logger.info(
+            msg=f'Payload {endpoint}: responses - {counter.responses}, wire - {counter.wire_bytes} bytes, '
+                f'decoded - {counter.decoded_bytes} bytes (x{counter.compression_ratio:.1f}), '
+                f'decode - {counter.decode_seconds:.2f}s'
+        )
+
+
+def save_run_metrics(
+    run_id: str,
+    run_started_at: datetime.datetime
+):
+    session = get_session()
+
+    try:
+        saved_count = save_api_metrics(
+            session=session,
+            metrics=WBApi.METRICS,
+            run_id=run_id,
+            run_started_at=run_started_at
+        )
+        session.commit()
+
+        app_logger.info(
+            msg=f'Successfully was saved - {saved_count} api metrics for run {run_id}'
+        )
+    except Exception as e:
+        app_logger.error(
+            msg=f'Problem with save api metrics, error: {str(e)}'
+        )
+        session.rollback()
+    finally:
+        session.close()
+
+
 def run_module(
-    module_name: str
+    module_name: str,
+    account: Account
 ):
     session = get_session()
 
@@ -86,7 +139,10 @@ def run_module(
         module = importlib.import_module(module_name)
 
         if hasattr(module, 'main'):
-            module.main(session=session)
+            module.main(
+                session=session,
+                account=account
+            )
             session.commit()
         else:
             app_logger.warning(
@@ -94,45 +150,99 @@ def run_module(
             )
     except Exception as e:
         app_logger.error(
-            msg=f'Error in {module_name}: {str(e)}'
+            msg=f'Error in {module_name} for account {account.id}: {str(e)}'
         )
         session.rollback()
     finally:
         session.close()
 
 
+def run_modules_in_threads(
+    module_names: list[str],
+    account: Account
+):
+    # не больше MODULES_CONCURRENCY сессий на кабинет, под это число расширен пул БД
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(settings.wb.MODULES_CONCURRENCY, len(module_names))),
+        thread_name_prefix=f'module-{account.id}'
+    ) as executor:
+        for module_name in module_names:
+            executor.submit(run_module, module_name, account)
+
+
+def run_account(
+    account: Account
+):
+    """Обе волны модулей для одного кабинета: данные пишутся с его `account_id`."""
+    check_error = check_token(
+        account=account
+    )
+    if check_error:
+        app_logger.error(
+            msg=f'Account {account.id}: {check_error}'
+        )
+        return
+
+    app_logger.info(
+        msg=f'Start account {account.id}'
+    )
+
+    run_modules_in_threads(
+        module_names=[
+            f'wb.methods.{module_info.name}'
+            for module_info in pkgutil.iter_modules([str(METHODS_PATH)])
+            if module_info.name not in DEPENDENT_MODULES
+        ],
+        account=account
+    )
+
+    for module_name in DEPENDENT_MODULES:
+        run_module(
+            module_name=f'wb.methods.{module_name}',
+            account=account
+        )
+
+    app_logger.info(
+        msg=f'End account {account.id}'
+    )
+
+
 def run_all_methods():
-    try:
-        methods_path = Path(__file__).parent / 'methods'
-        init_db()
+    run_id = str(uuid.uuid4())
+    run_started_at = datetime.datetime.now()
 
-        check_error = check_token()
-        if check_error:
-            app_logger.error(
-                msg=check_error
-            )
-            return
+    if settings.wb.METRICS_PORT:
+        serve_metrics(
+            metrics=WBApi.METRICS,
+            port=settings.wb.METRICS_PORT
+        )
 
-        threads = []
-        for module_info in pkgutil.iter_modules([str(methods_path)]):
-            module_name = f'wb.methods.{module_info.name}'
+    try:
+        init_db()
 
-            if module_info.name in ['advert_fullstats', 'advert_nm_report', 'stocks_fbs']:
-                continue
+        accounts = get_accounts()
 
-            thread = threading.Thread(
-                target=run_module,
-                args=(module_name,)
-            )
-            threads.append(thread)
-            thread.start()
+        # лимиты WB считаются на продавца, так что кабинеты друг у друга квоту не отнимают
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(settings.wb.ACCOUNTS_CONCURRENCY, len(accounts))),
+            thread_name_prefix='account'
+        ) as executor:
+            for account, future in [
+                (account, executor.submit(run_account, account)) for account in accounts
+            ]:
+                try:
+                    future.result()
+                except Exception as e:
+                    app_logger.error(
+                        msg=f'Problem with run account {account.id}: {str(e)}'
+                    )
 
-        for thread in threads:
-            thread.join()
+        log_payload_stats()
 
-        for module_name in ['wb.methods.advert_fullstats', 'wb.methods.advert_nm_report', 'wb.methods.stocks_fbs']:
-            run_module(
-                module_name=module_name
+        if settings.wb.METRICS_SAVE_ENABLED:
+            save_run_metrics(
+                run_id=run_id,
+                run_started_at=run_started_at
             )
 
         app_logger.info(